@@ -0,0 +1,213 @@
+"""Admission control: per-route-class concurrency limits and per-client rate limits.
+
+Every request is put in a route class (`classify`), eg. ``auth`` for logins and signups,
+``upload`` for uploads, ``catalog`` for browsing. Each class has
+
+- a concurrency limit with a short, bounded queue. Requests beyond ``concurrency + queue``,
+  or that wait longer than ``queue_timeout`` seconds, are shed with a 503.
+- a token bucket per client IP, refilled at ``rate`` requests per second up to ``burst``.
+  Requests with no token left get a 429.
+
+Both answers carry ``Retry-After``. Classes don't share slots, so an upload storm only
+fills the upload queue and catalog reads keep flowing. Limits are per API process: with
+several workers, the effective limits are that many times higher.
+
+Defaults are in ROUTE_CLASSES and can be overridden with ADMISSION_LIMITS, eg.
+``ADMISSION_LIMITS="upload.concurrency=8,auth.rate=0.5"``. Counters are served at
+``GET /admin/admission``.
+"""
+import asyncio
+import math
+import os
+import time
+from collections import OrderedDict
+from urllib.parse import parse_qs
+from starlette.responses import JSONResponse
+from config import ADMISSION_LIMITS
+
+# concurrency: requests served at once, queue: requests allowed to wait for a slot,
+# queue_timeout: seconds one may wait, rate/burst: per-client token bucket (requests/s, bucket size)
+ROUTE_CLASSES = {
+    "auth": {"concurrency": 4, "queue": 16, "queue_timeout": 5, "rate": 0.2, "burst": 10},
+    "upload": {"concurrency": 4, "queue": 8, "queue_timeout": 10, "rate": 0.5, "burst": 5},
+    "upload_data": {"concurrency": 16, "queue": 32, "queue_timeout": 30, "rate": 20, "burst": 100},
+    "search": {"concurrency": 16, "queue": 64, "queue_timeout": 2, "rate": 5, "burst": 20},
+    "catalog": {"concurrency": 256, "queue": 1024, "queue_timeout": 5, "rate": 50, "burst": 200},
+    "default": {"concurrency": 128, "queue": 256, "queue_timeout": 5, "rate": 20, "burst": 100},
+}
+# health checks must answer even when everything else is shed
+EXEMPT_PATHS = {"/", "/health/db"}
+MAX_TRACKED_CLIENTS = 10000  # token buckets kept per class, least recently seen evicted first
+
+
+def classify(method: str, path: str, query_string: bytes = b"") -> str | None:
+    """The route class of a request, or None for requests that are never limited."""
+    if path in EXEMPT_PATHS or method == "OPTIONS":
+        return None
+    if method == "POST" and path in ("/api/login", "/api/signup"):
+        return "auth"
+    if method == "POST" and (path == "/api/upload" or path.startswith("/api/uploads")):
+        return "upload"
+    if method == "PUT" and path.startswith("/api/uploads/"):
+        return "upload_data"
+    if method in ("GET", "HEAD"):
+        if path == "/api/comics" and b"search=" in query_string and parse_qs(query_string.decode()).get("search"):
+            return "search"
+        if path.startswith("/api/comics") or path.startswith("/media/"):
+            return "catalog"
+    return "default"
+
+
+class RouteClass:
+    """Concurrency limiter, queue and per-client token buckets of one route class, with counters."""
+
+    def __init__(self, name: str, concurrency: int, queue: int, queue_timeout: float, rate: float, burst: float):
+        self.name = name
+        self.concurrency = concurrency
+        self.queue = queue
+        self.queue_timeout = queue_timeout
+        self.rate = rate
+        self.burst = burst
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.buckets = OrderedDict()  # client -> [tokens, last refill]
+        self.in_flight = 0
+        self.queued = 0
+        self.admitted = 0
+        self.shed = 0
+        self.throttled = 0
+        self.queue_wait_total = 0.0
+        self.queue_wait_max = 0.0
+        self.service_time = 0.1  # moving average, for Retry-After estimates
+
+    def take_token(self, client: str) -> float:
+        """Take a token from ``client``'s bucket. Returns 0, or the seconds until one is available."""
+        if not self.rate:
+            return 0
+        now = time.monotonic()
+        bucket = self.buckets.get(client)
+        if bucket is None:
+            bucket = self.buckets[client] = [self.burst, now]
+            if len(self.buckets) > MAX_TRACKED_CLIENTS:
+                self.buckets.popitem(last=False)
+        else:
+            self.buckets.move_to_end(client)
+            bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+            bucket[1] = now
+        if bucket[0] < 1:
+            return (1 - bucket[0]) / self.rate
+        bucket[0] -= 1
+        return 0
+
+    async def acquire(self) -> bool:
+        """Wait for a slot; False if the queue is full or the wait timed out."""
+        if not self.semaphore.locked():
+            await self.semaphore.acquire()
+            return True
+        if self.queued >= self.queue:
+            return False
+        self.queued += 1
+        start = time.monotonic()
+        try:
+            await asyncio.wait_for(self.semaphore.acquire(), self.queue_timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            self.queued -= 1
+            waited = time.monotonic() - start
+            self.queue_wait_total += waited
+            self.queue_wait_max = max(self.queue_wait_max, waited)
+
+    def release(self, duration: float):
+        self.semaphore.release()
+        self.service_time += (duration - self.service_time) * 0.1
+
+    def retry_after(self) -> int:
+        """Seconds until a slot is likely free: the queue ahead, drained at the current service time."""
+        return max(1, math.ceil(self.service_time * (self.queued + 1) / self.concurrency))
+
+    def metrics(self) -> dict:
+        return {
+            "concurrency": self.concurrency,
+            "queue": self.queue,
+            "in_flight": self.in_flight,
+            "queued": self.queued,
+            "admitted": self.admitted,
+            "shed": self.shed,
+            "throttled": self.throttled,
+            "avg_queue_wait_ms": round(self.queue_wait_total / max(self.admitted, 1) * 1000, 1),
+            "max_queue_wait_ms": round(self.queue_wait_max * 1000, 1),
+            "avg_service_ms": round(self.service_time * 1000, 1),
+            "clients_tracked": len(self.buckets),
+        }
+
+
+def parse_overrides(value: str) -> dict:
+    """``"upload.concurrency=8,auth.rate=0.5"`` -> ``{"upload": {"concurrency": 8.0}, "auth": {"rate": 0.5}}``"""
+    overrides = {}
+    for item in filter(None, (part.strip() for part in value.split(","))):
+        key, _, number = item.partition("=")
+        name, _, setting = key.strip().partition(".")
+        if name not in ROUTE_CLASSES or setting not in ROUTE_CLASSES[name]:
+            raise ValueError(f"Unknown ADMISSION_LIMITS setting {key!r}")
+        overrides.setdefault(name, {})[setting] = float(number)
+    return overrides
+
+
+def build_route_classes(overrides: dict | None = None) -> dict:
+    classes = {}
+    for name, settings in ROUTE_CLASSES.items():
+        settings = {**settings, **(overrides or {}).get(name, {})}
+        settings["concurrency"], settings["queue"] = int(settings["concurrency"]), int(settings["queue"])
+        classes[name] = RouteClass(name, **settings)
+    return classes
+
+
+route_classes = build_route_classes(parse_overrides(ADMISSION_LIMITS))
+
+
+def metrics() -> dict:
+    return {"pid": os.getpid(), "classes": {name: route.metrics() for name, route in route_classes.items()}}
+
+
+def reject(status_code: int, detail: str, retry_after: float) -> JSONResponse:
+    return JSONResponse(
+        status_code=status_code,
+        content={"detail": detail},
+        headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+    )
+
+
+class AdmissionControlMiddleware:
+    """ASGI middleware applying the route class limits. Add it inside CORSMiddleware,
+    so 429/503 answers still carry CORS headers and browsers can read them."""
+
+    def __init__(self, app, classes: dict | None = None):
+        self.app = app
+        self.classes = classes if classes is not None else route_classes
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        name = classify(scope["method"], scope["path"], scope.get("query_string", b""))
+        if name is None:
+            return await self.app(scope, receive, send)
+        route = self.classes[name]
+
+        client = scope["client"][0] if scope.get("client") else "unknown"
+        wait = route.take_token(client)
+        if wait:
+            route.throttled += 1
+            return await reject(429, "Too many requests, please slow down.", wait)(scope, receive, send)
+        if not await route.acquire():
+            route.shed += 1
+            return await reject(503, "Server busy, please retry shortly.", route.retry_after())(scope, receive, send)
+
+        route.admitted += 1
+        route.in_flight += 1
+        start = time.monotonic()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            route.in_flight -= 1
+            route.release(time.monotonic() - start)
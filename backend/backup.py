@@ -0,0 +1,118 @@
+"""Streaming NDJSON export and bulk import of the comics, pages, chapters and users collections.
+
+One document per line, as MongoDB Extended JSON, so ObjectIds and dates survive
+the round trip. Exports read a server-side cursor in batches and yield chunks of
+lines, and imports upsert fixed-size batches with unordered bulk writes. Memory
+use is the same for a hundred documents or a million.
+"""
+from bson import json_util
+from bson.errors import BSONError
+from bson.json_util import JSONOptions, JSONMode
+from pymongo import UpdateOne, InsertOne
+from pymongo.errors import BulkWriteError
+
+COLLECTIONS = ("comics", "pages", "chapters", "users")
+# fields left out of a users export unless credentials are asked for
+CREDENTIAL_FIELDS = ("password", "access_token")
+EXPORT_BATCH_SIZE = 1000  # documents per cursor round trip
+EXPORT_CHUNK_BYTES = 256 * 1024  # lines are yielded in chunks of about this size
+IMPORT_BATCH_SIZE = 1000  # documents per bulk write
+
+JSON_OPTIONS = JSONOptions(json_mode=JSONMode.RELAXED, tz_aware=True)
+
+
+def export_projection(collection: str, include_credentials: bool) -> dict | None:
+    if collection == "users" and not include_credentials:
+        return {field: 0 for field in CREDENTIAL_FIELDS}
+    return None
+
+
+async def export_ndjson(db, collection: str, include_credentials: bool = False, batch_size: int = EXPORT_BATCH_SIZE):
+    """Yield the collection as NDJSON, in ``_id`` order, in chunks of about EXPORT_CHUNK_BYTES."""
+    cursor = db[collection].find({}, export_projection(collection, include_credentials))
+    cursor = cursor.sort("_id", 1).batch_size(batch_size)
+    chunk, size = [], 0
+    async for document in cursor:
+        line = json_util.dumps(document, json_options=JSON_OPTIONS).encode() + b"\n"
+        chunk.append(line)
+        size += len(line)
+        if size >= EXPORT_CHUNK_BYTES:
+            yield b"".join(chunk)
+            chunk, size = [], 0
+    if chunk:
+        yield b"".join(chunk)
+
+
+async def iter_lines(chunks):
+    """Split an async stream of byte chunks (eg. a request body) into lines."""
+    buffer = b""
+    async for chunk in chunks:
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            yield line
+    if buffer:
+        yield buffer
+
+
+def write_operation(document: dict):
+    """
+    Upsert by ``_id``, merging into an existing document rather than replacing it, so
+    importing a users export taken without credentials doesn't wipe password hashes.
+    """
+    if "_id" not in document:
+        return InsertOne(document)
+    document_id = document.pop("_id")
+    if not document:
+        return UpdateOne({"_id": document_id}, {"$setOnInsert": {"_id": document_id}}, upsert=True)
+    return UpdateOne({"_id": document_id}, {"$set": document}, upsert=True)
+
+
+async def flush(db, collection: str, operations: list, report: dict):
+    try:
+        result = await db[collection].bulk_write(operations, ordered=False)
+        details = result.bulk_api_result
+    except BulkWriteError as e:
+        # unordered: everything but the failed documents was written
+        details = e.details
+        report["errors"] += len(details.get("writeErrors", []))
+        for error in details.get("writeErrors", [])[:5]:
+            print(f" ❌ Import error in {collection}: {error.get('errmsg')}")
+    report["inserted"] += details.get("nInserted", 0) + details.get("nUpserted", 0)
+    report["updated"] += details.get("nModified", 0)
+
+
+async def import_ndjson(db, collection: str, lines, batch_size: int = IMPORT_BATCH_SIZE) -> dict:
+    """
+    Upsert NDJSON documents (an async iterable of lines) by ``_id``, ``batch_size`` at a time.
+    Lines that aren't valid JSON objects are counted as errors and skipped.
+    """
+    report = {"collection": collection, "read": 0, "inserted": 0, "updated": 0, "errors": 0}
+    operations, max_user_id = [], 0
+    async for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        report["read"] += 1
+        try:
+            document = json_util.loads(line, json_options=JSON_OPTIONS)
+            if not isinstance(document, dict):
+                raise ValueError("not an object")
+        except (ValueError, BSONError) as e:
+            report["errors"] += 1
+            print(f" ❌ Skipping line {report['read']} of {collection} import: {e}")
+            continue
+        if collection == "users" and isinstance(document.get("id"), int):
+            max_user_id = max(max_user_id, document["id"])
+
+        operations.append(write_operation(document))
+        if len(operations) >= batch_size:
+            await flush(db, collection, operations, report)
+            operations = []
+    if operations:
+        await flush(db, collection, operations, report)
+
+    if max_user_id:
+        # keep new signups from reusing imported user IDs
+        await db.counters.update_one({"_id": "user_id"}, {"$max": {"seq": max_user_id}}, upsert=True)
+    return report
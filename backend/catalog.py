@@ -0,0 +1,185 @@
+"""In-memory catalog of published comics, for anonymous browsing.
+
+The default ``list_comics`` queries (published comics, sorted by upload date, title, page
+count or trending, optionally filtered by tags) are the same for every visitor. The catalog
+keeps a compact summary record of each published comic in memory and answers them without
+touching MongoDB. Sorted orders are computed on first use and cached until the next change.
+
+`maintain` loads the records at startup, then follows the ``comics`` change stream. The
+stream resumes from the last token after a dropped connection, and falls back to a full
+reload when its history is gone. Against a standalone server, which has no change streams,
+the catalog is reloaded every CATALOG_POLL_SECONDS instead. Until it's loaded,
+``list_comics`` queries MongoDB as before.
+"""
+import asyncio
+import itertools
+import time
+from pymongo.errors import OperationFailure, PyMongoError
+from config import CATALOG_POLL_SECONDS
+import fieldsets
+
+# list_comics sort_by -> record attribute
+SORTS = {"upload_date": "upload_date", "title": "title", "file_count": "file_count", "trending": "trending_score"}
+# kept per comic: the listing summary, plus what the sorts and sparse fieldsets need
+FIELDS = fieldsets.SUMMARY_FIELDS + ("uploaded_by", "trending_score")
+PROJECTION = fieldsets.projection(FIELDS)
+CHANGE_PIPELINE = [
+    {"$match": {"operationType": {"$in": ["insert", "update", "replace", "delete"]}}},
+    {"$project": {
+        "operationType": 1,
+        "documentKey": 1,
+        **{f"fullDocument.{field}": 1 for field, value in PROJECTION.items() if value == 1},
+        "fullDocument.like_count": {"$size": {"$ifNull": ["$fullDocument.likes", []]}},
+        "fullDocument.save_count": {"$size": {"$ifNull": ["$fullDocument.saves", []]}},
+    }},
+]
+NOT_A_REPLICA_SET = 40573
+HISTORY_LOST = (280, 286)
+
+
+class CatalogRecord:
+    """Summary of one published comic."""
+    __slots__ = ("comic_id", "title", "description", "tags", "author_id", "uploaded_by", "upload_date",
+                 "cover_url", "file_count", "trending_score", "like_count", "save_count")
+
+    def __init__(self, comic: dict):
+        self.comic_id = str(comic["_id"])
+        self.title = comic.get("title")
+        self.description = comic.get("description")
+        self.tags = tuple(comic.get("tags") or ())
+        self.author_id = comic.get("author_id")
+        self.uploaded_by = comic.get("uploaded_by")
+        self.upload_date = comic.get("upload_date")
+        self.cover_url = comic.get("cover_url")
+        self.file_count = comic.get("file_count")
+        self.trending_score = comic.get("trending_score")
+        self.like_count = comic.get("like_count", 0)
+        self.save_count = comic.get("save_count", 0)
+
+    def to_dict(self, fields: tuple) -> dict:
+        """The record as list_comics returns a comic (ids and dates as strings), with ``fields``."""
+        comic = {"_id": self.comic_id}
+        for field in fields:
+            if field == "published":
+                comic[field] = True
+            elif field == "tags":
+                comic[field] = list(self.tags)
+            else:
+                value = getattr(self, field)
+                if value is not None:
+                    comic[field] = str(value) if field in ("author_id", "upload_date") else value
+        return comic
+
+
+def sort_key(field: str):
+    # MongoDB sorts missing values before everything else; ties broken by _id
+    def key(record):
+        value = getattr(record, field)
+        return (value is not None, value if value is not None else 0, record.comic_id)
+    return key
+
+
+class Catalog:
+    def __init__(self):
+        self.records = {}  # comic_id -> CatalogRecord
+        self.orders = {}  # sort field -> comic_ids sorted ascending, until a change affects the order
+        self.resume_token = None
+        self.ready = False
+
+    def load(self, records: dict):
+        self.records = records
+        self.orders = {}
+        self.ready = True
+
+    def apply(self, change: dict):
+        """Apply one event from the comics change stream."""
+        comic_id = str(change["documentKey"]["_id"])
+        comic = change.get("fullDocument")
+        if change["operationType"] == "delete" or not comic or not comic.get("published"):
+            if self.records.pop(comic_id, None) is not None:
+                self.orders = {}
+            return
+        old = self.records.get(comic_id)
+        record = self.records[comic_id] = CatalogRecord({**comic, "_id": comic_id})
+        if old is None:
+            self.orders = {}
+            return
+        # eg. a view only moves the comic in the trending order
+        for field in list(self.orders):
+            if getattr(old, field) != getattr(record, field):
+                del self.orders[field]
+
+    @staticmethod
+    def has_fields(fields: tuple | None) -> bool:
+        return fields is not None and all(field in FIELDS for field in fields)
+
+    def page(self, sort_by: str, order: str, tags: list | None, skip: int, limit: int,
+             fields: tuple = fieldsets.SUMMARY_FIELDS) -> tuple[int, list[dict]]:
+        """(total matching, one page of comics) for a published-comics listing."""
+        field = SORTS[sort_by]
+        comic_ids = self.orders.get(field)
+        if comic_ids is None:
+            comic_ids = self.orders[field] = [record.comic_id for record in sorted(self.records.values(), key=sort_key(field))]
+        ordered = (self.records[comic_id] for comic_id in (reversed(comic_ids) if order == "desc" else comic_ids))
+        if not tags:
+            return len(comic_ids), [record.to_dict(fields) for record in itertools.islice(ordered, skip, skip + limit)]
+        # counting the matches takes a pass, but only the page is kept
+        wanted, total, comics = set(tags), 0, []
+        for record in ordered:
+            if wanted.intersection(record.tags):
+                if skip <= total < skip + limit:
+                    comics.append(record.to_dict(fields))
+                total += 1
+        return total, comics
+
+
+async def load(db, catalog: Catalog):
+    started = time.monotonic()
+    records = {}
+    async for comic in db.comics.aggregate([{"$match": {"published": True}}, {"$project": PROJECTION}], batchSize=1000):
+        record = CatalogRecord(comic)
+        records[record.comic_id] = record
+    catalog.load(records)
+    print(f"✅ Catalog loaded: {len(records)} published comics in {time.monotonic() - started:.1f}s")
+
+
+async def maintain(db, catalog: Catalog):
+    """Load the catalog, then keep it current (the app lifespan runs this as a task)."""
+    while True:
+        try:
+            if catalog.resume_token is None:
+                # changes made while loading are picked up from this point
+                start = {"start_at_operation_time": (await db.command("ping")).get("operationTime")}
+                await load(db, catalog)
+                if start["start_at_operation_time"] is None:
+                    raise OperationFailure("not a replica set", code=NOT_A_REPLICA_SET)
+            else:
+                start = {"resume_after": catalog.resume_token}
+            async with db.comics.watch(CHANGE_PIPELINE, full_document="updateLookup", max_await_time_ms=1000, **start) as stream:
+                while True:
+                    change = await stream.try_next()
+                    if change is not None:
+                        catalog.apply(change)
+                    # kept current even while idle, so a dropped stream resumes instead of reloading
+                    catalog.resume_token = stream.resume_token
+        except asyncio.CancelledError:
+            raise
+        except OperationFailure as e:
+            if e.code == NOT_A_REPLICA_SET:
+                print("Catalog: MongoDB is not a replica set, reloading periodically instead of following changes")
+                await poll(db, catalog)
+            elif e.code in HISTORY_LOST:
+                print("Catalog: change history is gone, reloading")
+                catalog.resume_token = None
+            else:
+                print(f" ❌ Error following comic changes for the catalog: {e}")
+                await asyncio.sleep(5)
+        except PyMongoError as e:
+            print(f" ❌ Error following comic changes for the catalog: {e}")
+            await asyncio.sleep(5)
+
+
+async def poll(db, catalog: Catalog):
+    while True:
+        await asyncio.sleep(CATALOG_POLL_SECONDS)
+        await load(db, catalog)
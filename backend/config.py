@@ -7,10 +7,43 @@ load_dotenv()
 MONGO_URI = os.getenv("MONGO_URI", "mongodb://localhost:27017")
 DB_NAME = os.getenv("DB_NAME", "comics-db")
 
+# Read routing (see database.py). Each route class gets its own connection pool.
+# Writes and a user's own views go to the primary; public catalog reads prefer secondaries
+# that are at most MONGO_MAX_STALENESS_SECONDS behind (MongoDB's minimum is 90).
+MONGO_PRIMARY_POOL_SIZE = int(os.getenv("MONGO_PRIMARY_POOL_SIZE", "50"))
+MONGO_CATALOG_POOL_SIZE = int(os.getenv("MONGO_CATALOG_POOL_SIZE", "100"))
+MONGO_CATALOG_MIN_POOL_SIZE = int(os.getenv("MONGO_CATALOG_MIN_POOL_SIZE", "0"))
+MONGO_CATALOG_READ_PREFERENCE = os.getenv("MONGO_CATALOG_READ_PREFERENCE", "secondaryPreferred")
+MONGO_MAX_STALENESS_SECONDS = int(os.getenv("MONGO_MAX_STALENESS_SECONDS", "90"))
+# Connections each pool opens at startup, so a fresh worker doesn't pay for handshakes
+# on its first requests. Pools are per process: multiply by the number of API workers.
+MONGO_WARM_CONNECTIONS = int(os.getenv("MONGO_WARM_CONNECTIONS", "4"))
+
 # JWT / Auth
 SECRET_KEY = os.getenv("SECRET_KEY", "your-secret-key")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
+# Put the user's ID, role and name in access tokens, so requests are authorized without a
+# users lookup; logouts and role changes are revoked through an in-memory set (see revocation.py)
+TOKEN_CLAIMS = os.getenv("TOKEN_CLAIMS", "1") == "1"
+REVOCATION_SYNC_SECONDS = int(os.getenv("REVOCATION_SYNC_SECONDS", "15"))
+# numeric user IDs each API process reserves at a time (see userids.py)
+USER_ID_BLOCK_SIZE = int(os.getenv("USER_ID_BLOCK_SIZE", "100"))
+
+# Admission control (see admission.py): per-route-class concurrency limits and per-client
+# rate limits, eg. ADMISSION_LIMITS="upload.concurrency=8,auth.rate=0.5"
+ADMISSION_CONTROL = os.getenv("ADMISSION_CONTROL", "1") == "1"
+ADMISSION_LIMITS = os.getenv("ADMISSION_LIMITS", "")
+
+# In-process search index (see search.py): snapshot location, how often the changes since the
+# last snapshot are merged into a new one, and the rebuild interval without change streams
+SEARCH_INDEX_DIR = os.getenv("SEARCH_INDEX_DIR", "media/search")
+SEARCH_SNAPSHOT_SECONDS = int(os.getenv("SEARCH_SNAPSHOT_SECONDS", "300"))
+SEARCH_POLL_SECONDS = int(os.getenv("SEARCH_POLL_SECONDS", "60"))
+
+# In-memory catalog of published comics for default listings (see catalog.py)
+CATALOG_CACHE = os.getenv("CATALOG_CACHE", "1") == "1"
+CATALOG_POLL_SECONDS = int(os.getenv("CATALOG_POLL_SECONDS", "30"))
 
 # CORS
 ALLOWED_ORIGINS = [
@@ -20,5 +53,53 @@ ALLOWED_ORIGINS = [
 
 # file uploads
 UPLOAD_DIR = "media/uploads"
+ORIGINALS_DIR = "media/originals"  # untouched uploads, only served to the comic's artist
+# "sharded" stores files under two levels of hex prefix (ab/cd/abcd....png), "flat" directly in the directory
+MEDIA_LAYOUT = os.getenv("MEDIA_LAYOUT", "sharded")
 MAX_FILE_SIZE = 50 * 1024 * 1024
-ALLOWED_EXTENSIONS = {".jpg", ".jpeg", ".png", ".gif", ".pdf", ".cbz"}
\ No newline at end of file
+ALLOWED_EXTENSIONS = {".jpg", ".jpeg", ".png", ".gif", ".pdf", ".cbz"}
+UPLOAD_CONCURRENCY = int(os.getenv("UPLOAD_CONCURRENCY", "4"))  # pages of one upload written at once
+
+# media storage: "local" (UPLOAD_DIR, served at /media/uploads) or "s3" (any S3-compatible store, eg. MinIO)
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "local")
+S3_ENDPOINT_URL = os.getenv("S3_ENDPOINT_URL")  # eg. http://localhost:9000 for MinIO, unset for AWS
+S3_BUCKET = os.getenv("S3_BUCKET", "panelverse")
+S3_ORIGINALS_BUCKET = os.getenv("S3_ORIGINALS_BUCKET", f"{S3_BUCKET}-originals")  # private: artists' originals
+S3_REGION = os.getenv("S3_REGION", "us-east-1")
+S3_ACCESS_KEY = os.getenv("S3_ACCESS_KEY")
+S3_SECRET_KEY = os.getenv("S3_SECRET_KEY")
+S3_PUBLIC_URL = os.getenv("S3_PUBLIC_URL")  # base URL objects are read from, defaults to <endpoint>/<bucket> (https://<bucket>.s3.<region>.amazonaws.com on AWS)
+PRESIGNED_URL_EXPIRE_SECONDS = 60 * 60
+
+# resumable (chunked) uploads for large CBZ/PDF files
+STAGING_DIR = "media/staging"
+MAX_RESUMABLE_FILE_SIZE = int(os.getenv("MAX_RESUMABLE_FILE_SIZE", str(500 * 1024 * 1024)))
+UPLOAD_CHUNK_SIZE = 8 * 1024 * 1024  # largest chunk accepted per PUT
+UPLOAD_SESSION_TTL_HOURS = 24  # sessions with no activity for this long are expired
+
+# media garbage collection
+MEDIA_SWEEP_INTERVAL_HOURS = float(os.getenv("MEDIA_SWEEP_INTERVAL_HOURS", "24"))
+MEDIA_SWEEP_GRACE_HOURS = float(os.getenv("MEDIA_SWEEP_GRACE_HOURS", "24"))  # never sweep files younger than this
+MEDIA_SWEEP_DRY_RUN = os.getenv("MEDIA_SWEEP_DRY_RUN", "false").lower() == "true"
+
+# trending
+TRENDING_HALF_LIFE_HOURS = float(os.getenv("TRENDING_HALF_LIFE_HOURS", "48"))
+TRENDING_RENORMALIZE_HOURS = float(os.getenv("TRENDING_RENORMALIZE_HOURS", "168"))
+TRENDING_WEIGHTS = {"view": 1.0, "like": 5.0, "save": 8.0}
+
+# media processing
+MEDIA_WORKERS = int(os.getenv("MEDIA_WORKERS", "2"))
+THUMBNAIL_SIZE = (400, 400)
+MAX_IMAGE_DIMENSION = int(os.getenv("MAX_IMAGE_DIMENSION", "4000"))
+JPEG_QUALITY = int(os.getenv("JPEG_QUALITY", "85"))
+
+# on-the-fly resized page variants (see variants.py): where they are cached and the size cap of that directory (shared by all workers)
+TRANSFORM_CACHE_DIR = os.getenv("TRANSFORM_CACHE_DIR", "media/transforms")
+TRANSFORM_CACHE_MAX_MB = int(os.getenv("TRANSFORM_CACHE_MAX_MB", "1024"))
+
+# background job queue (see jobs.py / worker.py)
+JOB_LEASE_SECONDS = int(os.getenv("JOB_LEASE_SECONDS", "120"))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "5"))
+JOB_RETRY_BASE_SECONDS = 10  # doubled on every failed attempt
+JOB_RETRY_MAX_SECONDS = 60 * 60
+JOB_WORKER_CONCURRENCY = int(os.getenv("JOB_WORKER_CONCURRENCY", os.getenv("MEDIA_WORKERS", "2")))
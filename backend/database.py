@@ -1,13 +1,91 @@
+"""MongoDB clients and per-route read routing.
+
+The API keeps two clients, each with its own connection pool:
+
+- ``primary`` (``app.mongodb``): every write, background loops, and a user's own
+  views that must reflect what they just did (`causal_session`).
+- ``catalog`` (``app.mongodb_catalog``): public catalog reads (listing, comic pages,
+  manifests). These prefer secondaries no more than MONGO_MAX_STALENESS_SECONDS
+  behind the primary, which takes browse traffic off the primary. Against a
+  standalone server, both simply talk to that server.
+"""
+import asyncio
+from fastapi import Request
 from motor.motor_asyncio import AsyncIOMotorClient
-from dotenv import load_dotenv
-import os
+from pymongo.read_preferences import Primary, PrimaryPreferred, Secondary, SecondaryPreferred, Nearest
+from config import (
+    MONGO_URI, DB_NAME, MONGO_PRIMARY_POOL_SIZE, MONGO_CATALOG_POOL_SIZE, MONGO_CATALOG_MIN_POOL_SIZE,
+    MONGO_CATALOG_READ_PREFERENCE, MONGO_MAX_STALENESS_SECONDS, MONGO_WARM_CONNECTIONS,
+)
+
+MIN_MAX_STALENESS_SECONDS = 90  # MongoDB rejects anything lower
+WARM_UP_TIMEOUT_SECONDS = 5
+READ_PREFERENCES = {
+    "primaryPreferred": PrimaryPreferred,
+    "secondary": Secondary,
+    "secondaryPreferred": SecondaryPreferred,
+    "nearest": Nearest,
+}
+
+
+def catalog_read_preference():
+    if MONGO_CATALOG_READ_PREFERENCE == "primary":
+        return Primary()
+    if MONGO_CATALOG_READ_PREFERENCE not in READ_PREFERENCES:
+        raise ValueError(f"Unknown MONGO_CATALOG_READ_PREFERENCE {MONGO_CATALOG_READ_PREFERENCE!r}")
+    if MONGO_MAX_STALENESS_SECONDS != -1 and MONGO_MAX_STALENESS_SECONDS < MIN_MAX_STALENESS_SECONDS:
+        raise ValueError(f"MONGO_MAX_STALENESS_SECONDS must be -1 (no bound) or at least {MIN_MAX_STALENESS_SECONDS}")
+    return READ_PREFERENCES[MONGO_CATALOG_READ_PREFERENCE](max_staleness=MONGO_MAX_STALENESS_SECONDS)
+
+
+def create_clients() -> dict:
+    return {
+        "primary": AsyncIOMotorClient(MONGO_URI, maxPoolSize=MONGO_PRIMARY_POOL_SIZE),
+        "catalog": AsyncIOMotorClient(
+            MONGO_URI,
+            maxPoolSize=MONGO_CATALOG_POOL_SIZE,
+            minPoolSize=MONGO_CATALOG_MIN_POOL_SIZE,
+            read_preference=catalog_read_preference(),
+        ),
+    }
+
+
+def connect(app):
+    """Open the clients and attach them to the app (called from the lifespan)."""
+    app.mongodb_clients = create_clients()
+    app.mongodb_client = app.mongodb_clients["primary"]
+    app.mongodb = app.mongodb_client[DB_NAME]
+    app.mongodb_catalog = app.mongodb_clients["catalog"][DB_NAME]
+
+
+async def warm_up(app, connections: int = MONGO_WARM_CONNECTIONS):
+    """
+    Open ``connections`` connections in each pool with concurrent pings, so the first
+    requests a worker serves don't wait on TCP/TLS handshakes and server selection.
+    Best effort: the API still starts (and connects lazily) if MongoDB isn't reachable yet.
+    """
+    async def warm(name, client):
+        try:
+            await asyncio.wait_for(
+                asyncio.gather(*(client.admin.command("ping") for _ in range(max(connections, 1)))),
+                WARM_UP_TIMEOUT_SECONDS,
+            )
+        except Exception as e:
+            print(f" ❌ Error warming up the {name} MongoDB pool: {e!r}")
+
+    await asyncio.gather(*(warm(name, client) for name, client in app.mongodb_clients.items()))
+
 
-load_dotenv()
+def close(app):
+    for client in app.mongodb_clients.values():
+        client.close()
 
-def get_database():
-    MONGO_URI = os.getenv("MONGO_URI")
-    DB_NAME = os.getenv("DB_NAME")
 
-    client = AsyncIOMotorClient(MONGO_URI)
-    db = client[DB_NAME]
-    return client[DB_NAME]
\ No newline at end of file
+async def causal_session(request: Request):
+    """
+    A causally consistent session on the primary client, for read-after-write views.
+    Reads in the session see every write made earlier in it, and always hit the primary,
+    so a user sees their own uploads, saves and likes immediately.
+    """
+    async with await request.app.mongodb_client.start_session(causal_consistency=True) as session:
+        yield session
@@ -1,6 +1,8 @@
 from fastapi import Depends, HTTPException, status, Request
 from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError, jwt
+from bson import ObjectId
+from bson.errors import InvalidId
 from config import SECRET_KEY, ALGORITHM
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/login")
@@ -20,7 +22,25 @@ async def get_current_user(request: Request, token: str = Depends(oauth2_scheme)
             raise credentials_exception
     except JWTError:
         raise credentials_exception
-    
+    request.state.token_claims = payload
+
+    # Tokens with claims (see models/auth.py) are authorized from the token alone
+    if payload.get("uid"):
+        revocations = getattr(request.app, "revocations", None)
+        if revocations is not None and revocations.is_revoked(payload):
+            raise credentials_exception
+        try:
+            user_id = ObjectId(payload["uid"])
+        except InvalidId:
+            raise credentials_exception
+        return {
+            "_id": user_id,
+            "id": user_id,
+            "email": user_email,
+            "name": payload.get("name", ""),
+            "role": payload.get("role", "reader"),
+        }
+
     db = request.app.mongodb
     user = await db.users.find_one({"email": user_email})
     if user is None:
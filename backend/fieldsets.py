@@ -0,0 +1,50 @@
+"""Sparse fieldsets for comic listings.
+
+List routes return a summary of each comic by default (SUMMARY_FIELDS, what a comic card
+shows). Clients can ask for other fields with ``fields=title,cover_url,views``, or for whole
+documents with ``fields=all``. The fields become a MongoDB projection, so unrequested fields
+never leave the database. Pages aren't comic fields: they're read with ``GET /api/comics/{id}/pages``.
+"""
+from fastapi import HTTPException
+
+SUMMARY_FIELDS = (
+    "title", "description", "tags", "author_id", "upload_date", "cover_url", "file_count",
+    "published", "like_count", "save_count",
+)
+# engagement arrays are only ever returned as counts
+COMPUTED_FIELDS = {
+    "like_count": {"$size": {"$ifNull": ["$likes", []]}},
+    "save_count": {"$size": {"$ifNull": ["$saves", []]}},
+}
+COMIC_FIELDS = SUMMARY_FIELDS + ("uploaded_by", "trending_score", "views", "bytes_saved")
+ALL = "all"
+
+
+def parse_fields(fields: str | None) -> tuple | None:
+    """The fields a ``fields=`` parameter asks for: SUMMARY_FIELDS if it's empty, None for ``all``."""
+    if not fields:
+        return SUMMARY_FIELDS
+    requested = tuple(dict.fromkeys(field.strip() for field in fields.split(",") if field.strip()))
+    if requested == (ALL,):
+        return None
+    unknown = [field for field in requested if field not in COMIC_FIELDS]
+    if unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown fields: {', '.join(unknown)}. Available: {', '.join(COMIC_FIELDS)}, or 'all'",
+        )
+    return requested
+
+
+def projection(fields: tuple | None) -> dict | None:
+    """MongoDB projection for ``fields`` (None, ie. whole documents, for all fields)."""
+    if fields is None:
+        return None
+    return {field: COMPUTED_FIELDS.get(field, 1) for field in fields}
+
+
+def pipeline(fields: tuple | None) -> list:
+    """The same as aggregation stages, with engagement arrays reduced to counts for whole documents too."""
+    if fields is None:
+        return [{"$addFields": COMPUTED_FIELDS}, {"$unset": ["likes", "saves"]}]
+    return [{"$project": projection(fields)}]
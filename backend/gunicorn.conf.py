@@ -0,0 +1,37 @@
+# Production serving: gunicorn -c gunicorn.conf.py main:app
+#
+# A gunicorn master imports the app once, then forks one uvicorn worker per core. Each
+# worker runs the app's lifespan on its own (MongoDB clients, pool warm-up, background loops),
+# so nothing holding sockets or threads is created before the fork. Housekeeping loops only
+# run in the worker holding the MongoDB lease for them (see leader.py). Workers are recycled
+# after MAX_REQUESTS requests (jittered so they don't all restart together), and on
+# SIGTERM/SIGINT they stop accepting connections and finish in-flight requests, for up to
+# GRACEFUL_TIMEOUT seconds.
+#
+# Development keeps using `uvicorn main:app --reload` (see docker-compose.yaml).
+import os
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+workers = int(os.getenv("WEB_CONCURRENCY") or os.cpu_count() or 1)
+worker_class = "uvicorn_worker.UvicornWorker"
+
+# Import main.py (routers, models, config) in the master so workers share it copy-on-write
+# and a broken deploy fails before any worker starts
+preload_app = True
+
+max_requests = int(os.getenv("MAX_REQUESTS", "10000"))
+max_requests_jitter = int(os.getenv("MAX_REQUESTS_JITTER", str(max_requests // 10)))
+graceful_timeout = int(os.getenv("GRACEFUL_TIMEOUT", "30"))
+timeout = int(os.getenv("WORKER_TIMEOUT", "60"))
+keepalive = int(os.getenv("KEEPALIVE", "5"))
+backlog = 2048
+
+accesslog = "-" if os.getenv("ACCESS_LOG") == "1" else None
+errorlog = "-"
+
+
+def when_ready(server):
+    # Runs in the master after the app is loaded and before workers are forked:
+    # build the OpenAPI schema once here rather than on each worker's first /docs request.
+    server.app.wsgi().openapi()
+    server.log.info(f"✅ Serving with {server.num_workers} workers, recycled every ~{max_requests} requests")
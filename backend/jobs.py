@@ -0,0 +1,195 @@
+"""Persistent background job queue backed by the ``jobs`` collection.
+
+The API enqueues jobs; `worker.py` processes run them. A worker claims a job by
+atomically flipping it to ``running`` with a lease, and keeps renewing the lease
+while it works. If the worker dies, the lease expires and another worker picks
+the job up again. Failed jobs are retried with exponential backoff until
+``max_attempts``, after which they are dead-lettered (``status: "dead"``) for
+inspection instead of being retried forever.
+"""
+import asyncio
+import traceback
+from datetime import datetime, timedelta, timezone
+from pymongo import ReturnDocument
+from config import (
+    JOB_LEASE_SECONDS, JOB_MAX_ATTEMPTS, JOB_RETRY_BASE_SECONDS, JOB_RETRY_MAX_SECONDS,
+)
+
+QUEUED, RUNNING, DONE, DEAD = "queued", "running", "done", "dead"
+
+# Higher runs first
+PRIORITY_UPLOAD = 10  # an artist is waiting on these
+PRIORITY_DEFAULT = 0
+PRIORITY_BACKFILL = -10
+
+HANDLERS = {}
+
+
+def job_handler(job_type: str):
+    """Register an async ``handler(db, payload)`` for a job type."""
+    def register(fn):
+        HANDLERS[job_type] = fn
+        return fn
+    return register
+
+
+def new_job(job_type: str, payload: dict, priority: int = PRIORITY_DEFAULT, max_attempts: int = JOB_MAX_ATTEMPTS) -> dict:
+    now = datetime.now(timezone.utc)
+    return {
+        "type": job_type,
+        "payload": payload,
+        "priority": priority,
+        "status": QUEUED,
+        "attempts": 0,
+        "max_attempts": max_attempts,
+        "run_at": now,
+        "created_at": now,
+    }
+
+
+async def enqueue(db, job_type: str, payload: dict, priority: int = PRIORITY_DEFAULT, max_attempts: int = JOB_MAX_ATTEMPTS):
+    result = await db.jobs.insert_one(new_job(job_type, payload, priority, max_attempts))
+    return result.inserted_id
+
+
+async def enqueue_many(db, job_type: str, payloads: list, priority: int = PRIORITY_DEFAULT):
+    if payloads:
+        await db.jobs.insert_many([new_job(job_type, payload, priority) for payload in payloads], ordered=False)
+
+
+async def claim(db, worker_id: str, lease_seconds: int = JOB_LEASE_SECONDS) -> dict | None:
+    """Atomically take the highest-priority runnable job (or one whose lease has expired)."""
+    now = datetime.now(timezone.utc)
+    return await db.jobs.find_one_and_update(
+        {"$or": [
+            {"status": QUEUED, "run_at": {"$lte": now}},
+            {"status": RUNNING, "lease_until": {"$lt": now}},
+        ]},
+        {
+            "$set": {
+                "status": RUNNING,
+                "worker": worker_id,
+                "lease_until": now + timedelta(seconds=lease_seconds),
+                "started_at": now,
+            },
+            "$inc": {"attempts": 1},
+        },
+        sort=[("priority", -1), ("run_at", 1), ("_id", 1)],
+        return_document=ReturnDocument.AFTER,
+    )
+
+
+async def renew_lease(db, job: dict, worker_id: str, lease_seconds: int = JOB_LEASE_SECONDS) -> bool:
+    """Extend the lease; False if the job was meanwhile reclaimed by another worker."""
+    result = await db.jobs.update_one(
+        {"_id": job["_id"], "worker": worker_id, "status": RUNNING},
+        {"$set": {"lease_until": datetime.now(timezone.utc) + timedelta(seconds=lease_seconds)}},
+    )
+    return result.modified_count == 1
+
+
+async def complete(db, job: dict, worker_id: str):
+    await db.jobs.update_one(
+        {"_id": job["_id"], "worker": worker_id},
+        {"$set": {"status": DONE, "finished_at": datetime.now(timezone.utc)}, "$unset": {"lease_until": ""}},
+    )
+
+
+def retry_delay(attempts: int) -> float:
+    return min(JOB_RETRY_BASE_SECONDS * 2 ** (attempts - 1), JOB_RETRY_MAX_SECONDS)
+
+
+async def dead_letter(db, job: dict, worker_id: str, error: str):
+    await db.jobs.update_one(
+        {"_id": job["_id"], "worker": worker_id},
+        {"$set": {"status": DEAD, "finished_at": datetime.now(timezone.utc), "last_error": error},
+         "$unset": {"lease_until": ""}},
+    )
+
+
+async def fail(db, job: dict, worker_id: str, error: str):
+    """Schedule a retry with backoff, or dead-letter the job once it is out of attempts."""
+    if job["attempts"] >= job.get("max_attempts", JOB_MAX_ATTEMPTS):
+        await dead_letter(db, job, worker_id, error)
+        return
+    run_at = datetime.now(timezone.utc) + timedelta(seconds=retry_delay(job["attempts"]))
+    await db.jobs.update_one(
+        {"_id": job["_id"], "worker": worker_id},
+        {"$set": {"status": QUEUED, "run_at": run_at, "last_error": error}, "$unset": {"lease_until": ""}},
+    )
+
+
+async def run_job(db, job: dict, worker_id: str):
+    """Run one claimed job, renewing its lease until the handler returns."""
+    handler = HANDLERS.get(job["type"])
+    if handler is None:
+        await dead_letter(db, job, worker_id, f"No handler for job type {job['type']}")
+        return
+    if job["attempts"] > job.get("max_attempts", JOB_MAX_ATTEMPTS):
+        # its previous workers died mid-job too many times
+        await dead_letter(db, job, worker_id, job.get("last_error") or "Lease expired too many times")
+        return
+
+    async def keep_leased():
+        while True:
+            await asyncio.sleep(JOB_LEASE_SECONDS / 3)
+            await renew_lease(db, job, worker_id)
+
+    heartbeat = asyncio.create_task(keep_leased())
+    try:
+        await handler(db, job["payload"])
+    except Exception as e:
+        print(f" ❌ Job {job['_id']} ({job['type']}) failed on attempt {job['attempts']}: {e}")
+        await fail(db, job, worker_id, "".join(traceback.format_exception_only(type(e), e)).strip())
+    else:
+        await complete(db, job, worker_id)
+    finally:
+        heartbeat.cancel()
+
+
+async def ensure_indexes(db):
+    # claim order and lease expiry
+    await db.jobs.create_index([("status", 1), ("priority", -1), ("run_at", 1), ("_id", 1)])
+    await db.jobs.create_index([("status", 1), ("lease_until", 1)])
+    # finished jobs are kept for a week for latency stats, dead letters until someone looks at them
+    await db.jobs.create_index(
+        "finished_at",
+        expireAfterSeconds=7 * 24 * 60 * 60,
+        partialFilterExpression={"status": DONE},
+    )
+
+
+async def queue_stats(db, window_minutes: int = 60) -> dict:
+    """Queue depth by type and status, age of the oldest runnable job, and recent job latency."""
+    now = datetime.now(timezone.utc)
+    depth = {}
+    async for row in db.jobs.aggregate([
+        {"$match": {"status": {"$in": [QUEUED, RUNNING, DEAD]}}},
+        {"$group": {"_id": {"type": "$type", "status": "$status"}, "count": {"$sum": 1}}},
+    ]):
+        depth.setdefault(row["_id"]["type"], {})[row["_id"]["status"]] = row["count"]
+
+    oldest = await db.jobs.find_one({"status": QUEUED, "run_at": {"$lte": now}}, sort=[("run_at", 1)])
+    oldest_age = None
+    if oldest:
+        run_at = oldest["run_at"].replace(tzinfo=timezone.utc) if oldest["run_at"].tzinfo is None else oldest["run_at"]
+        oldest_age = (now - run_at).total_seconds()
+
+    latency = {}
+    async for row in db.jobs.aggregate([
+        {"$match": {"status": DONE, "finished_at": {"$gte": now - timedelta(minutes=window_minutes)}}},
+        {"$group": {
+            "_id": "$type",
+            "count": {"$sum": 1},
+            "avg_total_ms": {"$avg": {"$subtract": ["$finished_at", "$created_at"]}},
+            "max_total_ms": {"$max": {"$subtract": ["$finished_at", "$created_at"]}},
+            "avg_run_ms": {"$avg": {"$subtract": ["$finished_at", "$started_at"]}},
+        }},
+    ]):
+        latency[row.pop("_id")] = row
+
+    return {
+        "depth": depth,
+        "oldest_queued_seconds": oldest_age,
+        f"latency_last_{window_minutes}m": latency,
+    }
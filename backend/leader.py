@@ -0,0 +1,58 @@
+"""Housekeeping loops that must run in one API process at a time.
+
+Every API process runs the same lifespan: gunicorn forks one per core, and there may be
+several hosts. Loops that change shared state must run once, not once per process. These
+are trending renormalization, upload-session expiry, and media reclaim with its sweep.
+They only run in the process that holds the ``housekeeping`` document in ``leases``. The
+holder renews its lease every LEASE_RENEW_SECONDS. If it dies or loses MongoDB, another
+process takes over once LEASE_SECONDS have passed.
+"""
+import asyncio
+import os
+import socket
+from datetime import datetime, timedelta, timezone
+from pymongo.errors import DuplicateKeyError
+
+LEASE_ID = "housekeeping"
+LEASE_SECONDS = 60
+LEASE_RENEW_SECONDS = 15
+
+
+async def acquire(db, holder: str) -> bool:
+    """Take or renew the lease; False while another process holds it."""
+    now = datetime.now(timezone.utc)
+    try:
+        await db.leases.update_one(
+            {"_id": LEASE_ID, "$or": [{"holder": holder}, {"expires_at": {"$lt": now}}]},
+            {"$set": {"holder": holder, "expires_at": now + timedelta(seconds=LEASE_SECONDS)}},
+            upsert=True,
+        )
+        return True
+    except DuplicateKeyError:
+        return False  # held by someone else: the upsert ran into the existing document
+
+
+async def run_while_leader(db, loops: list):
+    """Run the ``loops`` (coroutine functions) while this process holds the lease."""
+    holder = f"{socket.gethostname()}:{os.getpid()}"
+    running = []
+    try:
+        while True:
+            try:
+                leader = await acquire(db, holder)
+            except Exception as e:
+                # can't renew: stop before the lease runs out and another process starts them
+                print(f" ❌ Error renewing the housekeeping lease: {e}")
+                leader = False
+            if leader and not running:
+                print(f"✅ {holder} runs the housekeeping loops")
+                running = [asyncio.create_task(loop()) for loop in loops]
+            elif not leader and running:
+                print(f"✅ {holder} stopped the housekeeping loops")
+                for task in running:
+                    task.cancel()
+                running = []
+            await asyncio.sleep(LEASE_RENEW_SECONDS)
+    finally:
+        for task in running:
+            task.cancel()
@@ -1,23 +1,81 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from motor.motor_asyncio import AsyncIOMotorClient
-from config import MONGO_URI, DB_NAME, ALLOWED_ORIGINS, UPLOAD_DIR
-from routers import auth, user, comics, admin
+from config import ALLOWED_ORIGINS, UPLOAD_DIR, ORIGINALS_DIR, STORAGE_BACKEND, ADMISSION_CONTROL, CATALOG_CACHE
+from routers import auth, user, comics, admin, uploads, transforms
 from pathlib import Path
 from contextlib import asynccontextmanager
+import asyncio
+import os
+import admission
+import catalog
+import database
+import leader
+import trending
+import media
+import reclaim
+import revocation
+import search
+import userids
+import variants
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    # Startup: Connect to MongoDB
-    app.mongodb_client = AsyncIOMotorClient(MONGO_URI)
-    app.mongodb = app.mongodb_client[DB_NAME]
+    # Startup: Connect to MongoDB (primary and catalog-read clients, see database.py)
+    database.connect(app)
+    await database.warm_up(app)
+    # Housekeeping, in one API process at a time (see leader.py): keep trending scores bounded,
+    # clean up abandoned resumable uploads, cascade comic deletes to media files and sweep orphaned media
+    housekeeping_task = asyncio.create_task(leader.run_while_leader(app.mongodb, [
+        lambda: trending.renormalize_loop(app.mongodb),
+        lambda: uploads.expire_upload_sessions_loop(app.mongodb),
+        lambda: reclaim.reclaim_loop(app.mongodb),
+    ]))
+    # Build (or load) the search index and follow comic changes
+    app.search_index = search.create_index()
+    search_task = asyncio.create_task(search.maintain(app.mongodb, app.search_index))
+    # Serve default comic listings from memory
+    app.catalog = catalog.Catalog() if CATALOG_CACHE else None
+    catalog_task = asyncio.create_task(catalog.maintain(app.mongodb, app.catalog)) if CATALOG_CACHE else None
+    # Signup relies on the unique email index
+    try:
+        await userids.ensure_indexes(app.mongodb)
+    except Exception as e:
+        print(f" ❌ Could not create the unique email index (duplicate emails?), signups can't rule out duplicates: {e}")
+    # Keep the revoked tokens in memory, so token claims are authorized without a users lookup
+    app.revocations = revocation.RevocationList()
+    await app.revocations.load(app.mongodb)
+    revocation_task = asyncio.create_task(revocation.maintain(app.mongodb, app.revocations))
+    # Index the resized page variants already on disk
+    await asyncio.to_thread(variants.get_cache)
     yield
-    # Shutdown: Close MongoDB connection
-    app.mongodb_client.close()
+    # Shutdown: Stop background loops and close MongoDB connection
+    housekeeping_task.cancel()
+    search_task.cancel()
+    revocation_task.cancel()
+    if catalog_task:
+        catalog_task.cancel()
+    database.close(app)
 
 app = FastAPI(title="Panel-Verse API", lifespan=lifespan)
 
+class MediaFiles(StaticFiles):
+    """Static files resolving both the flat and the sharded upload layout, so URLs keep working during migration."""
+    def lookup_path(self, path: str):
+        full_path, stat_result = super().lookup_path(path)
+        if stat_result is None:
+            filename = os.path.basename(path)
+            for candidate in (os.path.join(media.shard_dir(filename), filename), filename):
+                if candidate != path:
+                    full_path, stat_result = super().lookup_path(candidate)
+                    if stat_result is not None:
+                        break
+        return full_path, stat_result
+
+# Shed load per route class before it queues up (added first so CORS wraps its 429/503s)
+if ADMISSION_CONTROL:
+    app.add_middleware(admission.AdmissionControlMiddleware)
+
 # CORS
 app.add_middleware(
     CORSMiddleware,
@@ -27,21 +85,26 @@ app.add_middleware(
     allow_credentials=True,
 )
 
-# Create upload directory
+# Create upload directories
 Path(UPLOAD_DIR).mkdir(parents=True, exist_ok=True)
+Path(ORIGINALS_DIR).mkdir(parents=True, exist_ok=True)
 
-# Serve media files - mount at /media and serve from directory containing UPLOAD_DIR
-# Use the configured UPLOAD_DIR (eg. "media/uploads") and mount its parent (eg. "media").
-# Resolve it relative to the current working directory to avoid mismatches when the
-# process is started from a different CWD.
-media_dir = (Path.cwd() / UPLOAD_DIR).parent
-app.mount("/media", StaticFiles(directory=str(media_dir)), name="media")
+# Serve media files - mount the configured UPLOAD_DIR (eg. "media/uploads") at /media/uploads.
+# Only UPLOAD_DIR is public: ORIGINALS_DIR sits next to it and is served to the artist
+# through the API. Resolve it relative to the current working directory to avoid
+# mismatches when the process is started from a different CWD.
+# With STORAGE_BACKEND=s3 media URLs point at the bucket and nothing is mounted.
+if STORAGE_BACKEND == "local":
+    upload_dir = Path.cwd() / UPLOAD_DIR
+    app.mount("/media/uploads", MediaFiles(directory=str(upload_dir)), name="media")
 
 # Include routers
 app.include_router(auth.router)
 app.include_router(user.router)
 app.include_router(comics.router)
 app.include_router(admin.router)
+app.include_router(uploads.router)
+app.include_router(transforms.router)
 
 # Health endpoints
 @app.get("/")
@@ -0,0 +1,263 @@
+"""Image processing for uploaded comic pages.
+
+Everything here is CPU-bound and only takes and returns plain data, so it can be
+run in the shared worker process pool via `run_in_worker` instead of blocking
+the API event loop.
+"""
+import asyncio
+import base64
+import io
+import multiprocessing
+import os
+import shutil
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from PIL import Image, ImageCms, ImageOps, ImageSequence
+from config import UPLOAD_DIR, MEDIA_LAYOUT, MEDIA_WORKERS, THUMBNAIL_SIZE, MAX_IMAGE_DIMENSION, JPEG_QUALITY
+
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".gif"}
+OPTIMIZABLE_EXTENSIONS = {".jpg", ".jpeg", ".png"}
+PLACEHOLDER_SIZE = 16
+MEDIA_URL_PREFIX = "/media/uploads/"
+
+_pool = None
+
+
+def shard_dir(filename: str) -> str:
+    """Relative shard directory for a filename: two levels of its hex prefix, eg. ``ab/cd``."""
+    return os.path.join(filename[:2], filename[2:4])
+
+
+def media_path(filename: str, directory: str = UPLOAD_DIR) -> str:
+    """Where a new file is written under ``directory`` in the configured layout."""
+    if MEDIA_LAYOUT == "sharded":
+        return os.path.join(directory, shard_dir(filename), filename)
+    return os.path.join(directory, filename)
+
+
+def resolve_media_path(filename: str, directory: str = UPLOAD_DIR) -> str:
+    """
+    Path of an existing file in either layout, so files written before (or during) a layout
+    migration are still found. Falls back to `media_path` when the file doesn't exist.
+    """
+    for path in (os.path.join(directory, shard_dir(filename), filename), os.path.join(directory, filename)):
+        if os.path.exists(path):
+            return path
+    return media_path(filename, directory)
+
+
+def media_url(filename: str) -> str:
+    """Public URL of an uploaded file in the configured layout."""
+    if MEDIA_LAYOUT == "sharded":
+        return f"{MEDIA_URL_PREFIX}{shard_dir(filename)}/{filename}"
+    return f"{MEDIA_URL_PREFIX}{filename}"
+
+
+def get_pool() -> ProcessPoolExecutor:
+    """Return the shared media worker pool, starting it on first use."""
+    global _pool
+    if _pool is None:
+        # spawn so workers don't inherit the event loop or open MongoDB sockets
+        _pool = ProcessPoolExecutor(max_workers=MEDIA_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+    return _pool
+
+
+async def run_in_worker(fn, *args):
+    """Run ``fn(*args)`` in the media worker pool and await its result."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_pool(), fn, *args)
+
+
+def shutdown_pool():
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+def thumbnail_path(file_path: str) -> str:
+    """Path of the thumbnail generated for ``file_path``."""
+    path = Path(file_path)
+    return str(path.with_name(f"{path.stem}_thumb{path.suffix}"))
+
+
+def create_thumbnail(file_path: str, thumb_size=THUMBNAIL_SIZE) -> str | None:
+    """Create a thumbnail next to the page and return its path."""
+    try:
+        image = Image.open(file_path)
+        image.thumbnail(thumb_size)
+        thumb_path = thumbnail_path(file_path)
+        image.save(thumb_path)
+        print(f"✅ Thumbnail created at {thumb_path}")
+        return thumb_path
+    except Exception as e:
+        print(f" ❌ Error creating thumbnail: {e}")
+        return None
+
+
+def dominant_color(image: Image.Image) -> str:
+    """Most common colour of the image as a ``#rrggbb`` string."""
+    small = image.convert("RGB")
+    small.thumbnail((64, 64))
+    quantized = small.quantize(colors=8)
+    _, index = max(quantized.getcolors())
+    palette = quantized.getpalette()
+    r, g, b = palette[index * 3:index * 3 + 3]
+    return f"#{r:02x}{g:02x}{b:02x}"
+
+
+def placeholder(image: Image.Image) -> str:
+    """Tiny low-quality preview (LQIP) of the image as a WebP data URI, typically a few hundred bytes."""
+    tiny = image.convert("RGB")
+    tiny.thumbnail((PLACEHOLDER_SIZE, PLACEHOLDER_SIZE))
+    buffer = io.BytesIO()
+    tiny.save(buffer, format="WEBP", quality=30)
+    return "data:image/webp;base64," + base64.b64encode(buffer.getvalue()).decode("ascii")
+
+
+def to_srgb(image: Image.Image) -> Image.Image:
+    """Convert an image with an embedded ICC profile to sRGB; other images are returned as-is."""
+    icc_profile = image.info.get("icc_profile")
+    if not icc_profile:
+        return image
+    try:
+        source = ImageCms.ImageCmsProfile(io.BytesIO(icc_profile))
+        output_mode = "RGBA" if "A" in image.getbands() else "RGB"
+        return ImageCms.profileToProfile(image, source, ImageCms.createProfile("sRGB"), outputMode=output_mode)
+    except (ImageCms.PyCMSError, OSError, ValueError) as e:
+        print(f" ❌ Could not convert colour profile, keeping pixels as-is: {e}")
+        return image
+
+
+def optimize_image(file_path: str, original_path: str, max_dimension: int = MAX_IMAGE_DIMENSION) -> dict:
+    """
+    Re-encode a JPEG/PNG page in place for serving: apply EXIF orientation, convert to sRGB,
+    strip metadata, cap the longest side at ``max_dimension`` and write a progressive JPEG
+    or an optimized PNG. The untouched upload is kept at ``original_path``; when it already
+    exists (the page is being reprocessed) the page is re-derived from it rather than
+    optimized a second time. Returns ``original_size`` and ``bytes_saved``.
+    """
+    extension = Path(file_path).suffix.lower()
+    if extension not in OPTIMIZABLE_EXTENSIONS:
+        return {}
+
+    source_path = original_path if os.path.exists(original_path) else file_path
+    original_size = os.path.getsize(source_path)
+    tmp_path = f"{file_path}.tmp"
+    with Image.open(source_path) as source:
+        has_metadata = any(key in source.info for key in ("exif", "icc_profile", "xmp", "photoshop"))
+        image = to_srgb(ImageOps.exif_transpose(source))
+        resized = max(image.size) > max_dimension
+        if resized:
+            image.thumbnail((max_dimension, max_dimension), Image.LANCZOS)
+
+        # Nothing is copied over from source.info, so EXIF/ICC/XMP are dropped
+        if extension in (".jpg", ".jpeg"):
+            image.convert("RGB").save(tmp_path, format="JPEG", quality=JPEG_QUALITY, optimize=True, progressive=True)
+        else:
+            image.save(tmp_path, format="PNG", optimize=True)
+
+    optimized_size = os.path.getsize(tmp_path)
+    if optimized_size >= original_size and not (has_metadata or resized):
+        # Already lean: serve the upload as-is
+        if source_path == file_path:
+            os.remove(tmp_path)
+        else:
+            shutil.copyfile(source_path, tmp_path)
+            os.replace(tmp_path, file_path)
+        return {"original_size": original_size, "bytes_saved": 0}
+
+    if source_path == file_path:
+        os.makedirs(os.path.dirname(original_path), exist_ok=True)
+        shutil.copyfile(file_path, original_path)
+    os.replace(tmp_path, file_path)  # atomic, so readers never see a partial file
+    return {"original_size": original_size, "bytes_saved": original_size - optimized_size}
+
+
+def is_animated_gif(file_path: str) -> bool:
+    if Path(file_path).suffix.lower() != ".gif":
+        return False
+    with Image.open(file_path) as image:
+        return getattr(image, "n_frames", 1) > 1
+
+
+def convert_animated_gif(file_path: str, thumb_size=THUMBNAIL_SIZE) -> dict:
+    """
+    Write an animated WebP rendition and a static first-frame PNG thumbnail next to an
+    animated GIF page. The GIF itself is kept for clients without WebP support.
+    """
+    path = Path(file_path)
+    webp_path = path.with_suffix(".webp")
+    thumb_path = path.with_name(f"{path.stem}_thumb.png")
+    meta = {"animated": True}
+
+    with Image.open(file_path) as image:
+        durations = [frame.info.get("duration", 100) for frame in ImageSequence.Iterator(image)]
+        image.seek(0)
+        tmp_path = f"{webp_path}.tmp"
+        image.save(
+            tmp_path,
+            format="WEBP",
+            save_all=True,
+            duration=durations,
+            loop=image.info.get("loop", 0),
+            quality=80,
+            method=4,
+        )
+
+        image.seek(0)
+        first_frame = image.convert("RGBA")
+        first_frame.thumbnail(thumb_size)
+        first_frame.save(thumb_path, format="PNG", optimize=True)
+        meta["thumbnail_filename"] = thumb_path.name
+
+    webp_size = os.path.getsize(tmp_path)
+    if webp_size < os.path.getsize(file_path):
+        os.replace(tmp_path, webp_path)
+        meta.update({"webp_filename": webp_path.name, "webp_size": webp_size})
+        print(f"✅ Animated WebP created at {webp_path}")
+    else:
+        os.remove(tmp_path)
+    return meta
+
+
+def probe_image(file_path: str) -> dict:
+    """Layout metadata for one page: byte size, dimensions, dominant colour and placeholder."""
+    meta = {"size": os.path.getsize(file_path)}
+    if Path(file_path).suffix.lower() not in IMAGE_EXTENSIONS:
+        return meta
+
+    with Image.open(file_path) as image:
+        meta["width"], meta["height"] = image.size
+        meta["color"] = dominant_color(image)
+        meta["placeholder"] = placeholder(image)
+    return meta
+
+
+def process_page(file_path: str, original_path: str) -> dict:
+    """
+    Post-upload processing for one page, run in a worker process.
+    Returns the fields to merge into the page's entry in the comic's ``files``.
+    """
+    meta = {}
+    try:
+        meta.update(optimize_image(file_path, original_path))
+    except Exception as e:
+        print(f" ❌ Error optimizing {file_path}: {e}")
+
+    try:
+        meta.update(probe_image(file_path))
+    except Exception as e:
+        print(f" ❌ Error reading page metadata for {file_path}: {e}")
+
+    try:
+        if is_animated_gif(file_path):
+            meta.update(convert_animated_gif(file_path))
+    except Exception as e:
+        print(f" ❌ Error converting animated GIF {file_path}: {e}")
+
+    if "thumbnail_filename" not in meta and Path(file_path).suffix.lower() in IMAGE_EXTENSIONS:
+        thumb_path = create_thumbnail(file_path)
+        if thumb_path:
+            meta["thumbnail_filename"] = Path(thumb_path).name
+    return meta
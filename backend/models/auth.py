@@ -1,9 +1,26 @@
+import uuid
 from datetime import datetime, timedelta
 from jose import JWTError, jwt
-from config import SECRET_KEY, ALGORITHM, ACCESS_TOKEN_EXPIRE_MINUTES
+from config import SECRET_KEY, ALGORITHM, ACCESS_TOKEN_EXPIRE_MINUTES, TOKEN_CLAIMS
 
 def create_access_token(data: dict, expires_delta: timedelta | None = None):
     to_encode = data.copy()
-    expire = datetime.utcnow() + (expires_delta or timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES))
-    to_encode.update({"exp": expire})
-    return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
\ No newline at end of file
+    now = datetime.utcnow()
+    expire = now + (expires_delta or timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES))
+    to_encode.update({"exp": expire, "iat": now})
+    return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
+
+def user_claims(user: dict) -> dict:
+    """
+    Token claims for a user: their email, and with TOKEN_CLAIMS also their ID, role and name,
+    plus a token ID so the token can be revoked on its own (see revocation.py).
+    """
+    claims = {"sub": user["email"]}
+    if TOKEN_CLAIMS:
+        claims.update({
+            "uid": str(user["_id"]),
+            "role": user.get("role", "reader"),
+            "name": user.get("name", ""),
+            "jti": uuid.uuid4().hex,
+        })
+    return claims
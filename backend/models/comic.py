@@ -10,6 +10,10 @@ class FileMeta(BaseModel):
     width: Optional[int] = None
     height: Optional[int] = None
     thumbnail_url: Optional[str] = None
+    color: Optional[str] = None  # dominant colour, "#rrggbb"
+    placeholder: Optional[str] = None  # tiny LQIP data URI
+    animated: bool = False
+    webp_url: Optional[str] = None  # animated WebP rendition of an animated GIF
 
 class ComicBase(BaseModel):
     title: str
@@ -0,0 +1,244 @@
+"""Comic pages, one document per page in the ``pages`` collection, and their chapters.
+
+A comic document keeps its page count (``file_count``) and cover, not its pages, so it stays
+the same size however long the comic runs. Pages are keyed by ``(comic_id, order)`` and
+read a window at a time (``GET /api/comics/{id}/pages``). A page document holds what the
+upload wrote (``filename``, ``original_filename``, ``url``, ``size``) plus what the media
+workers add later (dimensions, thumbnail and renditions, ``bytes_saved``, ...).
+
+``order`` is a sort key, not a page number: pages are ORDER_GAP apart, so moving a page
+gives it an order between its new neighbours and touches no other page. When a gap runs
+out, the comic's orders are spread out again (`rebalance`). New orders are reserved from
+the comic's ``page_order_end`` with one ``$inc``, so concurrent appends never collide.
+
+Chapters (``chapters`` collection) group pages: each page of a chapter carries its
+``chapter_id``, so a reader can load one chapter's pages at a time.
+"""
+from datetime import datetime, timezone
+from bson import ObjectId
+from fastapi import HTTPException
+from pymongo import ReturnDocument, UpdateOne
+from pymongo.errors import DuplicateKeyError
+
+# returned for each page by the pages endpoint
+PAGE_FIELDS = (
+    "filename", "original_filename", "url", "size", "thumbnail_url", "webp_url", "animated",
+    "width", "height", "color", "placeholder", "chapter_id",
+)
+MAX_PAGE_WINDOW = 200
+ORDER_GAP = 1024
+MOVE_ATTEMPTS = 3
+
+
+def page_documents(comic_id, files: list, first_order: int, chapter_id=None) -> list[dict]:
+    now = datetime.now(timezone.utc)
+    chapter = {"chapter_id": chapter_id} if chapter_id else {}
+    return [
+        {**page, **chapter, "comic_id": comic_id, "order": first_order + offset * ORDER_GAP, "created_at": now}
+        for offset, page in enumerate(files)
+    ]
+
+
+async def insert_pages(db, comic_id, files: list, first_order: int = 0, chapter_id=None):
+    """Store pages with orders from ``first_order`` on (a new comic's pages start at 0)."""
+    if files:
+        await db.pages.insert_many(page_documents(comic_id, files, first_order, chapter_id), ordered=False)
+
+
+async def reserve_orders(db, comic_id, count: int, page_count: int | None = None) -> int | None:
+    """
+    Reserve ``count`` orders after the comic's last page and add ``page_count`` (default
+    ``count``) to its page count. Returns the first order, or None if the comic is gone.
+    """
+    page_count = count if page_count is None else page_count
+    while True:
+        comic = await db.comics.find_one_and_update(
+            {"_id": comic_id, "page_order_end": {"$exists": True}},
+            {"$inc": {"page_order_end": count * ORDER_GAP, "file_count": page_count}},
+            projection={"page_order_end": 1},
+            return_document=ReturnDocument.BEFORE,
+        )
+        if comic is not None:
+            return comic["page_order_end"]
+        # comics created before reservations (or by the sample scripts) start after their last
+        # page, and after their embedded pages if they haven't been migrated yet: those are
+        # moved to orders 0..n-1 by scripts/migrate_pages.py and must not collide
+        comic = await db.comics.find_one({"_id": comic_id}, {"file_count": 1, "files.filename": 1})
+        if not comic:
+            return None
+        last = await db.pages.find_one({"comic_id": comic_id}, {"order": 1}, sort=[("order", -1)])
+        embedded = max(len(comic.get("files") or []), comic.get("file_count") or 0)
+        end = max(last["order"] + ORDER_GAP if last else 0, embedded * ORDER_GAP)
+        await db.comics.update_one({"_id": comic_id, "page_order_end": {"$exists": False}}, {"$set": {"page_order_end": end}})
+
+
+async def last_chapter_id(db, comic_id):
+    chapter = await db.chapters.find_one({"comic_id": comic_id}, {"_id": 1}, sort=[("order", -1)])
+    return chapter["_id"] if chapter else None
+
+
+async def append_pages(db, comic_id, files: list, chapter_title: str | None = None) -> bool:
+    """
+    Add pages after the comic's last page, as a new chapter if ``chapter_title`` is given,
+    else to the last chapter (if the comic has chapters). Existing pages aren't touched.
+    False if the comic is gone.
+    """
+    first_order = await reserve_orders(db, comic_id, len(files))
+    if first_order is None:
+        return False
+    chapter_id = new_chapter = None
+    try:
+        if chapter_title:
+            new_chapter = {
+                "_id": ObjectId(),
+                "comic_id": comic_id,
+                "title": chapter_title,
+                "order": first_order,
+                "page_count": len(files),
+                "created_at": datetime.now(timezone.utc),
+            }
+            await db.chapters.insert_one(new_chapter)
+            chapter_id = new_chapter["_id"]
+        else:
+            chapter_id = await last_chapter_id(db, comic_id)
+        await insert_pages(db, comic_id, files, first_order, chapter_id)
+    except Exception:
+        # the reserved orders are simply skipped
+        await db.comics.update_one({"_id": comic_id}, {"$inc": {"file_count": -len(files)}})
+        if new_chapter:
+            await db.chapters.delete_one({"_id": new_chapter["_id"]})
+        raise
+    if chapter_id and not new_chapter:
+        await db.chapters.update_one({"_id": chapter_id}, {"$inc": {"page_count": len(files)}})
+    return True
+
+
+async def rebalance(db, comic_id):
+    """
+    Spread a comic's orders ORDER_GAP apart again. Pages first move below the lowest order,
+    then to their new orders, so the unique index never sees two pages at one order and the
+    reading order holds throughout.
+    """
+    found = await db.pages.find({"comic_id": comic_id}, {"order": 1}).sort("order", 1).to_list(length=None)
+    if not found:
+        return
+    below = min(found[0]["order"], 0) - len(found)
+    await db.pages.bulk_write([UpdateOne({"_id": page["_id"]}, {"$set": {"order": below + index}})
+                               for index, page in enumerate(found)])
+    await db.pages.bulk_write([UpdateOne({"_id": page["_id"]}, {"$set": {"order": index * ORDER_GAP}})
+                               for index, page in enumerate(found)])
+    await db.comics.update_one({"_id": comic_id}, {"$max": {"page_order_end": len(found) * ORDER_GAP}})
+
+
+async def move_page(db, comic_id, filename: str, position: int) -> int | None:
+    """
+    Move a page so it becomes page ``position`` (0-based; past the end moves it last).
+    Only the moved page's order changes. Returns its new order, or None if there's no such page.
+    """
+    page = await find_page(db, comic_id, filename, {"order": 1})
+    if not page:
+        return None
+    others = {"comic_id": comic_id, "_id": {"$ne": page["_id"]}}
+    for _ in range(MOVE_ATTEMPTS):
+        # the pages that will be just before and just after it
+        skip = max(position - 1, 0)
+        neighbours = await db.pages.find(others, {"order": 1}).sort("order", 1).skip(skip).limit(2).to_list(length=2)
+        if position == 0:
+            before, after = None, neighbours[0] if neighbours else None
+        else:
+            before = neighbours[0] if neighbours else None
+            after = neighbours[1] if len(neighbours) > 1 else None
+        if before is None and position > 0:
+            before = await db.pages.find_one(others, {"order": 1}, sort=[("order", -1)])
+
+        if (before is None or before["order"] < page["order"]) and (after is None or page["order"] < after["order"]):
+            return page["order"]  # already there
+        if after is None:
+            order = await reserve_orders(db, comic_id, 1, page_count=0)
+            if order is None:
+                return None
+        elif before is None:
+            order = after["order"] - ORDER_GAP
+        elif after["order"] - before["order"] > 1:
+            order = (before["order"] + after["order"]) // 2
+        else:
+            await rebalance(db, comic_id)
+            continue
+        try:
+            await db.pages.update_one({"_id": page["_id"]}, {"$set": {"order": order}})
+            return order
+        except DuplicateKeyError:
+            continue  # a concurrent move took that order; look again
+    raise HTTPException(status_code=409, detail="The pages changed while moving this one, please retry.")
+
+
+def encode_cursor(index: int, order: int) -> str:
+    """Opaque cursor for the position after the page at ``index`` (with ``order``)."""
+    return f"{index}.{order}"
+
+
+def decode_cursor(cursor: str) -> tuple[int, int]:
+    try:
+        index, order = cursor.split(".")
+        return int(index), int(order)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor.")
+
+
+async def page_window(db, comic_id, offset: int = 0, limit: int = 50, cursor: str | None = None,
+                      chapter_id=None) -> dict:
+    """
+    Up to ``limit`` pages in reading order, starting at page ``offset`` or after ``cursor``,
+    of the whole comic or of one chapter (indexes then count from the chapter's first page).
+    Cursors follow the (comic_id, order) index; offsets skip over it, so use them to jump.
+    """
+    query = {"comic_id": comic_id}
+    if chapter_id:
+        query["chapter_id"] = chapter_id
+    if cursor:
+        offset, after = decode_cursor(cursor)
+        query["order"] = {"$gt": after}
+        skip = 0
+    else:
+        skip = offset
+    projection = {"_id": 0, "order": 1, **{field: 1 for field in PAGE_FIELDS}}
+    found = await db.pages.find(query, projection).sort("order", 1).skip(skip).limit(limit + 1).to_list(length=limit + 1)
+
+    pages = []
+    for index, page in enumerate(found[:limit], start=offset):
+        if page.get("chapter_id"):
+            page["chapter_id"] = str(page["chapter_id"])
+        pages.append({"index": index, **page})
+    next_cursor = None
+    if len(found) > limit:
+        next_cursor = encode_cursor(pages[-1]["index"] + 1, pages[-1]["order"])
+    return {"pages": pages, "next_cursor": next_cursor}
+
+
+async def find_page(db, comic_id, filename: str, projection: dict | None = None) -> dict | None:
+    return await db.pages.find_one({"comic_id": comic_id, "filename": filename}, projection)
+
+
+async def storage_bytes(db, comic_id) -> int:
+    """Bytes of a comic's pages as uploaded (see stats.page_bytes)."""
+    result = await db.pages.aggregate([
+        {"$match": {"comic_id": comic_id}},
+        {"$group": {"_id": None, "bytes": {"$sum": {"$ifNull": ["$original_size", {"$ifNull": ["$size", 0]}]}}}},
+    ]).to_list(length=1)
+    return result[0]["bytes"] if result else 0
+
+
+async def list_chapters(db, comic_id) -> list[dict]:
+    chapters = await db.chapters.find({"comic_id": comic_id}, {"title": 1, "page_count": 1}).sort("order", 1).to_list(length=None)
+    return [{"id": str(chapter["_id"]), "title": chapter.get("title"), "page_count": chapter.get("page_count", 0)}
+            for chapter in chapters]
+
+
+async def ensure_indexes(db):
+    # one page per position; also serves the windowed reads and per-comic deletes
+    await db.pages.create_index([("comic_id", 1), ("order", 1)], unique=True)
+    # workers and the originals endpoint find a page by its file
+    await db.pages.create_index([("comic_id", 1), ("filename", 1)])
+    # one chapter's pages in reading order
+    await db.pages.create_index([("comic_id", 1), ("chapter_id", 1), ("order", 1)])
+    await db.chapters.create_index([("comic_id", 1), ("order", 1)])
@@ -0,0 +1,189 @@
+"""Reclaiming media that no comic references any more.
+
+Deleting a comic only removes its document and records a tombstone in
+``media_deletions``; `process_media_deletions` later removes the page files and
+renditions, the comic's page documents and chapters and users' saves and likes of
+the comic (``saved_comics``, ``likes``), in batches. Deleting single pages records a tombstone of just
+their files. `mark_and_sweep` is the safety net: it marks every
+filename referenced by a comic or page and sweeps files in media storage that
+nothing references.
+"""
+import asyncio
+import os
+from datetime import datetime, timezone
+from bson import ObjectId
+from storage import get_storage
+import pages
+import stats
+import variants
+from config import MEDIA_SWEEP_INTERVAL_HOURS, MEDIA_SWEEP_GRACE_HOURS, MEDIA_SWEEP_DRY_RUN
+
+SAMPLE_SIZE = 20  # orphans listed in a sweep report
+
+
+def page_filenames(page: dict) -> set[str]:
+    """Every media filename a page points at: the page, its original and renditions."""
+    names = {page["filename"]} if page.get("filename") else set()
+    urls = [value for key, value in page.items() if key == "url" or key.endswith("_url")]
+    names.update(os.path.basename(url) for url in urls if isinstance(url, str) and url)
+    return names
+
+
+def referenced_filenames(comic: dict) -> set[str]:
+    """Every media filename a comic document points at: its cover, and pages from before the
+    pages collection (scripts/migrate_pages.py)."""
+    names = page_filenames({"cover_url": comic.get("cover_url")})
+    for page in comic.get("files", []):
+        names.update(page_filenames(page))
+    return names
+
+
+def remove_media_files(filenames) -> int:
+    """Delete the given filenames (pages and originals) from storage; returns bytes freed."""
+    storage = get_storage()
+    freed = 0
+    for filename in filenames:
+        try:
+            freed += storage.delete(filename)
+            variants.purge(filename)
+        except Exception as e:
+            print(f" ❌ Error removing {filename}: {e}")
+    return freed
+
+
+async def queue_comic_deletion(db, comic: dict):
+    """Record a deleted comic so its media and references are reclaimed in the background."""
+    await db.media_deletions.insert_one({
+        "comic_id": comic["_id"],
+        "filenames": sorted(referenced_filenames(comic)),
+        "created_at": datetime.now(timezone.utc),
+    })
+
+
+async def delete_comic_cascade(db, comic_id: ObjectId) -> dict | None:
+    """Delete a comic document and queue its cascade. Returns the deleted document, if any."""
+    comic = await db.comics.find_one_and_delete({"_id": comic_id})
+    if comic:
+        # queued after the delete: a crash in between only leaves orphans for the sweep
+        await queue_comic_deletion(db, comic)
+        await stats.record_comic_deleted(db, comic, await pages.storage_bytes(db, comic_id))
+    return comic
+
+
+async def delete_pages(db, comic_id: ObjectId, query: dict) -> int:
+    """
+    Delete the comic's pages matching ``query`` (eg. one filename, or a chapter) and queue
+    their files for reclaiming. Keeps the comic's page count, cover and chapter page counts
+    in step. Returns how many pages were deleted.
+    """
+    found = await db.pages.find({"comic_id": comic_id, **query}).to_list(length=None)
+    if not found:
+        return 0
+    result = await db.pages.delete_many({"_id": {"$in": [page["_id"] for page in found]}})
+    filenames = set()
+    for page in found:
+        filenames.update(page_filenames(page))
+    await db.media_deletions.insert_one({"filenames": sorted(filenames), "created_at": datetime.now(timezone.utc)})
+
+    await db.comics.update_one({"_id": comic_id}, {"$inc": {"file_count": -result.deleted_count}})
+    per_chapter = {}
+    for page in found:
+        if page.get("chapter_id"):
+            per_chapter[page["chapter_id"]] = per_chapter.get(page["chapter_id"], 0) + 1
+    for chapter_id, count in per_chapter.items():
+        await db.chapters.update_one({"_id": chapter_id}, {"$inc": {"page_count": -count}})
+
+    # a deleted first page hands the cover on to the new first page
+    urls = [page.get("url") for page in found]
+    first = await db.pages.find_one({"comic_id": comic_id}, {"url": 1}, sort=[("order", 1)])
+    await db.comics.update_one(
+        {"_id": comic_id, "cover_url": {"$in": urls}},
+        {"$set": {"cover_url": first.get("url") if first else None}},
+    )
+    await stats.record_pages_deleted(db, found[:result.deleted_count])
+    return result.deleted_count
+
+
+async def process_media_deletions(db, batch_size: int = 100) -> int:
+    """Run the cascade for up to ``batch_size`` deleted comics; returns how many were processed."""
+    batch = await db.media_deletions.find().sort("created_at", 1).limit(batch_size).to_list(length=batch_size)
+    if not batch:
+        return 0
+
+    # tombstones of deleted pages (rather than comics) have no comic_id
+    comic_ids = [tombstone["comic_id"] for tombstone in batch if tombstone.get("comic_id")]
+    filenames = {name for tombstone in batch for name in tombstone.get("filenames", [])}
+    async for page in db.pages.find({"comic_id": {"$in": comic_ids}}, {"_id": 0, "comic_id": 0}).batch_size(1000):
+        filenames.update(page_filenames(page))
+    freed = await asyncio.to_thread(remove_media_files, filenames)
+
+    # page documents go after their files, so a crash in between leaves them to be retried
+    await db.pages.delete_many({"comic_id": {"$in": comic_ids}})
+    await db.chapters.delete_many({"comic_id": {"$in": comic_ids}})
+    await db.saved_comics.delete_many({"comic_id": {"$in": comic_ids}})
+    await db.likes.delete_many({"comic_id": {"$in": comic_ids}})
+    await db.media_deletions.delete_many({"_id": {"$in": [tombstone["_id"] for tombstone in batch]}})
+    print(f"✅ Reclaimed {freed} bytes from {len(batch)} deletions")
+    return len(batch)
+
+
+async def mark_and_sweep(db, dry_run: bool = True, grace_hours: float = MEDIA_SWEEP_GRACE_HOURS) -> dict:
+    """
+    Find media files no comic references and, unless ``dry_run``, delete them.
+    Files younger than ``grace_hours`` are skipped so uploads still being saved are never swept.
+    """
+    # mark
+    referenced = set()
+    cursor = db.comics.find({}, {"files": 1, "cover_url": 1}).batch_size(1000)
+    async for comic in cursor:
+        referenced.update(referenced_filenames(comic))
+    async for page in db.pages.find({}, {"_id": 0, "comic_id": 0}).batch_size(1000):
+        referenced.update(page_filenames(page))
+    # tombstoned files are already being reclaimed by the cascade
+    async for tombstone in db.media_deletions.find({}, {"filenames": 1}):
+        referenced.update(tombstone.get("filenames", []))
+
+    # sweep
+    def sweep():
+        storage = get_storage()
+        cutoff = datetime.now(timezone.utc).timestamp() - grace_hours * 60 * 60
+        orphans, reclaimable = [], 0
+        for filename, key, size, mtime in storage.iter_files():
+            if filename in referenced or mtime > cutoff:
+                continue
+            orphans.append(key)
+            reclaimable += size
+            if not dry_run:
+                try:
+                    storage.delete_key(key)
+                except Exception as e:
+                    print(f" ❌ Error removing {key}: {e}")
+        return orphans, reclaimable
+
+    orphans, reclaimable = await asyncio.to_thread(sweep)
+    return {
+        "dry_run": dry_run,
+        "referenced_files": len(referenced),
+        "orphaned_files": len(orphans),
+        "reclaimable_bytes": reclaimable,
+        "sample": orphans[:SAMPLE_SIZE],
+    }
+
+
+async def reclaim_loop(db, interval_seconds: int = 60):
+    """Drain the deletion queue continuously and mark-and-sweep periodically (run by the lease holder, see leader.py)."""
+    last_sweep = datetime.now(timezone.utc)
+    while True:
+        try:
+            while await process_media_deletions(db):
+                pass
+
+            since_sweep = (datetime.now(timezone.utc) - last_sweep).total_seconds()
+            if MEDIA_SWEEP_INTERVAL_HOURS and since_sweep >= MEDIA_SWEEP_INTERVAL_HOURS * 60 * 60:
+                last_sweep = datetime.now(timezone.utc)
+                report = await mark_and_sweep(db, dry_run=MEDIA_SWEEP_DRY_RUN)
+                action = "reclaimable" if report["dry_run"] else "reclaimed"
+                print(f"✅ Media sweep: {report['orphaned_files']} orphaned files, {report['reclaimable_bytes']} bytes {action}")
+        except Exception as e:
+            print(f" ❌ Error reclaiming media: {e}")
+        await asyncio.sleep(interval_seconds)
@@ -0,0 +1,88 @@
+"""Revoked access tokens, kept in memory so authorizing a request needs no database read.
+
+Tokens with claims (see models/auth.py) carry the user's ID and role, and `get_current_user`
+trusts them unless they are revoked. Revocations are documents in the ``revocations``
+collection. There is one per logged-out token (by its ``jti``), and one per user whose earlier
+tokens are all void, eg. after a role change (by the user's ID, with a ``not_before`` time).
+Each revocation expires (TTL index) when the tokens it covers would have expired anyway, so
+the set never holds more than one token lifetime's worth of revocations.
+
+Every API process reloads the set every REVOCATION_SYNC_SECONDS and applies its own
+revocations immediately, so a revocation takes effect everywhere within that interval.
+"""
+import asyncio
+import time
+from datetime import datetime, timedelta, timezone
+from config import ACCESS_TOKEN_EXPIRE_MINUTES, REVOCATION_SYNC_SECONDS
+
+
+class RevocationList:
+    """Revoked token IDs and per-user cutoffs (tokens issued before it are revoked)."""
+
+    def __init__(self):
+        self.tokens = set()
+        self.users = {}  # user ID -> not_before, as a timestamp
+
+    def is_revoked(self, claims: dict) -> bool:
+        if claims.get("jti") in self.tokens:
+            return True
+        not_before = self.users.get(claims.get("uid"))
+        return not_before is not None and claims.get("iat", 0) < not_before
+
+    def add(self, document: dict):
+        if document.get("jti"):
+            self.tokens.add(document["jti"])
+        if document.get("user_id"):
+            not_before = document["not_before"].replace(tzinfo=timezone.utc).timestamp()
+            self.users[document["user_id"]] = max(self.users.get(document["user_id"], 0), not_before)
+
+    async def load(self, db):
+        """Replace the set with the unexpired revocations in MongoDB."""
+        fresh = RevocationList()
+        async for document in db.revocations.find({"expires_at": {"$gt": datetime.now(timezone.utc)}}):
+            fresh.add(document)
+        self.tokens, self.users = fresh.tokens, fresh.users
+
+
+async def revoke_token(db, revocations: RevocationList, claims: dict):
+    """Revoke one token (logout). Tokens without a ``jti`` predate claims and can't be revoked singly."""
+    if not claims.get("jti"):
+        return
+    document = {
+        "_id": f"token:{claims['jti']}",
+        "jti": claims["jti"],
+        "expires_at": datetime.fromtimestamp(claims["exp"], tz=timezone.utc),
+    }
+    await db.revocations.replace_one({"_id": document["_id"]}, document, upsert=True)
+    revocations.add(document)
+
+
+async def revoke_user(db, revocations: RevocationList, user_id):
+    """Revoke every token issued to a user so far (role change, account removal)."""
+    # whole seconds, like the tokens' iat, so a token issued right after this still counts
+    now = datetime.fromtimestamp(int(time.time()), tz=timezone.utc)
+    document = {
+        "_id": f"user:{user_id}",
+        "user_id": str(user_id),
+        "not_before": now,
+        "expires_at": now + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES),
+    }
+    await db.revocations.replace_one({"_id": document["_id"]}, document, upsert=True)
+    revocations.add(document)
+
+
+async def maintain(db, revocations: RevocationList):
+    """Reload the revocations every REVOCATION_SYNC_SECONDS (the first load is done at startup)."""
+    while True:
+        await asyncio.sleep(REVOCATION_SYNC_SECONDS)
+        try:
+            await revocations.load(db)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f" ❌ Error syncing token revocations: {e}")
+
+
+async def ensure_indexes(db):
+    # revocations go away once the tokens they cover have expired
+    await db.revocations.create_index("expires_at", expireAfterSeconds=0)
@@ -1,22 +1,53 @@
 from fastapi import APIRouter, Request, Depends, HTTPException
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+from typing import Literal
 from dependencies import get_admin_user
 from bson import ObjectId
+from datetime import datetime, timezone
+import reclaim
+import jobs
+import stats
+import backup
+import admission
+import revocation
 
 router = APIRouter(prefix="/admin", tags=["admin"])
 
+class RoleUpdate(BaseModel):
+    role: Literal["reader", "artist", "admin"]
+
 @router.get("/stats")
 async def get_stats(request: Request, admin_user=Depends(get_admin_user)):
     '''Get basic platfrom statistics'''
     db = request.app.mongodb
 
-    total_users = await db.users.count_documents({})
-    total_comics = await db.comics.count_documents({})
+    # running totals are kept by the write endpoints (see stats.py)
+    totals = await db.stats.find_one({"_id": stats.TOTALS_ID})
+    if totals:
+        return {"total_users": totals.get("users", 0), "total_comics": totals.get("comics", 0)}
 
+    # not backfilled yet: collection metadata counts, still without a scan
     return {
-        "total_users": total_users,
-        "total_comics": total_comics
+        "total_users": await db.users.estimated_document_count(),
+        "total_comics": await db.comics.estimated_document_count(),
     }
 
+@router.get("/stats/dashboard")
+async def get_stats_dashboard(request: Request, admin_user=Depends(get_admin_user), days: int = 30, weeks: int = 12):
+    '''Totals plus daily and weekly signups, uploads, likes, saves and storage'''
+    if not (1 <= days <= 366 and 1 <= weeks <= 104):
+        raise HTTPException(status_code=400, detail="days must be 1-366 and weeks 1-104")
+    db = request.app.mongodb
+    return await stats.dashboard(db, days=days, weeks=weeks)
+
+@router.post("/stats/backfill")
+async def backfill_stats(request: Request, admin_user=Depends(get_admin_user)):
+    '''Queue a rebuild of the stats rollups from the users and comics collections'''
+    db = request.app.mongodb
+    job_id = await jobs.enqueue(db, "backfill_stats", {}, priority=jobs.PRIORITY_BACKFILL, max_attempts=1)
+    return {"message": "Stats backfill queued", "job_id": str(job_id)}
+
 @router.get("/users")
 async def list_users(request: Request, admin_user=Depends(get_admin_user), limit: int = 50): 
     '''List all users'''
@@ -31,15 +62,99 @@ async def list_users(request: Request, admin_user=Depends(get_admin_user), limit
 
     return {"users": users, "total": len(users)}
 
+@router.patch("/users/{user_id}/role")
+async def update_user_role(user_id: str, body: RoleUpdate, request: Request, admin_user=Depends(get_admin_user)):
+    '''Change a user's role; their current access tokens are revoked so the new role applies at once'''
+    db = request.app.mongodb
+    try:
+        object_id = ObjectId(user_id)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Invalid user ID: {e}")
+
+    result = await db.users.update_one({"_id": object_id}, {"$set": {"role": body.role}})
+    if not result.matched_count:
+        raise HTTPException(status_code=404, detail="User not found")
+    await revocation.revoke_user(db, request.app.revocations, object_id)
+    return {"message": f"Role changed to {body.role}; the user has to log in again"}
+
 @router.delete("/comics/{comic_id}")
-async def delete_comic(comic_id: str, request: Request):
+async def delete_comic(comic_id: str, request: Request, admin_user=Depends(get_admin_user)):
     '''Delete any comic'''
     db = request.app.mongodb
 
     try:
-        result = await db.comics.delete_one({"_id": ObjectId(comic_id)})
-        if result.deleted_count == 0:
+        # page files and saved_comics references are reclaimed in the background
+        deleted = await reclaim.delete_comic_cascade(db, ObjectId(comic_id))
+        if not deleted:
             raise HTTPException(status_code=404, detail="Comic not found")
         return {"message": "Comic successfully deleted"}
     except Exception as e:
-        raise HTTPException(status_code=400, detail=f"Error deleting comic: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=400, detail=f"Error deleting comic: {str(e)}")
+
+@router.post("/media/sweep")
+async def sweep_media(request: Request, admin_user=Depends(get_admin_user), dry_run: bool = True):
+    '''Find (and unless dry_run, delete) media files no comic references'''
+    db = request.app.mongodb
+    return await reclaim.mark_and_sweep(db, dry_run=dry_run)
+
+@router.get("/jobs")
+async def get_job_queue_stats(request: Request, admin_user=Depends(get_admin_user)):
+    '''Background job queue depth and latency'''
+    db = request.app.mongodb
+    return await jobs.queue_stats(db)
+
+@router.get("/admission")
+async def get_admission_metrics(admin_user=Depends(get_admin_user)):
+    '''Admission control counters per route class (of the API process that answers)'''
+    return admission.metrics()
+
+@router.get("/jobs/dead")
+async def list_dead_jobs(request: Request, admin_user=Depends(get_admin_user), limit: int = 50):
+    '''List dead-lettered jobs'''
+    db = request.app.mongodb
+
+    cursor = db.jobs.find({"status": jobs.DEAD}).sort("finished_at", -1).limit(limit)
+    dead = await cursor.to_list(length=limit)
+    for job in dead:
+        job["_id"] = str(job["_id"])
+    return {"jobs": dead, "total": len(dead)}
+
+@router.post("/jobs/{job_id}/retry")
+async def retry_dead_job(job_id: str, request: Request, admin_user=Depends(get_admin_user)):
+    '''Put a dead-lettered job back on the queue'''
+    db = request.app.mongodb
+
+    result = await db.jobs.update_one(
+        {"_id": ObjectId(job_id), "status": jobs.DEAD},
+        {"$set": {"status": jobs.QUEUED, "attempts": 0, "run_at": datetime.now(timezone.utc)},
+         "$unset": {"finished_at": ""}},
+    )
+    if result.modified_count == 0:
+        raise HTTPException(status_code=404, detail="Dead job not found")
+    return {"message": "Job requeued"}
+
+@router.get("/export/{collection}")
+async def export_collection(collection: str, request: Request, admin_user=Depends(get_admin_user), include_credentials: bool = False):
+    '''Stream comics or users as NDJSON (password hashes only with include_credentials)'''
+    if collection not in backup.COLLECTIONS:
+        raise HTTPException(status_code=404, detail=f"Can only export {', '.join(backup.COLLECTIONS)}")
+    db = request.app.mongodb
+
+    filename = f"{collection}-{datetime.now(timezone.utc):%Y%m%d-%H%M%S}.ndjson"
+    return StreamingResponse(
+        backup.export_ndjson(db, collection, include_credentials=include_credentials),
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+@router.post("/import/{collection}")
+async def import_collection(collection: str, request: Request, admin_user=Depends(get_admin_user)):
+    '''Upsert comics or users from an NDJSON request body, streamed in batches'''
+    if collection not in backup.COLLECTIONS:
+        raise HTTPException(status_code=404, detail=f"Can only import {', '.join(backup.COLLECTIONS)}")
+    db = request.app.mongodb
+
+    report = await backup.import_ndjson(db, collection, backup.iter_lines(request.stream()))
+    # the dashboard counters don't know about imported documents
+    await jobs.enqueue(db, "backfill_stats", {}, priority=jobs.PRIORITY_BACKFILL, max_attempts=1)
+    return report
@@ -1,8 +1,16 @@
-from fastapi import APIRouter, HTTPException, Request
+from fastapi import APIRouter, Depends, HTTPException, Request
+from starlette.concurrency import run_in_threadpool
 from pydantic import BaseModel, EmailStr
 from passlib.context import CryptContext
-from models.auth import create_access_token
+from models.auth import create_access_token, user_claims
+from dependencies import get_current_user
 from config import SECRET_KEY, ALGORITHM
+from datetime import datetime, timezone
+from bson import ObjectId
+from pymongo.errors import DuplicateKeyError
+import revocation
+import stats
+import userids
 
 router = APIRouter(prefix="/api", tags=["auth"])
 password_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
@@ -34,15 +42,6 @@ def validate_password(password: str) -> tuple[bool, str]:
         return False, "Password must contain at least one special character"
     return True, ""
 
-async def get_next_user_id(db):
-    result = await db.counters.find_one_and_update(
-        {"_id": "user_id"},               # find the counter document
-        {"$inc": {"seq": 1}},             # increment "seq" atomically
-        upsert=True,                      # create it if it doesn't exist
-        return_document=True
-    )
-    return result["seq"]
-
 @router.post("/signup")
 async def signup(user: UserSignup, request: Request):
     """Register a new user and create jwt"""
@@ -53,15 +52,11 @@ async def signup(user: UserSignup, request: Request):
     if not is_valid:
         raise HTTPException(status_code=400, detail=error_msg)
 
-    existing_user = await db.users.find_one({"email": user.email})
-    if existing_user:
-        raise HTTPException(status_code=400, detail="Email already registered")
-    
     print("Creating new user...")
-    next_id = await get_next_user_id(db)
-    access_token = create_access_token(data={"sub": user.email})
+    next_id = await userids.next_user_id(db)
 
-    hashed_password = password_context.hash(user.password)
+    # bcrypt is slow on purpose: hash off the event loop so other requests keep flowing
+    hashed_password = await run_in_threadpool(password_context.hash, user.password)
     
     # Validate and normalize role - NEVER allow "admin" from public signup
     user_role = user.role.lower() if user.role.lower() in ["artist", "reader"] else "reader"
@@ -71,16 +66,25 @@ async def signup(user: UserSignup, request: Request):
         user_role = "reader"  # Downgrade any admin attempts to reader
 
     new_user_data = {
+        "_id": ObjectId(),
         "name": user.name,
         "email": user.email,
         "password": hashed_password, # stores hashed password
         "id": next_id,
         "role": user_role,  # "artist" or "reader"
-        "access_token": access_token,
-        "token_type": "bearer"
+        "token_type": "bearer",
+        "created_at": datetime.now(timezone.utc),
     }
+    access_token = create_access_token(data=user_claims(new_user_data))
+    new_user_data["access_token"] = access_token
 
-    await db.users.insert_one(new_user_data)
+    # a single insert: the unique email index (see userids.py) rejects registered emails,
+    # also when two signups for one email race
+    try:
+        await db.users.insert_one(new_user_data)
+    except DuplicateKeyError:
+        raise HTTPException(status_code=400, detail="Email already registered")
+    await stats.record(db, period={"signups": 1}, totals={"users": 1})
     return {
         "message": f"{user.name} successfully registered",
         "access_token": access_token, 
@@ -94,12 +98,19 @@ async def login(credentials: UserLogin, request: Request):
     db = request.app.mongodb
 
     db_user = await db.users.find_one({"email": credentials.email})
-    if not db_user or not password_context.verify(credentials.password, db_user["password"]):
+    if not db_user or not await run_in_threadpool(password_context.verify, credentials.password, db_user["password"]):
         raise HTTPException(status_code=401, detail="Invalid email or password")
 
-    access_token = create_access_token(data={"sub": db_user["email"]})
+    access_token = create_access_token(data=user_claims(db_user))
     return {
         "message": f"Welcome back, {db_user['name']}!",
         "access_token": access_token,
         "token_type": "bearer"
-    }
\ No newline at end of file
+    }
+
+
+@router.post("/logout")
+async def logout(request: Request, current_user=Depends(get_current_user)):
+    """Revoke the access token this request was made with"""
+    await revocation.revoke_token(request.app.mongodb, request.app.revocations, request.state.token_claims)
+    return {"message": "Logged out"}
@@ -1,15 +1,27 @@
 from fastapi import APIRouter, File, Form, UploadFile, Depends, HTTPException, BackgroundTasks, Request
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response, FileResponse, RedirectResponse
+from pydantic import BaseModel, Field
 from typing import List
+import asyncio
 import os
 import uuid
 import json
+import hashlib
 from pathlib import Path
-from PIL import Image
 from dependencies import get_current_user
-from config import UPLOAD_DIR, MAX_FILE_SIZE, ALLOWED_EXTENSIONS
+from database import causal_session
+from config import UPLOAD_DIR, MAX_FILE_SIZE, ALLOWED_EXTENSIONS, UPLOAD_CONCURRENCY
 from datetime import datetime, timezone
 from bson import ObjectId
+import trending
+import stats
+import reclaim
+import jobs
+import search as search_engine
+import catalog as catalog_cache
+import fieldsets
+import pages as comic_pages
+from storage import get_storage
 
 
 class CustomJSONEncoder(json.JSONEncoder):
@@ -24,81 +36,111 @@ class CustomJSONEncoder(json.JSONEncoder):
 
 router = APIRouter(prefix="/api", tags=["comics"])
 
+
+class PageMove(BaseModel):
+    position: int = Field(ge=0)  # the page's new 0-based index in the comic
+
+class ChapterUpdate(BaseModel):
+    title: str = Field(min_length=1)
+
 # check upload directory exists
 Path(UPLOAD_DIR).mkdir(parents=True, exist_ok=True)
 
+
+def encode_saved_cursor(save: dict) -> str:
+    """Opaque cursor for the position after ``save`` in the saved-comics list."""
+    saved_at = save["saved_at"].replace(tzinfo=timezone.utc) if save["saved_at"].tzinfo is None else save["saved_at"]
+    return f"{int(saved_at.timestamp() * 1000)}.{save['_id']}"
+
+def decode_saved_cursor(cursor: str) -> tuple[datetime, ObjectId]:
+    try:
+        millis, save_id = cursor.split(".")
+        return datetime.fromtimestamp(int(millis) / 1000, timezone.utc), ObjectId(save_id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor.")
+
 def add_engagement_stats(comic):
-    """Add like and save counts to comic object"""
-    comic["like_count"] = len(comic.get("likes", []))
-    comic["save_count"] = len(comic.get("saves", []))
-    # Remove the arrays to keep response clean
+    """Replace the like and save arrays of a comic object, if it has them, with counts"""
     if "likes" in comic:
-        del comic["likes"]
+        comic["like_count"] = len(comic.pop("likes") or [])
     if "saves" in comic:
-        del comic["saves"]
+        comic["save_count"] = len(comic.pop("saves") or [])
     return comic
 
-def create_thumbnail(file_path: str, thumb_size=(400, 400)):
-    """Create thumbnail image in background."""
-    try:
-        image = Image.open(file_path)
-        image.thumbnail(thumb_size)
-        thumb_path = file_path.replace(".jpg", "_thumb.jpg")
-        image.save(thumb_path)
-        print(f"✅ Thumbnail created at {thumb_path}")
-    except Exception as e:
-        print(f" ❌ Error creating thumbnail: {e}")
-
-
-@router.post("/upload")
-async def upload_comic(
-    request: Request,
-    background_tasks: BackgroundTasks,
-    title: str = Form(...),
-    description: str = Form(""),
-    tags: str = Form(""),
-    files: List[UploadFile] = File(...),
-    current_user=Depends(get_current_user),
-):
-    """Upload comic files and save metadata to MongoDB database"""
-    # Check if user has artist role
-    if current_user.get("role") not in ["artist", "admin"]:
-        raise HTTPException(
-            status_code=403, 
-            detail="Only artists can upload comics. Please sign up as an artist to upload content."
-        )
-    
-    db = request.app.mongodb
-    saved_files = []
+def remove_files(filenames: List[str]):
+    """Best-effort removal of files written by a failed upload."""
+    reclaim.remove_media_files(filenames)
 
+async def save_uploaded_files(files: List[UploadFile]) -> List[dict]:
+    """
+    Validate and write the pages of one upload concurrently, at most UPLOAD_CONCURRENCY at a time.
+    Returns the new ``files`` entries in upload order. If any page fails, every file written
+    for this upload is removed before the error is raised.
+    """
+    # cheap checks first, so an obviously bad upload writes nothing
     for file in files:
-        # validate file extension
         extension = Path(file.filename).suffix.lower()
         if extension not in ALLOWED_EXTENSIONS:
             raise HTTPException(status_code=400, detail=f"File type {extension} not allowed.")
-        
-        # read and validate file size
-        contents = await file.read()
-        if len(contents) > MAX_FILE_SIZE:
-            raise HTTPException(status_code=413, detail="File size exceeds maximum limit.")
-        
-        # generate unique filename and save file
-        unique_filename = f"{uuid.uuid4().hex}{extension}"
-        file_path = os.path.join(UPLOAD_DIR, unique_filename)
 
-        with open(file_path, "wb") as f:
-            f.write(contents)
+    storage = get_storage()
+    semaphore = asyncio.Semaphore(UPLOAD_CONCURRENCY)
+    failed = asyncio.Event()
+    written_filenames = []
 
-        # create thumbnail in background
-        if extension in [".jpg", ".jpeg", ".png"]:
-            background_tasks.add_task(create_thumbnail, file_path)
+    async def save_one(file: UploadFile):
+        async with semaphore:
+            if failed.is_set():
+                return None
+            try:
+                # read and validate file size
+                contents = await file.read()
+                if len(contents) > MAX_FILE_SIZE:
+                    raise HTTPException(status_code=413, detail="File size exceeds maximum limit.")
 
-        saved_files.append({
-            "filename": unique_filename,
-            "original_filename": file.filename,
-            "url": f"/media/uploads/{unique_filename}"
-        })
+                # generate unique filename and save file off the event loop
+                extension = Path(file.filename).suffix.lower()
+                unique_filename = f"{uuid.uuid4().hex}{extension}"
+                written_filenames.append(unique_filename)
+                await asyncio.to_thread(storage.save_bytes, unique_filename, contents)
+            except BaseException:
+                failed.set()
+                raise
+
+            return {
+                "filename": unique_filename,
+                "original_filename": file.filename,
+                "url": storage.url(unique_filename),
+                "size": len(contents),
+            }
+
+    # gather (not cancel) so no write is still in flight when we clean up
+    results = await asyncio.gather(*(save_one(file) for file in files), return_exceptions=True)
+    errors = [result for result in results if isinstance(result, BaseException)]
+    if errors:
+        await asyncio.to_thread(remove_files, written_filenames)
+        raise next((e for e in errors if isinstance(e, HTTPException)), errors[0])
+    return results
+
+async def queue_page_processing(database, comic_id: ObjectId, filenames: List[str]):
+    """Queue optimization, metadata and thumbnails for new pages; worker.py processes run them."""
+    await jobs.enqueue_many(
+        database,
+        "process_page",
+        [{"comic_id": str(comic_id), "filename": filename} for filename in filenames],
+        priority=jobs.PRIORITY_UPLOAD,
+    )
+
+def ensure_artist(current_user):
+    """Only artists (and admins) may upload comics."""
+    if current_user.get("role") not in ["artist", "admin"]:
+        raise HTTPException(
+            status_code=403, 
+            detail="Only artists can upload comics. Please sign up as an artist to upload content."
+        )
 
+async def create_comic(db, current_user, title: str, description: str, tags: str, saved_files: List[dict]):
+    """Save a new comic for files already in media storage and queue their post-processing."""
     tags_list = [tag.strip().lower() for tag in tags.split(",") if tags.strip()]
 
     # Use the first page as the cover image
@@ -110,16 +152,32 @@ async def upload_comic(
         "description": description,
         "tags": tags_list,
         "author_id": current_user["id"],
-        "files": saved_files,
-        "file_count": len(saved_files),
+        "file_count": len(saved_files),  # the pages themselves go to the pages collection
         "cover_url": cover_url,  # First page as cover
         "uploaded_by": current_user["email"],
         "upload_date": datetime.now(timezone.utc),
         "published": True,  # Auto-publish new uploads
         "likes": [],  # Array of user IDs who liked this comic
-        "saves": []   # Array of user IDs who saved this comic
+        "saves": [],  # Array of user IDs who saved this comic
+        **trending.initial_fields(),
     }
-    result = await db.comics.insert_one(comic_data)
+    try:
+        result = await db.comics.insert_one(comic_data)
+    except Exception:
+        # don't leave orphaned page files behind
+        await asyncio.to_thread(remove_files, [f["filename"] for f in saved_files])
+        raise
+    try:
+        await comic_pages.insert_pages(db, result.inserted_id, saved_files)
+    except Exception:
+        await db.comics.delete_one({"_id": result.inserted_id})
+        await db.pages.delete_many({"comic_id": result.inserted_id})
+        await asyncio.to_thread(remove_files, [f["filename"] for f in saved_files])
+        raise
+
+    # thumbnails and page metadata are computed by the background workers
+    await queue_page_processing(db, result.inserted_id, [f["filename"] for f in saved_files])
+    await stats.record_upload(db, saved_files, new_comic=True)
 
     return {
         "message": f"'{title}' uploaded successfully!",
@@ -128,29 +186,65 @@ async def upload_comic(
         "files": saved_files
     }
 
+@router.post("/upload")
+async def upload_comic(
+    request: Request,
+    title: str = Form(...),
+    description: str = Form(""),
+    tags: str = Form(""),
+    files: List[UploadFile] = File(...),
+    current_user=Depends(get_current_user),
+):
+    """Upload comic files and save metadata to MongoDB database"""
+    ensure_artist(current_user)
+
+    db = request.app.mongodb
+    saved_files = await save_uploaded_files(files)
+    return await create_comic(db, current_user, title, description, tags, saved_files)
+
 @router.get("/comics")
 async def list_comics(
     request: Request, 
     search: str = None,
     tags: str = None,
     published: bool = None,
-    sort_by: str = "upload_date",
+    sort_by: str = None,
     order: str = "desc",
     limit: int = 20,
-    skip: int = 0
+    skip: int = 0,
+    fields: str = None,
 ):
     """
     List ALL comics with search, filter, sort, and pagination (no authentication required).
     
-    - **search**: Search in title, description (case-insensitive)
+    - **search**: Search in title, tags and description, with prefix and typo tolerant matching
     - **tags**: Comma-separated tags to filter by
     - **published**: Filter by published status (true/false)
-    - **sort_by**: Field to sort by (upload_date, title, file_count)
+    - **sort_by**: Field to sort by (upload_date, title, file_count, trending); searches
+      default to relevance
     - **order**: Sort order (asc/desc)
     - **limit**: Max results to return (default 20, max 100)
     - **skip**: Number of results to skip for pagination
+    - **fields**: Comma-separated fields to return (default: a summary for comic cards, "all" for everything)
     """
-    db = request.app.mongodb
+    # catalog read: may be served by a secondary
+    db = request.app.mongodb_catalog
+    requested_fields = fieldsets.parse_fields(fields)
+
+    # default listings of published comics are answered from the in-memory catalog (catalog.py)
+    cache = getattr(request.app, "catalog", None)
+    if (cache is not None and cache.ready and not search and published in (None, True)
+            and (sort_by or "upload_date") in catalog_cache.SORTS and cache.has_fields(requested_fields)):
+        tag_list = [tag.strip() for tag in tags.split(",")] if tags else None
+        limit = min(limit, 100)
+        total_count, comics = cache.page(sort_by or "upload_date", order, tag_list, skip, limit, requested_fields)
+        return JSONResponse(content=json.loads(json.dumps({
+            "comics": comics,
+            "total_count": total_count,
+            "limit": limit,
+            "skip": skip,
+            "has_more": (skip + len(comics)) < total_count,
+        }, cls=CustomJSONEncoder)))
     
     # build query filter - show all comics from all users
     query = {}
@@ -161,22 +255,38 @@ async def list_comics(
     else:
         query["published"] = published
 
-    # search in title and description
-    if search:
+    # filter by tags
+    tag_list = [tag.strip() for tag in tags.split(",")] if tags else None
+    if tag_list:
+        query["tags"] = {"$in": tag_list}
+
+    # search published comics with the in-process index (search.py) once it's ready,
+    # otherwise (or for unpublished comics) with a regex on title and description
+    index = getattr(request.app, "search_index", None)
+    use_index = bool(search) and index is not None and index.ready and query["published"] is True
+    ranked_ids = None
+    if use_index:
+        if sort_by is None:
+            # ranked by relevance: the index pages the results itself
+            total_matches, ranked_ids = index.search(search, tag_list, skip=skip, limit=min(limit, 100))
+            query["_id"] = {"$in": [ObjectId(comic_id) for comic_id in ranked_ids]}
+        else:
+            _, matches = index.search(search, tag_list, limit=search_engine.MAX_MATCHES)
+            query["_id"] = {"$in": [ObjectId(comic_id) for comic_id in matches]}
+    elif search:
         query["$or"] = [
             {"title": {"$regex": search, "$options": "i"}},
             {"description": {"$regex": search, "$options": "i"}}
         ]
-
-    # filter by tags
-    if tags:
-        tag_list = [tag.strip() for tag in tags.split(",")]
-        query["tags"] = {"$in": tag_list}
+    sort_by = sort_by or "upload_date"
 
     # validate and build sort 
-    valid_sort_fields = ["upload_date", "title", "file_count"]
+    valid_sort_fields = ["upload_date", "title", "file_count", "trending"]
 
-    if sort_by in valid_sort_fields:
+    if sort_by == "trending":
+        # Served by the (published, trending_score) and (tags, published, trending_score) indexes
+        sort_field = "trending_score"
+    elif sort_by in valid_sort_fields:
         sort_field = sort_by
     else:
         sort_field = "upload_date"
@@ -191,8 +301,14 @@ async def list_comics(
 
     try:
         # execute query with filters, sorting, and pagination
-        cursor = db.comics.find(query).sort(sort_field, sort_direction).skip(skip).limit(limit)
-        comics = await cursor.to_list(length=limit)
+        projection = fieldsets.projection(requested_fields)
+        if ranked_ids is not None:
+            comics = await db.comics.find(query, projection).to_list(length=limit)
+            position = {comic_id: rank for rank, comic_id in enumerate(ranked_ids)}
+            comics.sort(key=lambda comic: position[str(comic["_id"])])
+        else:
+            cursor = db.comics.find(query, projection).sort(sort_field, sort_direction).skip(skip).limit(limit)
+            comics = await cursor.to_list(length=limit)
 
         # Convert ObjectId and datetime to strings for JSON serialization
         for comic in comics:
@@ -202,18 +318,13 @@ async def list_comics(
                 comic["author_id"] = str(comic["author_id"])
             if "upload_date" in comic:
                 comic["upload_date"] = str(comic["upload_date"])
-            
-            # Get engagement stats BEFORE removing the arrays
-            likes = comic.get("likes", [])
-            saves = comic.get("saves", [])
-            comic["like_count"] = len(likes)
-            comic["save_count"] = len(saves)
-            
-            # Remove the arrays to keep response clean (they contain ObjectIds)
-            comic.pop("likes", None)
-            comic.pop("saves", None)
-
-        total_count = await db.comics.count_documents(query)
+            # whole documents: engagement arrays (of user ids) become counts
+            add_engagement_stats(comic)
+
+        if ranked_ids is not None:
+            total_count = total_matches
+        else:
+            total_count = await db.comics.count_documents(query)
 
         result = {
             "comics": comics,
@@ -230,13 +341,15 @@ async def list_comics(
         raise HTTPException(status_code=500, detail=f"Error retrieving comics: {str(e)}")
 
 @router.get("/comics/{comic_id}")
-async def get_comic(comic_id: str, request: Request):
+async def get_comic(comic_id: str, request: Request, background_tasks: BackgroundTasks):
     """Retrieve a single comic's metadata by ID"""
-    database = request.app.mongodb
     try:
-        comic = await database.comics.find_one({"_id": ObjectId(comic_id)})
+        comic = await request.app.mongodb_catalog.comics.find_one({"_id": ObjectId(comic_id)})
         if not comic:
             raise HTTPException(status_code=404, detail="Comic not found.")
+
+        # Count the view after the response has been sent
+        background_tasks.add_task(trending.record_event, request.app.mongodb, comic["_id"], "view")
         
         # Convert ObjectId and datetime to strings
         comic["_id"] = str(comic["_id"])
@@ -254,13 +367,208 @@ async def get_comic(comic_id: str, request: Request):
         raise HTTPException(status_code=400, detail=f"Invalid comic ID: {e}")
 
 
+@router.get("/comics/{comic_id}/manifest")
+async def get_comic_manifest(comic_id: str, request: Request):
+    """
+    Compact per-page layout data (dimensions, size, dominant colour, placeholder) so the
+    reader can lay out every page before any image has downloaded.
+    Served with an ETag so unchanged manifests revalidate as 304s.
+    """
+    database = request.app.mongodb_catalog
+    try:
+        comic = await database.comics.find_one({"_id": ObjectId(comic_id)}, {"title": 1})
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Invalid comic ID: {e}")
+    if not comic:
+        raise HTTPException(status_code=404, detail="Comic not found.")
+
+    page_fields = ("url", "thumbnail_url", "webp_url", "animated", "width", "height", "size", "color", "placeholder")
+    cursor = database.pages.find({"comic_id": comic["_id"]}, {"_id": 0, **dict.fromkeys(page_fields, 1)})
+    pages = [
+        {"index": index, **{key: page[key] for key in page_fields if page.get(key) is not None}}
+        for index, page in enumerate(await cursor.sort("order", 1).to_list(length=None))
+    ]
+    manifest = {
+        "comic_id": comic_id,
+        "title": comic.get("title"),
+        "page_count": len(pages),
+        "pages": pages,
+    }
+
+    body = json.dumps(manifest, separators=(",", ":"))
+    etag = f'"{hashlib.sha1(body.encode()).hexdigest()}"'
+    headers = {"ETag": etag, "Cache-Control": "public, max-age=60, stale-while-revalidate=300"}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+@router.get("/comics/{comic_id}/pages")
+async def get_comic_pages(
+    comic_id: str,
+    request: Request,
+    offset: int = 0,
+    limit: int = 50,
+    cursor: str = None,
+    chapter: str = None,
+):
+    """
+    A window of a comic's pages in reading order.
+
+    - **offset**: Index of the first page to return (default 0)
+    - **limit**: Max pages to return (default 50, max 200)
+    - **cursor**: ``next_cursor`` from the previous window, to read on from there
+    - **chapter**: Only this chapter's pages (an id from ``/chapters``); indexes then count from its first page
+    """
+    database = request.app.mongodb_catalog
+    offset = max(0, offset)
+    limit = max(1, min(limit, comic_pages.MAX_PAGE_WINDOW))
+    try:
+        comic = await database.comics.find_one({"_id": ObjectId(comic_id)}, {"file_count": 1})
+        chapter_id = ObjectId(chapter) if chapter else None
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Invalid comic or chapter ID: {e}")
+    if not comic:
+        raise HTTPException(status_code=404, detail="Comic not found.")
+
+    window = await comic_pages.page_window(database, comic["_id"], offset, limit, cursor, chapter_id)
+    return {"comic_id": comic_id, "page_count": comic.get("file_count", 0), **window}
+
+
+@router.get("/comics/{comic_id}/chapters")
+async def get_comic_chapters(comic_id: str, request: Request):
+    """A comic's chapters in reading order, with their page counts"""
+    database = request.app.mongodb_catalog
+    try:
+        comic = await database.comics.find_one({"_id": ObjectId(comic_id)}, {"_id": 1})
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Invalid comic ID: {e}")
+    if not comic:
+        raise HTTPException(status_code=404, detail="Comic not found.")
+    return {"comic_id": comic_id, "chapters": await comic_pages.list_chapters(database, comic["_id"])}
+
+
+async def find_own_comic(database, comic_id: str, current_user) -> dict:
+    """The comic, if the current user is its author (404/403 otherwise)."""
+    comic = await database.comics.find_one({"_id": ObjectId(comic_id)}, {"author_id": 1})
+    if not comic:
+        raise HTTPException(status_code=404, detail="Comic not found.")
+    # Compare author IDs as strings to handle ObjectId/int/string variants
+    if str(comic.get("author_id")) != str(current_user.get("id")):
+        raise HTTPException(status_code=403, detail="Not authorized to update this comic.")
+    return comic
+
+
+@router.patch("/comics/{comic_id}/pages/{filename}")
+async def move_comic_page(comic_id: str, filename: str, body: PageMove, request: Request,
+                          current_user=Depends(get_current_user)):
+    """Move a page to another position; only that page is rewritten"""
+    database = request.app.mongodb
+    try:
+        comic = await find_own_comic(database, comic_id, current_user)
+        order = await comic_pages.move_page(database, comic["_id"], filename, body.position)
+        if order is None:
+            raise HTTPException(status_code=404, detail="Page not found.")
+        # the cover follows whichever page is first
+        first = await database.pages.find_one({"comic_id": comic["_id"]}, {"url": 1}, sort=[("order", 1)])
+        await database.comics.update_one(
+            {"_id": comic["_id"], "cover_url": {"$ne": first.get("url")}},
+            {"$set": {"cover_url": first.get("url")}},
+        )
+        return {"message": "Page moved", "filename": filename, "position": body.position}
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Error moving page: {str(e)}")
+
+
+@router.delete("/comics/{comic_id}/pages/{filename}")
+async def delete_comic_page(comic_id: str, filename: str, request: Request, current_user=Depends(get_current_user)):
+    """Delete one page; its files are reclaimed in the background"""
+    database = request.app.mongodb
+    try:
+        comic = await find_own_comic(database, comic_id, current_user)
+        if not await reclaim.delete_pages(database, comic["_id"], {"filename": filename}):
+            raise HTTPException(status_code=404, detail="Page not found.")
+        return {"message": "Page deleted"}
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Error deleting page: {str(e)}")
+
+
+@router.patch("/comics/{comic_id}/chapters/{chapter_id}")
+async def rename_chapter(comic_id: str, chapter_id: str, body: ChapterUpdate, request: Request,
+                         current_user=Depends(get_current_user)):
+    """Rename a chapter"""
+    database = request.app.mongodb
+    try:
+        comic = await find_own_comic(database, comic_id, current_user)
+        result = await database.chapters.update_one(
+            {"_id": ObjectId(chapter_id), "comic_id": comic["_id"]},
+            {"$set": {"title": body.title}},
+        )
+        if not result.matched_count:
+            raise HTTPException(status_code=404, detail="Chapter not found.")
+        return {"message": "Chapter renamed", "id": chapter_id, "title": body.title}
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Error renaming chapter: {str(e)}")
+
+
+@router.delete("/comics/{comic_id}/chapters/{chapter_id}")
+async def delete_chapter(comic_id: str, chapter_id: str, request: Request, current_user=Depends(get_current_user)):
+    """Delete a chapter and its pages"""
+    database = request.app.mongodb
+    try:
+        comic = await find_own_comic(database, comic_id, current_user)
+        chapter = await database.chapters.find_one({"_id": ObjectId(chapter_id), "comic_id": comic["_id"]}, {"_id": 1})
+        if not chapter:
+            raise HTTPException(status_code=404, detail="Chapter not found.")
+        deleted = await reclaim.delete_pages(database, comic["_id"], {"chapter_id": chapter["_id"]})
+        await database.chapters.delete_one({"_id": chapter["_id"]})
+        return {"message": "Chapter deleted", "pages_deleted": deleted}
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Error deleting chapter: {str(e)}")
+
+
+@router.get("/comics/{comic_id}/originals/{filename}")
+async def get_page_original(comic_id: str, filename: str, request: Request, current_user=Depends(get_current_user)):
+    """Download the untouched upload of a page (comic author only)"""
+    database = request.app.mongodb
+    try:
+        comic = await database.comics.find_one({"_id": ObjectId(comic_id)}, {"author_id": 1})
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Invalid comic ID: {e}")
+    if not comic:
+        raise HTTPException(status_code=404, detail="Comic not found.")
+
+    # Compare author IDs as strings to handle ObjectId/int/string variants
+    if str(comic.get("author_id")) != str(current_user.get("id")):
+        raise HTTPException(status_code=403, detail="Not authorized to access this comic's originals.")
+    # Only serve files that belong to this comic (also rules out path traversal)
+    if not await comic_pages.find_page(database, comic["_id"], filename, {"_id": 1}):
+        raise HTTPException(status_code=404, detail="Page not found.")
+
+    # Pages that didn't need optimizing are served as uploaded; object storage hands out a presigned URL
+    download = await asyncio.to_thread(get_storage().original_download, filename)
+    if not download:
+        raise HTTPException(status_code=404, detail="Page file not found.")
+    if "url" in download:
+        return RedirectResponse(download["url"])
+    return FileResponse(download["path"])
+
+
 @router.delete("/comics/{comic_id}")
 async def delete_comic(comic_id: str, request: Request, current_user=Depends(get_current_user)):
     """Delete a comic by ID"""
     database = request.app.mongodb
 
     try:
-        comic = await database.comics.find_one({"_id": ObjectId(comic_id)})
+        comic = await database.comics.find_one({"_id": ObjectId(comic_id)}, {"author_id": 1})
         if not comic:
             raise HTTPException(status_code=404, detail="Comic not found.")
         
@@ -268,14 +576,15 @@ async def delete_comic(comic_id: str, request: Request, current_user=Depends(get
         if str(comic.get("author_id")) != str(current_user.get("id")):
             raise HTTPException(status_code=403, detail="Not authorized to delete this comic.")
         
-        await database.comics.delete_one({"_id": ObjectId(comic_id)})
+        # page files and saved_comics references are reclaimed in the background
+        await reclaim.delete_comic_cascade(database, ObjectId(comic_id))
         return {"message": "Comic deleted successfully."}
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Invalid comic ID: {e}")
     
 
 @router.get("/comics/tags")
-async def list_comic_tags(request: Request, current_user=Depends(get_current_user)):
+async def list_comic_tags(request: Request, current_user=Depends(get_current_user), session=Depends(causal_session)):
     """List all unique tags used by the current user's comics"""
     database = request.app.mongodb
 
@@ -288,7 +597,7 @@ async def list_comic_tags(request: Request, current_user=Depends(get_current_use
             {"$project": {"_id": 1}}
         ]
 
-        cursor = database.comics.aggregate(pipeline)
+        cursor = database.comics.aggregate(pipeline, session=session)
         result = await cursor.to_list(None)
         tags = [item["_id"] for item in result if item.get("_id")]
         
@@ -311,7 +620,7 @@ async def update_comic_tags(
     database = request.app.mongodb
 
     try:
-        comic = await database.comics.find_one({"_id": ObjectId(comic_id)})
+        comic = await database.comics.find_one({"_id": ObjectId(comic_id)}, {"author_id": 1})
         if not comic:
             raise HTTPException(status_code=404, detail="Comic not found.")
         
@@ -339,18 +648,18 @@ async def update_comic_tags(
 async def update_comic(
     comic_id: str,
     request: Request,
-    background_tasks: BackgroundTasks,
     title: str = Form(None),
     description: str = Form(None),
     tags: str = Form(None),
     files: List[UploadFile] = File(None),
+    chapter_title: str = Form(None),
     current_user=Depends(get_current_user)
 ):
-    """Update comic metadata and/or add new pages (chapters)"""
+    """Update comic metadata and/or add new pages, as a new chapter if ``chapter_title`` is given"""
     database = request.app.mongodb
 
     try:
-        comic = await database.comics.find_one({"_id": ObjectId(comic_id)})
+        comic = await database.comics.find_one({"_id": ObjectId(comic_id)}, {"author_id": 1})
         if not comic:
             raise HTTPException(status_code=404, detail="Comic not found.")
         
@@ -369,48 +678,25 @@ async def update_comic(
             tag_list = [tag.strip().lower() for tag in tags.split(",") if tag.strip()]
             update_data["tags"] = tag_list
         
-        # Add new pages if files provided
-        if files:
-            new_files = []
-            for file in files:
-                # validate file extension
-                extension = Path(file.filename).suffix.lower()
-                if extension not in ALLOWED_EXTENSIONS:
-                    raise HTTPException(status_code=400, detail=f"File type {extension} not allowed.")
-                
-                # read and validate file size
-                contents = await file.read()
-                if len(contents) > MAX_FILE_SIZE:
-                    raise HTTPException(status_code=413, detail="File size exceeds maximum limit.")
-                
-                # generate unique filename and save file
-                unique_filename = f"{uuid.uuid4().hex}{extension}"
-                file_path = os.path.join(UPLOAD_DIR, unique_filename)
-
-                with open(file_path, "wb") as f:
-                    f.write(contents)
-
-                # create thumbnail in background
-                if extension in [".jpg", ".jpeg", ".png"]:
-                    background_tasks.add_task(create_thumbnail, file_path)
-
-                new_files.append({
-                    "filename": unique_filename,
-                    "original_filename": file.filename,
-                    "url": f"/media/uploads/{unique_filename}"
-                })
-            
-            # Append new files to existing files
-            existing_files = comic.get("files", [])
-            updated_files = existing_files + new_files
-            update_data["files"] = updated_files
-            update_data["file_count"] = len(updated_files)
-        
         if update_data:
             await database.comics.update_one(
                 {"_id": ObjectId(comic_id)},
                 {"$set": update_data}
             )
+
+        # Add new pages if files provided, after the last page; existing pages aren't touched
+        if files:
+            new_files = await save_uploaded_files(files)
+            try:
+                appended = await comic_pages.append_pages(database, ObjectId(comic_id), new_files, chapter_title)
+            except Exception:
+                await asyncio.to_thread(remove_files, [f["filename"] for f in new_files])
+                raise
+            if not appended:
+                await asyncio.to_thread(remove_files, [f["filename"] for f in new_files])
+                raise HTTPException(status_code=404, detail="Comic not found.")
+            await queue_page_processing(database, ObjectId(comic_id), [f["filename"] for f in new_files])
+            await stats.record_upload(database, new_files, new_comic=False)
         
         return {
             "message": "Comic updated successfully",
@@ -429,21 +715,26 @@ async def save_comic(comic_id: str, request: Request, current_user=Depends(get_c
 
     try:
         # Check if comic exists
-        comic = await database.comics.find_one({"_id": ObjectId(comic_id)})
+        comic = await database.comics.find_one({"_id": ObjectId(comic_id)}, {"_id": 1})
         if not comic:
             raise HTTPException(status_code=404, detail="Comic not found.")
         
-        # Add to user's saved comics
-        await database.users.update_one(
-            {"_id": current_user["id"]},
-            {"$addToSet": {"saved_comics": ObjectId(comic_id)}}
+        # Record the save with its time (a no-op if already saved)
+        await database.saved_comics.update_one(
+            {"user_id": current_user["id"], "comic_id": ObjectId(comic_id)},
+            {"$setOnInsert": {"saved_at": datetime.now(timezone.utc)}},
+            upsert=True,
         )
         
         # Add user to comic's saves array
-        await database.comics.update_one(
+        result = await database.comics.update_one(
             {"_id": ObjectId(comic_id)},
             {"$addToSet": {"saves": current_user["id"]}}
         )
+        # Only a new save counts towards trending
+        if result.modified_count:
+            await trending.record_event(database, ObjectId(comic_id), "save")
+            await stats.record(database, period={"saves": 1}, totals={"saves": 1})
         
         return {"message": "Comic saved successfully"}
     except HTTPException:
@@ -459,16 +750,20 @@ async def unsave_comic(comic_id: str, request: Request, current_user=Depends(get
 
     try:
         # Remove from user's saved comics
-        await database.users.update_one(
-            {"_id": current_user["id"]},
-            {"$pull": {"saved_comics": ObjectId(comic_id)}}
+        save = await database.saved_comics.find_one_and_delete(
+            {"user_id": current_user["id"], "comic_id": ObjectId(comic_id)}, {"saved_at": 1}
         )
         
         # Remove user from comic's saves array
-        await database.comics.update_one(
+        result = await database.comics.update_one(
             {"_id": ObjectId(comic_id)},
             {"$pull": {"saves": current_user["id"]}}
         )
+        if result.modified_count:
+            # take off the weight the save was added with
+            if save:
+                await trending.record_event(database, ObjectId(comic_id), "save", sign=-1, occurred_at=save["saved_at"])
+            await stats.record(database, period={"saves": -1}, totals={"saves": -1})
         
         return {"message": "Comic removed from saved"}
     except Exception as e:
@@ -482,7 +777,7 @@ async def like_comic(comic_id: str, request: Request, current_user=Depends(get_c
 
     try:
         # Check if comic exists
-        comic = await database.comics.find_one({"_id": ObjectId(comic_id)})
+        comic = await database.comics.find_one({"_id": ObjectId(comic_id)}, {"_id": 1})
         if not comic:
             raise HTTPException(status_code=404, detail="Comic not found.")
         
@@ -491,7 +786,17 @@ async def like_comic(comic_id: str, request: Request, current_user=Depends(get_c
             {"_id": ObjectId(comic_id)},
             {"$addToSet": {"likes": current_user["id"]}}
         )
-        
+        # Only a new like counts towards trending
+        if result.modified_count:
+            # its time, so an unlike can take off the weight it added
+            await database.likes.update_one(
+                {"user_id": current_user["id"], "comic_id": ObjectId(comic_id)},
+                {"$set": {"liked_at": datetime.now(timezone.utc)}},
+                upsert=True,
+            )
+            await trending.record_event(database, ObjectId(comic_id), "like")
+            await stats.record(database, period={"likes": 1}, totals={"likes": 1})
+
         return {"message": "Comic liked successfully"}
     except HTTPException:
         raise
@@ -505,11 +810,21 @@ async def unlike_comic(comic_id: str, request: Request, current_user=Depends(get
     database = request.app.mongodb
 
     try:
+        like = await database.likes.find_one_and_delete(
+            {"user_id": current_user["id"], "comic_id": ObjectId(comic_id)}, {"liked_at": 1}
+        )
+
         # Remove user from comic's likes array
-        await database.comics.update_one(
+        result = await database.comics.update_one(
             {"_id": ObjectId(comic_id)},
             {"$pull": {"likes": current_user["id"]}}
         )
+        if result.modified_count:
+            # take off the weight the like was added with; likes from before like times were
+            # recorded never counted towards trending
+            if like:
+                await trending.record_event(database, ObjectId(comic_id), "like", sign=-1, occurred_at=like["liked_at"])
+            await stats.record(database, period={"likes": -1}, totals={"likes": -1})
         
         return {"message": "Comic unliked successfully"}
     except Exception as e:
@@ -517,39 +832,103 @@ async def unlike_comic(comic_id: str, request: Request, current_user=Depends(get
 
 
 @router.get("/users/me/saved")
-async def get_saved_comics(request: Request, current_user=Depends(get_current_user)):
-    """Get all comics saved by the current user"""
+async def get_saved_comics(
+    request: Request,
+    cursor: str = None,
+    limit: int = 20,
+    fields: str = None,
+    current_user=Depends(get_current_user),
+    session=Depends(causal_session),
+):
+    """
+    Comics saved by the current user, most recently saved first.
+
+    - **cursor**: ``next_cursor`` from the previous page
+    - **limit**: Max results to return (default 20, max 100)
+    - **fields**: Comma-separated fields to return (default: a summary for comic cards, "all" for everything)
+    """
     database = request.app.mongodb
+    limit = max(1, min(limit, 100))
+    requested_fields = fieldsets.parse_fields(fields)
+
+    query = {"user_id": current_user["id"]}
+    if cursor:
+        saved_at, save_id = decode_saved_cursor(cursor)
+        query["$or"] = [
+            {"saved_at": {"$lt": saved_at}},
+            {"saved_at": saved_at, "_id": {"$lt": save_id}},
+        ]
+
+    # One round trip: the page of saves, each joined with its comic's summary.
+    # Served by the (user_id, saved_at, _id) index on saved_comics.
+    pipeline = [
+        {"$match": query},
+        {"$sort": {"saved_at": -1, "_id": -1}},
+        {"$limit": limit + 1},
+        {"$lookup": {
+            "from": "comics",
+            "localField": "comic_id",
+            "foreignField": "_id",
+            "pipeline": fieldsets.pipeline(requested_fields),
+            "as": "comic",
+        }},
+        {"$unwind": {"path": "$comic", "preserveNullAndEmptyArrays": True}},
+    ]
 
     try:
-        # Get user with saved comics
-        user = await database.users.find_one({"_id": current_user["id"]})
-        saved_comic_ids = user.get("saved_comics", [])
-        
-        if not saved_comic_ids:
-            return {"comics": [], "total_count": 0}
-        
-        # Fetch all saved comics
-        comics = await database.comics.find(
-            {"_id": {"$in": saved_comic_ids}}
-        ).to_list(length=100)
-        
-        for comic in comics:
-            comic["_id"] = str(comic["_id"])
+        # one after the other: a session must not run two operations at once
+        page = await database.saved_comics.aggregate(pipeline, session=session).to_list(length=limit + 1)
+        # only the first page reports the total
+        total_count = None
+        if not cursor:
+            total_count = await database.saved_comics.count_documents({"user_id": current_user["id"]}, session=session)
+        has_more = len(page) > limit
+        page = page[:limit]
+
+        comics = []
+        for save in page:
+            comic = save.get("comic")
+            if not comic:
+                continue  # deleted, the cascade hasn't removed the save yet
+            if "author_id" in comic:
+                comic["author_id"] = str(comic["author_id"])
             if "upload_date" in comic:
                 comic["upload_date"] = str(comic["upload_date"])
-            add_engagement_stats(comic)
-        
-        return {
+            comic["saved_at"] = save["saved_at"]
+            comics.append(comic)
+
+        result = {
             "comics": comics,
-            "total_count": len(comics)
+            "limit": limit,
+            "has_more": has_more,
+            "next_cursor": encode_saved_cursor(page[-1]) if has_more else None,
+        }
+        if not cursor:
+            result["total_count"] = total_count
+        json_str = json.dumps(result, cls=CustomJSONEncoder)
+        return JSONResponse(content=json.loads(json_str))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error retrieving saved comics: {str(e)}")
+
+
+@router.get("/users/me/saved/ids")
+async def get_saved_comic_ids(request: Request, current_user=Depends(get_current_user), session=Depends(causal_session)):
+    """Get IDs of all comics saved by the current user"""
+    database = request.app.mongodb
+
+    try:
+        saves = database.saved_comics.find({"user_id": current_user["id"]}, {"comic_id": 1, "_id": 0}, session=session)
+        comic_ids = [str(save["comic_id"]) async for save in saves]
+        return {
+            "comic_ids": comic_ids,
+            "total_count": len(comic_ids)
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error retrieving saved comics: {str(e)}")
 
 
 @router.get("/users/me/liked")
-async def get_liked_comic_ids(request: Request, current_user=Depends(get_current_user)):
+async def get_liked_comic_ids(request: Request, current_user=Depends(get_current_user), session=Depends(causal_session)):
     """Get IDs of all comics liked by the current user"""
     database = request.app.mongodb
 
@@ -557,7 +936,8 @@ async def get_liked_comic_ids(request: Request, current_user=Depends(get_current
         # Find all comics where user is in the likes array
         comics = await database.comics.find(
             {"likes": current_user["id"]},
-            {"_id": 1}  # Only return the _id field
+            {"_id": 1},  # Only return the _id field
+            session=session,
         ).to_list(length=None)
         
         comic_ids = [str(comic["_id"]) for comic in comics]
@@ -571,13 +951,19 @@ async def get_liked_comic_ids(request: Request, current_user=Depends(get_current
 
 
 @router.get("/users/me/comics")
-async def get_my_comics(request: Request, current_user=Depends(get_current_user)):
+async def get_my_comics(
+    request: Request,
+    fields: str = None,
+    current_user=Depends(get_current_user),
+    session=Depends(causal_session),
+):
     """Get all comics uploaded by the current user"""
     database = request.app.mongodb
+    projection = fieldsets.projection(fieldsets.parse_fields(fields))
 
     try:
         comics = await database.comics.find(
-            {"author_id": current_user["id"]}
+            {"author_id": current_user["id"]}, projection, session=session
         ).sort("upload_date", -1).to_list(length=100)
         
         for comic in comics:
@@ -0,0 +1,41 @@
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import FileResponse
+from starlette.staticfiles import NotModifiedResponse
+import variants
+
+router = APIRouter(prefix="/media", tags=["media"])
+
+# a variant's URL names one image for good, like the page file's own URL (new pages get new filenames)
+CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+
+@router.get("/transform/{filename}")
+async def transform_page(filename: str, request: Request, w: int, format: str = variants.DEFAULT_FORMAT, q: int = variants.DEFAULT_QUALITY):
+    """A page image resized to an allowed width, in an allowed format and quality"""
+    if w not in variants.ALLOWED_WIDTHS:
+        raise HTTPException(status_code=400, detail=f"w must be one of {', '.join(map(str, variants.ALLOWED_WIDTHS))}.")
+    if format not in variants.ALLOWED_FORMATS:
+        raise HTTPException(status_code=400, detail=f"format must be one of {', '.join(variants.ALLOWED_FORMATS)}.")
+    if q not in variants.ALLOWED_QUALITIES:
+        raise HTTPException(status_code=400, detail=f"q must be one of {', '.join(map(str, variants.ALLOWED_QUALITIES))}.")
+    if not variants.is_transformable(filename):
+        raise HTTPException(status_code=404, detail="Page not found.")
+
+    try:
+        path, stat = await variants.get_cache().get(filename, w, format, q)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Page not found.")
+    except Exception as e:
+        print(f" ❌ Error transforming {filename}: {e}")
+        raise HTTPException(status_code=500, detail="Could not transform this page.")
+    response = FileResponse(
+        path,
+        stat_result=stat,
+        media_type=variants.ALLOWED_FORMATS[format],
+        headers={"Cache-Control": CACHE_CONTROL},
+    )
+    # revalidations are answered like the /media/uploads mount answers them
+    if_none_match = request.headers.get("if-none-match", "")
+    if response.headers["etag"] in [tag.strip(" W/") for tag in if_none_match.split(",")]:
+        return NotModifiedResponse(response.headers)
+    return response
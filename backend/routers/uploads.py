@@ -0,0 +1,326 @@
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import Response
+from pydantic import BaseModel, Field
+from typing import List
+import asyncio
+import os
+import uuid
+from pathlib import Path
+from datetime import datetime, timedelta, timezone
+from dependencies import get_current_user
+from config import (
+    STAGING_DIR, ALLOWED_EXTENSIONS, MAX_RESUMABLE_FILE_SIZE,
+    UPLOAD_CHUNK_SIZE, UPLOAD_SESSION_TTL_HOURS, PRESIGNED_URL_EXPIRE_SECONDS,
+)
+from routers.comics import ensure_artist, create_comic
+from storage import get_storage, LocalStorage, verify_direct_upload, content_type
+import media
+
+# Resumable upload protocol:
+#   POST /api/uploads                     -> create a session for one file
+#   PUT  /api/uploads/{id}?offset=N       -> write a chunk (raw body) at byte offset N
+#   GET  /api/uploads/{id}                -> current offset, to resume after a dropped connection
+#   POST /api/uploads/finalize            -> turn completed sessions into a comic
+# Session state lives in MongoDB and chunks are written straight to a staging file,
+# so an upload survives API worker restarts and never sits in memory.
+#
+# Direct uploads skip the API for the bytes altogether:
+#   POST /api/uploads/presign             -> a session plus a presigned PUT URL into media storage
+#   PUT  <url>                            -> the client uploads the file there
+#   POST /api/uploads/finalize            -> same as above; the object's size is checked first
+router = APIRouter(prefix="/api/uploads", tags=["uploads"])
+
+Path(STAGING_DIR).mkdir(parents=True, exist_ok=True)
+
+
+class UploadSessionCreate(BaseModel):
+    filename: str
+    size: int = Field(gt=0)
+
+class DirectUploadCreate(BaseModel):
+    filename: str
+    size: int = Field(gt=0)
+    content_type: str | None = None
+
+class UploadFinalize(BaseModel):
+    upload_ids: List[str]  # one per page, in page order
+    title: str
+    description: str = ""
+    tags: str = ""
+
+
+def staging_path(upload_id: str) -> str:
+    return os.path.join(STAGING_DIR, f"{upload_id}.part")
+
+def session_expiry() -> datetime:
+    return datetime.now(timezone.utc) + timedelta(hours=UPLOAD_SESSION_TTL_HOURS)
+
+def is_direct(session: dict) -> bool:
+    return session.get("kind") == "direct"
+
+def validate_upload(filename: str, size: int) -> str:
+    extension = Path(filename).suffix.lower()
+    if extension not in ALLOWED_EXTENSIONS:
+        raise HTTPException(status_code=400, detail=f"File type {extension} not allowed.")
+    if size > MAX_RESUMABLE_FILE_SIZE:
+        raise HTTPException(status_code=413, detail="File size exceeds maximum limit.")
+    return extension
+
+def session_status(session: dict) -> dict:
+    return {
+        "upload_id": session["_id"],
+        "filename": session["filename"],
+        "size": session["size"],
+        "offset": session["offset"],
+        "complete": session["offset"] >= session["size"],
+        "chunk_size": UPLOAD_CHUNK_SIZE,
+    }
+
+async def get_session(db, upload_id: str, current_user) -> dict:
+    session = await db.upload_sessions.find_one({"_id": upload_id})
+    if not session:
+        raise HTTPException(status_code=404, detail="Upload session not found or expired.")
+    if str(session.get("user_id")) != str(current_user.get("id")):
+        raise HTTPException(status_code=403, detail="Not authorized to access this upload.")
+    return session
+
+
+@router.post("")
+async def create_upload_session(body: UploadSessionCreate, request: Request, current_user=Depends(get_current_user)):
+    """Start a resumable upload for a single file"""
+    ensure_artist(current_user)
+    extension = validate_upload(body.filename, body.size)
+
+    db = request.app.mongodb
+    upload_id = uuid.uuid4().hex
+    # create the (empty) staging file so chunks can be written at any offset
+    await asyncio.to_thread(Path(staging_path(upload_id)).touch)
+
+    session = {
+        "_id": upload_id,
+        "user_id": current_user["id"],
+        "filename": body.filename,
+        "extension": extension,
+        "size": body.size,
+        "offset": 0,
+        "created_at": datetime.now(timezone.utc),
+        "expires_at": session_expiry(),
+    }
+    await db.upload_sessions.insert_one(session)
+    return session_status(session)
+
+
+@router.post("/presign")
+async def create_direct_upload(body: DirectUploadCreate, request: Request, current_user=Depends(get_current_user)):
+    """Start a direct upload: returns a presigned URL the client PUTs the file to"""
+    ensure_artist(current_user)
+    extension = validate_upload(body.filename, body.size)
+
+    db = request.app.mongodb
+    upload_id = uuid.uuid4().hex
+    stored_as = f"{uuid.uuid4().hex}{extension}"
+    upload = await asyncio.to_thread(
+        get_storage().presign_put, stored_as, body.content_type or content_type(body.filename), body.size,
+    )
+
+    await db.upload_sessions.insert_one({
+        "_id": upload_id,
+        "kind": "direct",
+        "user_id": current_user["id"],
+        "filename": body.filename,
+        "extension": extension,
+        "stored_as": stored_as,
+        "size": body.size,
+        "offset": 0,
+        "created_at": datetime.now(timezone.utc),
+        "expires_at": session_expiry(),
+    })
+    return {"upload_id": upload_id, "expires_in": PRESIGNED_URL_EXPIRE_SECONDS, **upload}
+
+
+@router.put("/direct/{filename}")
+async def direct_upload(filename: str, max_size: int, expires: int, signature: str, request: Request):
+    """Target of local storage's presigned URLs; the signature stands in for authentication"""
+    storage = get_storage()
+    if not isinstance(storage, LocalStorage):
+        raise HTTPException(status_code=404, detail="Not found.")
+    if not verify_direct_upload(filename, max_size, expires, signature):
+        raise HTTPException(status_code=403, detail="Upload URL is invalid or has expired.")
+
+    file_path = media.media_path(filename)
+    tmp_path = f"{file_path}.{uuid.uuid4().hex}.tmp"
+    os.makedirs(os.path.dirname(file_path), exist_ok=True)
+    received = 0
+    try:
+        with open(tmp_path, "wb") as f:
+            async for chunk in request.stream():
+                received += len(chunk)
+                if received > max_size:
+                    raise HTTPException(status_code=413, detail="Upload exceeds the declared file size.")
+                await asyncio.to_thread(f.write, chunk)
+        # a retried PUT replaces the object, like it would in S3
+        os.replace(tmp_path, file_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return Response(status_code=200)
+
+
+@router.get("/{upload_id}")
+async def get_upload_session(upload_id: str, request: Request, current_user=Depends(get_current_user)):
+    """Report how many bytes have been received, so the client knows where to resume"""
+    session = await get_session(request.app.mongodb, upload_id, current_user)
+    return session_status(session)
+
+
+@router.put("/{upload_id}")
+async def upload_chunk(upload_id: str, offset: int, request: Request, current_user=Depends(get_current_user)):
+    """
+    Write one chunk (the raw request body) at ``offset``.
+    The offset must be the session's current offset; retrying an already received chunk is a no-op.
+    """
+    db = request.app.mongodb
+    session = await get_session(db, upload_id, current_user)
+    if is_direct(session):
+        raise HTTPException(status_code=409, detail="Direct uploads are sent to their presigned URL.")
+
+    if offset < session["offset"]:
+        # chunk was already stored, eg. the response to a previous attempt was lost
+        await request.body()
+        return session_status(session)
+    if offset > session["offset"]:
+        raise HTTPException(status_code=409, detail=f"Expected offset {session['offset']}.")
+
+    received = 0
+    with open(staging_path(upload_id), "r+b") as f:
+        f.seek(offset)
+        async for chunk in request.stream():
+            received += len(chunk)
+            if received > UPLOAD_CHUNK_SIZE or offset + received > session["size"]:
+                raise HTTPException(status_code=413, detail="Chunk exceeds the chunk size or the declared file size.")
+            await asyncio.to_thread(f.write, chunk)
+        await asyncio.to_thread(os.fsync, f.fileno())
+
+    # Only advance if nobody else did in the meantime; anything past the stored
+    # offset in the staging file is simply overwritten by the next chunk
+    updated = await db.upload_sessions.find_one_and_update(
+        {"_id": upload_id, "offset": offset},
+        {"$set": {"offset": offset + received, "expires_at": session_expiry()}},
+        return_document=True,
+    )
+    if not updated:
+        raise HTTPException(status_code=409, detail="Upload offset changed concurrently, query the session and resume.")
+    return session_status(updated)
+
+
+@router.delete("/{upload_id}")
+async def abort_upload_session(upload_id: str, request: Request, current_user=Depends(get_current_user)):
+    """Abandon an upload and discard what has been received so far"""
+    db = request.app.mongodb
+    session = await get_session(db, upload_id, current_user)
+    result = await db.upload_sessions.delete_one({"_id": upload_id, "finalizing_at": {"$exists": False}})
+    if not result.deleted_count:
+        raise HTTPException(status_code=409, detail="This upload is being finalized.")
+    await discard_upload(session)
+    return {"message": "Upload aborted"}
+
+
+@router.post("/finalize")
+async def finalize_uploads(body: UploadFinalize, request: Request, current_user=Depends(get_current_user)):
+    """Create a comic from completed upload sessions (one per page, in order)"""
+    ensure_artist(current_user)
+    if not body.upload_ids:
+        raise HTTPException(status_code=400, detail="No uploads to finalize.")
+
+    db = request.app.mongodb
+    storage = get_storage()
+    # a page listed twice would give two pages sharing one file
+    upload_ids = list(dict.fromkeys(body.upload_ids))
+    sessions = [await get_session(db, upload_id, current_user) for upload_id in upload_ids]
+    for session in sessions:
+        if is_direct(session):
+            # the client uploaded to storage itself, so check what actually arrived
+            session["offset"] = await asyncio.to_thread(storage.size, session["stored_as"]) or 0
+            if session["offset"] > session["size"]:
+                raise HTTPException(status_code=413, detail=f"Upload {session['_id']} exceeds its declared size.")
+    incomplete = [s["_id"] for s in sessions if s["offset"] < s["size"]]
+    if incomplete:
+        raise HTTPException(status_code=409, detail=f"Uploads not complete: {', '.join(incomplete)}")
+
+    # Claim the sessions, so a concurrent finalize of any of them gets a 409 instead of racing
+    # this one for the staging files. If finalizing fails after this, the claimed sessions
+    # are left to expire (their files are cleaned up then, or by the media sweep).
+    claimed = []
+    for session in sessions:
+        if not await db.upload_sessions.find_one_and_update(
+            {"_id": session["_id"], "finalizing_at": {"$exists": False}},
+            {"$set": {"finalizing_at": datetime.now(timezone.utc)}},
+            projection={"_id": 1},
+        ):
+            await db.upload_sessions.update_many({"_id": {"$in": claimed}}, {"$unset": {"finalizing_at": ""}})
+            raise HTTPException(status_code=409, detail=f"Upload {session['_id']} is already being finalized or has expired.")
+        claimed.append(session["_id"])
+
+    # Move staged files into media storage (a rename for local storage on the same volume)
+    saved_files = []
+    for session in sessions:
+        if is_direct(session):
+            unique_filename = session["stored_as"]
+        else:
+            unique_filename = f"{uuid.uuid4().hex}{session['extension']}"
+            await asyncio.to_thread(os.truncate, staging_path(session["_id"]), session["size"])
+            await asyncio.to_thread(storage.save_file, unique_filename, staging_path(session["_id"]))
+        saved_files.append({
+            "filename": unique_filename,
+            "original_filename": session["filename"],
+            "url": storage.url(unique_filename),
+            "size": session["size"],
+        })
+
+    await db.upload_sessions.delete_many({"_id": {"$in": upload_ids}})
+    return await create_comic(db, current_user, body.title, body.description, body.tags, saved_files)
+
+
+def remove_staging_file(upload_id: str):
+    try:
+        os.remove(staging_path(upload_id))
+    except FileNotFoundError:
+        pass
+
+async def discard_upload(session: dict):
+    """Remove whatever an unfinished session left behind: its staging file or its uploaded object."""
+    if is_direct(session):
+        await asyncio.to_thread(get_storage().delete, session["stored_as"])
+    else:
+        remove_staging_file(session["_id"])
+
+
+async def expire_upload_sessions(db) -> int:
+    """Delete expired sessions and their staging files, plus staging files with no session."""
+    now = datetime.now(timezone.utc)
+    expired = await db.upload_sessions.find(
+        {"expires_at": {"$lt": now}}, {"_id": 1, "kind": 1, "stored_as": 1},
+    ).to_list(length=None)
+    for session in expired:
+        await discard_upload(session)
+    if expired:
+        await db.upload_sessions.delete_many({"_id": {"$in": [s["_id"] for s in expired]}})
+
+    # staging files left behind by a crash between finalize steps
+    cutoff = now.timestamp() - UPLOAD_SESSION_TTL_HOURS * 60 * 60
+    for path in Path(STAGING_DIR).glob("*.part"):
+        if path.stat().st_mtime < cutoff and not await db.upload_sessions.find_one({"_id": path.stem}, {"_id": 1}):
+            path.unlink(missing_ok=True)
+    return len(expired)
+
+
+async def expire_upload_sessions_loop(db, interval_seconds: int = 15 * 60):
+    """Periodically expire abandoned uploads (run by the lease holder, see leader.py)."""
+    while True:
+        try:
+            count = await expire_upload_sessions(db)
+            if count:
+                print(f"✅ Expired {count} abandoned upload sessions")
+        except Exception as e:
+            print(f" ❌ Error expiring upload sessions: {e}")
+        await asyncio.sleep(interval_seconds)
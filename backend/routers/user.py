@@ -2,10 +2,13 @@ from pydantic import BaseModel, EmailStr
 from typing import Optional
 from bson import ObjectId
 from dependencies import get_current_user
+from database import causal_session
+import fieldsets
 from fastapi import APIRouter, Depends, HTTPException, Request
 from fastapi.responses import JSONResponse
 import json
 from datetime import datetime
+import stats
 
 
 class CustomJSONEncoder(json.JSONEncoder):
@@ -33,6 +36,7 @@ async def add_user(user: dict, request: Request):
     try:
         result = await database.users.insert_one(user)
         if result.inserted_id:
+            await stats.record(database, period={"signups": 1}, totals={"users": 1})
             return {"user_id": str(result.inserted_id)}
         return None
     except Exception as e:
@@ -49,6 +53,7 @@ async def delete_user(user_id: str, request: Request, current_user=Depends(get_c
         
         result = await database.users.delete_one({"id": int(user_id)})
         if result.deleted_count:
+            await stats.record(database, totals={"users": -1})
             return {"message": "User deleted successfully"}
         raise HTTPException(status_code=404, detail="User not found.")
     except Exception as e:
@@ -65,12 +70,23 @@ async def get_current_user_info(current_user=Depends(get_current_user)):
     }
 
 @router.get("/me/comics")
-async def get_my_comics(request: Request, current_user=Depends(get_current_user)):
-    """Get all comics uploaded by the current user"""
+async def get_my_comics(
+    request: Request,
+    fields: str = None,
+    current_user=Depends(get_current_user),
+    session=Depends(causal_session),
+):
+    """
+    Get all comics uploaded by the current user
+
+    - **fields**: Comma-separated fields to return (default: a summary for comic cards, "all" for everything)
+    """
     db = request.app.mongodb
+    projection = fieldsets.projection(fieldsets.parse_fields(fields))
     
     try:
-        # Find all comics by this user (including unpublished drafts)
+        # Find all comics by this user (including unpublished drafts).
+        # Read-after-write view: the primary, in a causally consistent session
         # Query for both ObjectId and string author_id to support both formats
         user_id = current_user["_id"]
         cursor = db.comics.find({
@@ -78,7 +94,7 @@ async def get_my_comics(request: Request, current_user=Depends(get_current_user)
                 {"author_id": user_id},  # ObjectId format
                 {"author_id": str(user_id)}  # String format
             ]
-        }).sort("upload_date", -1)
+        }, projection, session=session).sort("upload_date", -1)
         comics = await cursor.to_list(length=None)
         
         # Convert ObjectId to string and add engagement stats
@@ -86,14 +102,11 @@ async def get_my_comics(request: Request, current_user=Depends(get_current_user)
             comic["_id"] = str(comic["_id"])
             if "upload_date" in comic:
                 comic["upload_date"] = str(comic["upload_date"])
-            # Add engagement stats
-            comic["like_count"] = len(comic.get("likes", []))
-            comic["save_count"] = len(comic.get("saves", []))
-            # Remove arrays to prevent serialization issues
+            # Whole documents: replace the engagement arrays with counts
             if "likes" in comic:
-                del comic["likes"]
+                comic["like_count"] = len(comic.pop("likes"))
             if "saves" in comic:
-                del comic["saves"]
+                comic["save_count"] = len(comic.pop("saves"))
         
         result = {"comics": comics}
         
@@ -12,6 +12,7 @@ sys.path.insert(0, str(parent_dir))
 
 from motor.motor_asyncio import AsyncIOMotorClient
 from config import MONGO_URI, DB_NAME
+import pages
 from datetime import datetime, timezone
 
 # Additional diverse comics
@@ -257,7 +258,6 @@ async def add_more_comics():
             "description": comic_data['description'],
             "tags": comic_data['tags'],
             "author_id": sample_user["id"],
-            "files": files,
             "file_count": len(files),
             "cover_url": files[0]["url"],
             "uploaded_by": sample_user["email"],
@@ -267,7 +267,8 @@ async def add_more_comics():
             "saves": []
         }
         
-        await db.comics.insert_one(comic_document)
+        result = await db.comics.insert_one(comic_document)
+        await pages.insert_pages(db, result.inserted_id, files)
         print(f"  ✅ Created {len(files)} pages\n")
     
     # Show summary
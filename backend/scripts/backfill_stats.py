@@ -0,0 +1,29 @@
+"""Rebuild the admin stats rollups (totals, daily and weekly buckets) from existing data.
+
+Run it once after deploying the stats counters, or whenever the totals look off.
+Admins can also queue it as a background job: POST /admin/stats/backfill.
+
+Usage:
+    python scripts/backfill_stats.py
+"""
+import asyncio
+import sys
+from pathlib import Path
+
+parent_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(parent_dir))
+
+from motor.motor_asyncio import AsyncIOMotorClient
+from config import MONGO_URI, DB_NAME
+import stats
+
+
+async def main():
+    client = AsyncIOMotorClient(MONGO_URI)
+    db = client[DB_NAME]
+    await stats.backfill(db)
+    client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,148 @@
+"""Measure API throughput and latency under concurrent load.
+
+With ``--compare``, starts the API twice on this machine and loads both in turn:
+the development setup (a single ``uvicorn main:app --reload`` process) and the production
+setup (``gunicorn -c gunicorn.conf.py``, one worker per core). Otherwise, loads an API
+that is already running at ``--url``.
+
+Load comes from several processes (``--processes``), each keeping ``--concurrency``
+requests in flight. The client can then push more requests than a single API process
+can serve. Any response other than 2xx counts as an error.
+
+All load comes from one client, which admission control rate limits (and each gunicorn
+worker keeps its own limits), so ``--compare`` starts both setups with ADMISSION_CONTROL=0.
+With ``--url``, start that API with ADMISSION_CONTROL=0 (or high limits) first, or most
+requests come back 429.
+
+Usage:
+    python scripts/benchmark_serving.py --compare [--duration 15] [--path /api/comics?limit=20]
+    python scripts/benchmark_serving.py --url http://localhost:8000 [--concurrency 64] [--processes 4]
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import signal
+import subprocess
+import time
+from pathlib import Path
+
+import httpx
+
+backend_dir = Path(__file__).parent.parent
+
+SETUPS = {
+    "uvicorn --reload (1 process)": ["uvicorn", "main:app", "--reload", "--host", "127.0.0.1", "--port", "{port}"],
+    "gunicorn (worker per core)": ["gunicorn", "-c", "gunicorn.conf.py", "--bind", "127.0.0.1:{port}", "main:app"],
+}
+
+
+async def load(url: str, paths: list[str], concurrency: int, duration: float):
+    """Keep ``concurrency`` requests in flight for ``duration`` seconds; returns (latencies, errors)."""
+    latencies, errors = [], 0
+    deadline = time.monotonic() + duration
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=30) as client:
+        async def user(index: int):
+            nonlocal errors
+            request_number = index
+            while time.monotonic() < deadline:
+                path = paths[request_number % len(paths)]
+                request_number += 1
+                start = time.perf_counter()
+                try:
+                    response = await client.get(path)
+                    if not response.is_success:
+                        errors += 1
+                        continue
+                except httpx.HTTPError:
+                    errors += 1
+                    continue
+                latencies.append(time.perf_counter() - start)
+
+        await asyncio.gather(*(user(index) for index in range(concurrency)))
+    return latencies, errors
+
+
+def load_process(args):
+    return asyncio.run(load(*args))
+
+
+def run_load(url: str, paths: list[str], concurrency: int, processes: int, duration: float) -> dict:
+    with multiprocessing.get_context("spawn").Pool(processes) as pool:
+        results = pool.map(load_process, [(url, paths, concurrency, duration)] * processes)
+    latencies = sorted(latency for process_latencies, _ in results for latency in process_latencies)
+    errors = sum(process_errors for _, process_errors in results)
+
+    def percentile(fraction):
+        return latencies[min(int(len(latencies) * fraction), len(latencies) - 1)] * 1000 if latencies else 0
+
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "rps": len(latencies) / duration,
+        "p50": percentile(0.50),
+        "p95": percentile(0.95),
+        "p99": percentile(0.99),
+    }
+
+
+def wait_until_up(url: str, process: subprocess.Popen, timeout: float = 60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"server exited with code {process.returncode}")
+        try:
+            if httpx.get(f"{url}/", timeout=1).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.5)
+    raise RuntimeError(f"server at {url} did not come up within {timeout}s")
+
+
+def benchmark_setup(name: str, command: list[str], port: int, args) -> dict:
+    url = f"http://127.0.0.1:{port}"
+    command = [part.format(port=port) for part in command]
+    # own process group, so the reloader's / master's children are stopped with it
+    # admission control would rate limit the single load client, see the docstring
+    server = subprocess.Popen(command, cwd=backend_dir, start_new_session=True,
+                              env={**os.environ, "ADMISSION_CONTROL": "0"},
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        wait_until_up(url, server)
+        print(f"Benchmarking {name} ({args.warmup:.0f}s warm-up, {args.duration:.0f}s measured)...")
+        run_load(url, args.path, args.concurrency, args.processes, args.warmup)
+        return run_load(url, args.path, args.concurrency, args.processes, args.duration)
+    finally:
+        os.killpg(server.pid, signal.SIGTERM)
+        server.wait(timeout=60)
+
+
+def print_results(results: dict):
+    print(f"\n{'setup':<32} {'req/s':>10} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'errors':>7}")
+    for name, result in results.items():
+        print(f"{name:<32} {result['rps']:>10.1f} {result['p50']:>9.1f} {result['p95']:>9.1f} "
+              f"{result['p99']:>9.1f} {result['errors']:>7}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--compare", action="store_true", help="start and compare the dev and production setups")
+    parser.add_argument("--url", default="http://localhost:8000", help="API to load when not comparing")
+    parser.add_argument("--port", type=int, default=8100, help="port for the servers started by --compare")
+    parser.add_argument("--path", action="append", help="path to request, repeatable (default: / and /api/comics)")
+    parser.add_argument("--concurrency", type=int, default=64, help="requests in flight per load process")
+    parser.add_argument("--processes", type=int, default=max((os.cpu_count() or 2) // 2, 1), help="load processes")
+    parser.add_argument("--duration", type=float, default=15, help="seconds measured per setup")
+    parser.add_argument("--warmup", type=float, default=3, help="seconds of unmeasured load first")
+    args = parser.parse_args()
+    args.path = args.path or ["/", "/api/comics?limit=20"]
+
+    if args.compare:
+        results = {name: benchmark_setup(name, command, args.port, args) for name, command in SETUPS.items()}
+    else:
+        print(f"Benchmarking {args.url} for {args.duration:.0f}s...")
+        results = {args.url: run_load(args.url, args.path, args.concurrency, args.processes, args.duration)}
+    print_results(results)
@@ -0,0 +1,179 @@
+"""Measure signups per second under concurrency.
+
+By default, runs the database side of signup in this process against a scratch database
+(``<DB_NAME>_signup_bench``, dropped afterwards), with ``--concurrency`` signups in flight,
+once per ID strategy:
+
+- ``counter``: the old flow. It checks the email with a ``find_one`` (on a plain email index),
+  takes an ID with an ``$inc`` on the shared counter, then inserts.
+- ``blocks``: the current flow (userids.py). It takes an ID from a reserved block, then inserts.
+  The unique email index rejects duplicates.
+
+Password hashing is left out, so the numbers show what the database costs per signup.
+Each strategy also gets a race check: ``--concurrency`` signups for one email at once, of
+which exactly one should succeed.
+
+With ``--url``, runs full signups (bcrypt included) against a running API instead.
+Signups are rate limited per client by admission control; start that API with
+ADMISSION_CONTROL=0 (or a high ``auth.rate``) first, or most requests come back 429.
+
+Usage:
+    python scripts/benchmark_signups.py [--signups 5000] [--concurrency 64] [--block-size 100]
+    python scripts/benchmark_signups.py --url http://localhost:8000 [--signups 500] [--concurrency 32]
+"""
+import argparse
+import asyncio
+import sys
+import time
+import uuid
+from datetime import datetime, timezone
+from pathlib import Path
+
+parent_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(parent_dir))
+
+import httpx
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+from config import MONGO_URI, DB_NAME, USER_ID_BLOCK_SIZE
+import userids
+
+PASSWORD = "Bench-passw0rd!"
+
+
+async def counter_signup(db, email: str) -> bool:
+    if await db.users.find_one({"email": email}, {"_id": 1}):
+        return False
+    counter = await db.counters.find_one_and_update(
+        {"_id": userids.COUNTER_ID}, {"$inc": {"seq": 1}}, upsert=True, return_document=ReturnDocument.AFTER
+    )
+    await db.users.insert_one({"email": email, "id": counter["seq"], "created_at": datetime.now(timezone.utc)})
+    return True
+
+
+def block_signup(allocator: userids.UserIdAllocator):
+    async def signup(db, email: str) -> bool:
+        user_id = await allocator.allocate(db)
+        try:
+            await db.users.insert_one({"email": email, "id": user_id, "created_at": datetime.now(timezone.utc)})
+        except DuplicateKeyError:
+            return False
+        return True
+    return signup
+
+
+async def run_concurrently(count: int, concurrency: int, attempt) -> tuple[list[float], int]:
+    """Run ``attempt(n)`` for n in range(count), ``concurrency`` at a time; returns (latencies, failures)."""
+    latencies, failures, queue = [], 0, iter(range(count))
+
+    async def worker():
+        nonlocal failures
+        for n in queue:
+            start = time.perf_counter()
+            if await attempt(n):
+                latencies.append(time.perf_counter() - start)
+            else:
+                failures += 1
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return latencies, failures
+
+
+def summarize(latencies: list[float], failures: int, elapsed: float) -> dict:
+    latencies = sorted(latencies)
+
+    def percentile(fraction):
+        return latencies[min(int(len(latencies) * fraction), len(latencies) - 1)] * 1000 if latencies else 0
+
+    return {
+        "signups": len(latencies),
+        "failed": failures,
+        "rate": len(latencies) / elapsed,
+        "p50": percentile(0.50),
+        "p95": percentile(0.95),
+        "p99": percentile(0.99),
+    }
+
+
+async def benchmark_database(args) -> dict:
+    client = AsyncIOMotorClient(MONGO_URI)
+    db = client[f"{DB_NAME}_signup_bench"]
+    strategies = {
+        "counter (find + $inc per signup)": (counter_signup, False),
+        f"blocks of {args.block_size} (insert only)": (block_signup(userids.UserIdAllocator(args.block_size)), True),
+    }
+    results = {}
+    try:
+        for name, (signup, unique_email) in strategies.items():
+            await client.drop_database(db.name)
+            if unique_email:
+                await userids.ensure_indexes(db)
+            else:
+                await db.users.create_index("email")
+            run = uuid.uuid4().hex[:8]
+            print(f"Benchmarking {name}...")
+            start = time.perf_counter()
+            latencies, failures = await run_concurrently(
+                args.signups, args.concurrency, lambda n: signup(db, f"bench-{run}-{n}@example.com")
+            )
+            results[name] = summarize(latencies, failures, time.perf_counter() - start)
+
+            # racing signups for one email: exactly one may get through
+            race = await asyncio.gather(*(signup(db, f"race-{run}@example.com") for _ in range(args.concurrency)))
+            accounts = await db.users.count_documents({"email": f"race-{run}@example.com"})
+            results[name]["race"] = f"{sum(race)} ok / {accounts} account(s)"
+            ids = await db.users.distinct("id")
+            results[name]["unique_ids"] = len(ids) == await db.users.count_documents({})
+    finally:
+        await client.drop_database(db.name)
+        client.close()
+    return results
+
+
+async def benchmark_api(args) -> dict:
+    run = uuid.uuid4().hex[:8]
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    statuses = {}
+    async with httpx.AsyncClient(base_url=args.url, limits=limits, timeout=60) as client:
+        async def attempt(n: int) -> bool:
+            try:
+                response = await client.post("/api/signup", json={
+                    "name": f"Bench {n}", "email": f"bench-{run}-{n}@example.com", "password": PASSWORD,
+                })
+            except httpx.HTTPError:
+                statuses["error"] = statuses.get("error", 0) + 1
+                return False
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+            return response.status_code == 200
+
+        print(f"Benchmarking signups at {args.url}...")
+        start = time.perf_counter()
+        latencies, failures = await run_concurrently(args.signups, args.concurrency, attempt)
+    result = summarize(latencies, failures, time.perf_counter() - start)
+    result["statuses"] = statuses
+    print(f"Bench accounts are named bench-{run}-*@example.com")
+    return {args.url: result}
+
+
+def print_results(results: dict):
+    print(f"\n{'strategy':<36} {'signups/s':>10} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'failed':>7}")
+    for name, result in results.items():
+        print(f"{name:<36} {result['rate']:>10.1f} {result['p50']:>9.1f} {result['p95']:>9.1f} "
+              f"{result['p99']:>9.1f} {result['failed']:>7}")
+        extra = {key: result[key] for key in ("race", "unique_ids", "statuses") if key in result}
+        if extra:
+            print(f"{'':<36} {extra}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="benchmark full signups against a running API instead")
+    parser.add_argument("--signups", type=int, default=None, help="signups per strategy (default 5000, 500 with --url)")
+    parser.add_argument("--concurrency", type=int, default=64, help="signups in flight")
+    parser.add_argument("--block-size", type=int, default=USER_ID_BLOCK_SIZE, help="IDs reserved per block")
+    args = parser.parse_args()
+    args.signups = args.signups or (500 if args.url else 5000)
+
+    results = asyncio.run(benchmark_api(args) if args.url else benchmark_database(args))
+    print_results(results)
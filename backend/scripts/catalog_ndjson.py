@@ -0,0 +1,76 @@
+"""Export or import the comics, pages, chapters and users collections as NDJSON.
+
+Exports stream from a server-side cursor and imports upsert in unordered batches,
+so either works for any collection size in constant memory. Imports merge into
+existing documents by _id. Afterwards a stats backfill is queued so the admin
+dashboard counts the imported documents.
+
+Usage:
+    python scripts/catalog_ndjson.py export comics > comics.ndjson
+    python scripts/catalog_ndjson.py export users --include-credentials -o users.ndjson
+    python scripts/catalog_ndjson.py import comics comics.ndjson [--batch-size 1000]
+    gunzip -c users.ndjson.gz | python scripts/catalog_ndjson.py import users -
+"""
+import argparse
+import asyncio
+import sys
+from pathlib import Path
+
+parent_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(parent_dir))
+
+from motor.motor_asyncio import AsyncIOMotorClient
+from config import MONGO_URI, DB_NAME
+import backup
+import jobs
+
+
+async def export(db, collection: str, output: str, include_credentials: bool, batch_size: int):
+    out = sys.stdout.buffer if output == "-" else open(output, "wb")
+    try:
+        async for chunk in backup.export_ndjson(db, collection, include_credentials, batch_size):
+            out.write(chunk)
+    finally:
+        if out is not sys.stdout.buffer:
+            out.close()
+    print(f"✅ Exported {collection}", file=sys.stderr)
+
+
+async def read_lines(path: str):
+    source = sys.stdin.buffer if path == "-" else open(path, "rb")
+    try:
+        for line in source:
+            yield line
+    finally:
+        if source is not sys.stdin.buffer:
+            source.close()
+
+
+async def main(args):
+    client = AsyncIOMotorClient(MONGO_URI)
+    db = client[DB_NAME]
+    if args.command == "export":
+        await export(db, args.collection, args.output, args.include_credentials, args.batch_size)
+    else:
+        report = await backup.import_ndjson(db, args.collection, read_lines(args.path), args.batch_size)
+        await jobs.enqueue(db, "backfill_stats", {}, priority=jobs.PRIORITY_BACKFILL, max_attempts=1)
+        print(f"✅ Imported {args.collection}: {report}")
+    client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    export_parser = commands.add_parser("export", help="write a collection as NDJSON")
+    export_parser.add_argument("collection", choices=backup.COLLECTIONS)
+    export_parser.add_argument("-o", "--output", default="-", help="output file, - for stdout")
+    export_parser.add_argument("--include-credentials", action="store_true", help="include users' password hashes")
+    export_parser.add_argument("--batch-size", type=int, default=backup.EXPORT_BATCH_SIZE, help="documents per cursor batch")
+
+    import_parser = commands.add_parser("import", help="upsert a collection from NDJSON")
+    import_parser.add_argument("collection", choices=backup.COLLECTIONS)
+    import_parser.add_argument("path", help="NDJSON file, - for stdin")
+    import_parser.add_argument("--batch-size", type=int, default=backup.IMPORT_BATCH_SIZE, help="documents per bulk write")
+
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,70 @@
+"""Show which replica set member serves catalog reads and which serves a user's own views.
+
+Runs a few reads through the same clients the API uses (see database.py) and reports the
+server each one went to, as seen by a pymongo command listener. Against a replica set,
+catalog reads should land on secondaries and causal-session reads on the primary.
+
+Usage:
+    MONGO_URI="mongodb://mongo-rs1:27017,mongo-rs2:27017,mongo-rs3:27017/?replicaSet=rs0" \\
+        python scripts/check_read_routing.py [--reads 20]
+"""
+import argparse
+import asyncio
+import sys
+from collections import Counter
+from pathlib import Path
+from types import SimpleNamespace
+
+parent_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(parent_dir))
+
+from pymongo import monitoring
+import database
+
+
+class ServerTally(monitoring.CommandListener):
+    """Counts find/aggregate/count commands per server address."""
+
+    def __init__(self):
+        self.servers = Counter()
+
+    def started(self, event):
+        if event.command_name in ("find", "aggregate", "count"):
+            host, port = event.connection_id
+            self.servers[f"{host}:{port}"] += 1
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+
+async def check(reads: int):
+    tally = ServerTally()
+    monitoring.register(tally)  # must happen before the clients are created
+    app = SimpleNamespace()
+    database.connect(app)
+
+    hello = await app.mongodb.command("hello")
+    print(f"Primary: {hello.get('primary', 'standalone')}, members: {', '.join(hello.get('hosts', []))}")
+
+    for _ in range(reads):
+        await app.mongodb_catalog.comics.find_one({"published": True})
+    print(f"Catalog reads ({reads}): {dict(tally.servers)}")
+    tally.servers.clear()
+
+    async with await app.mongodb_client.start_session(causal_consistency=True) as session:
+        await app.mongodb.counters.update_one({"_id": "read_routing_check"}, {"$inc": {"seq": 1}}, upsert=True, session=session)
+        for _ in range(reads):
+            await app.mongodb.counters.find_one({"_id": "read_routing_check"}, session=session)
+    print(f"Own-view reads ({reads}): {dict(tally.servers)}")
+    await app.mongodb.counters.delete_one({"_id": "read_routing_check"})
+    database.close(app)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--reads", type=int, default=20, help="reads per client")
+    args = parser.parse_args()
+    asyncio.run(check(args.reads))
@@ -10,6 +10,7 @@ parent_dir = Path(__file__).parent.parent
 sys.path.insert(0, str(parent_dir))
 
 from config import MONGO_URI, DB_NAME
+import revocation
 
 password_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
@@ -64,7 +65,9 @@ async def create_admin_user():
     if existing_user:
         # Update existing user to admin role
         await db.users.update_one({"email": email}, {"$set": {"role": "admin"}})
-        print(f"✅ Updated existing user '{email}' to admin role.")
+        # tokens carry the role: revoke the old ones so the next login gets an admin token
+        await revocation.revoke_user(db, revocation.RevocationList(), existing_user["_id"])
+        print(f"✅ Updated existing user '{email}' to admin role (they need to log in again).")
     else:
         # Create new admin user
         counter = await db.counters.find_one_and_update(
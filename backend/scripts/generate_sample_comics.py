@@ -14,6 +14,7 @@ sys.path.insert(0, str(parent_dir))
 
 from motor.motor_asyncio import AsyncIOMotorClient
 from config import MONGO_URI, DB_NAME
+import pages
 
 # Sample comic data
 SAMPLE_COMICS = [
@@ -316,7 +317,6 @@ async def upload_sample_comics():
             "description": comic_data['description'],
             "tags": comic_data['tags'],
             "author_id": sample_user["id"],
-            "files": files,
             "file_count": len(files),
             "cover_url": files[0]["url"],
             "uploaded_by": sample_user["email"],
@@ -326,7 +326,8 @@ async def upload_sample_comics():
             "saves": []
         }
         
-        await db.comics.insert_one(comic_document)
+        result = await db.comics.insert_one(comic_document)
+        await pages.insert_pages(db, result.inserted_id, files)
         print(f"  ✅ Uploaded to database ({len(files)} pages)")
     
     client.close()
@@ -0,0 +1,167 @@
+"""Move media from the flat upload layout into the hash-sharded one, without downtime.
+
+The /media mount serves both layouts, so files can be moved while the API is running:
+an old URL keeps resolving after its file moves, and the URL is rewritten afterwards.
+Comics (covers, and pages from before the pages collection) are migrated first, then the
+documents in ``pages``, so it doesn't matter whether scripts/migrate_pages.py ran before.
+Progress is checkpointed per collection in the ``migrations`` collection, so an interrupted
+run resumes where it stopped.
+
+Usage:
+    python scripts/migrate_media_layout.py [--workers 16] [--batch-size 500] [--restart]
+"""
+import argparse
+import asyncio
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from pathlib import Path
+
+parent_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(parent_dir))
+
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import UpdateOne
+from config import MONGO_URI, DB_NAME, UPLOAD_DIR, ORIGINALS_DIR
+import media
+import reclaim
+
+MIGRATION_ID = "media_layout_sharded"
+
+
+def move_to_shard(directory: str, filename: str) -> bool:
+    """Move one file from the flat layout into its shard. Safe to repeat."""
+    source = os.path.join(directory, filename)
+    if not os.path.isfile(source):
+        return False
+    target = os.path.join(directory, media.shard_dir(filename), filename)
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    os.replace(source, target)
+    return True
+
+
+def sharded_url(url):
+    """Rewrite a flat /media/uploads URL to the sharded one; anything else is returned unchanged."""
+    if isinstance(url, str) and url.startswith(media.MEDIA_URL_PREFIX) and "/" not in url[len(media.MEDIA_URL_PREFIX):]:
+        filename = url[len(media.MEDIA_URL_PREFIX):]
+        return f"{media.MEDIA_URL_PREFIX}{media.shard_dir(filename)}/{filename}"
+    return url
+
+
+def changed_urls(page: dict) -> dict:
+    """The page's URL fields that are still flat, rewritten to the sharded layout."""
+    changed = {key: sharded_url(value) for key, value in page.items() if key.endswith("_url") or key == "url"}
+    return {key: value for key, value in changed.items() if value != page[key]}
+
+
+def url_update(comic: dict):
+    """Targeted update rewriting only the comic's flat URLs, or None if there are none."""
+    updates, array_filters = {}, []
+    for index, page in enumerate(comic.get("files", [])):
+        changed = changed_urls(page)
+        if not changed or not page.get("filename"):
+            continue
+        # match pages by filename rather than position, so concurrent edits can't be clobbered
+        identifier = f"p{index}"
+        array_filters.append({f"{identifier}.filename": page["filename"]})
+        updates.update({f"files.$[{identifier}].{key}": value for key, value in changed.items()})
+
+    cover_url = sharded_url(comic.get("cover_url"))
+    if cover_url != comic.get("cover_url"):
+        updates["cover_url"] = cover_url
+
+    if not updates:
+        return None
+    return UpdateOne({"_id": comic["_id"]}, {"$set": updates}, array_filters=array_filters or None)
+
+
+def page_url_update(page: dict):
+    """Targeted update rewriting only a page document's flat URLs, or None if there are none."""
+    changed = changed_urls(page)
+    return UpdateOne({"_id": page["_id"]}, {"$set": changed}) if changed else None
+
+
+# collection, checkpoint field, projection, filenames of a document, URL update of a document
+PASSES = (
+    ("comics", "last_id", {"files": 1, "cover_url": 1}, reclaim.referenced_filenames, url_update),
+    ("pages", "last_page_id", None, reclaim.page_filenames, page_url_update),
+)
+
+
+async def migrate(workers: int, batch_size: int, restart: bool):
+    client = AsyncIOMotorClient(MONGO_URI)
+    db = client[DB_NAME]
+    loop = asyncio.get_running_loop()
+
+    if restart:
+        await db.migrations.delete_one({"_id": MIGRATION_ID})
+    checkpoint = await db.migrations.find_one({"_id": MIGRATION_ID}) or {}
+    moved, updated = checkpoint.get("moved", 0), checkpoint.get("updated", 0)
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for migration_pass in PASSES:
+            collection, checkpoint_field, projection = migration_pass[:3]
+            query = {"_id": {"$gt": checkpoint[checkpoint_field]}} if checkpoint.get(checkpoint_field) else {}
+            cursor = db[collection].find(query, projection).sort("_id", 1).batch_size(batch_size)
+            batch = []
+            async for document in cursor:
+                batch.append(document)
+                if len(batch) < batch_size:
+                    continue
+                moved, updated = await migrate_batch(db, pool, loop, migration_pass, batch, moved, updated)
+                batch = []
+            if batch:
+                moved, updated = await migrate_batch(db, pool, loop, migration_pass, batch, moved, updated)
+
+        # files no comic references (eg. renditions of deleted pages) are moved too
+        for directory in (UPLOAD_DIR, ORIGINALS_DIR):
+            if not os.path.isdir(directory):
+                continue
+            leftovers = [entry.name for entry in os.scandir(directory) if entry.is_file()]
+            results = await asyncio.gather(*(loop.run_in_executor(pool, move_to_shard, directory, name) for name in leftovers))
+            moved += sum(results)
+
+    await db.migrations.update_one(
+        {"_id": MIGRATION_ID},
+        {"$set": {"moved": moved, "updated": updated, "completed_at": datetime.now(timezone.utc)}},
+        upsert=True,
+    )
+    print(f"✅ Migration complete: moved {moved} files, rewrote URLs of {updated} comics and pages")
+    client.close()
+
+
+async def migrate_batch(db, pool, loop, migration_pass, batch, moved, updated):
+    """Move one batch's files in parallel, rewrite its URLs in bulk, then checkpoint."""
+    collection, checkpoint_field, _, filenames, update = migration_pass
+    jobs = [
+        loop.run_in_executor(pool, move_to_shard, directory, filename)
+        for document in batch
+        for filename in filenames(document)
+        for directory in (UPLOAD_DIR, ORIGINALS_DIR)
+    ]
+    moved += sum(await asyncio.gather(*jobs))
+
+    # files first, URLs second: the old URL resolves either way in between
+    operations = [op for op in (update(document) for document in batch) if op]
+    if operations:
+        result = await db[collection].bulk_write(operations, ordered=False)
+        updated += result.modified_count
+
+    await db.migrations.update_one(
+        {"_id": MIGRATION_ID},
+        {"$set": {checkpoint_field: batch[-1]["_id"], "moved": moved, "updated": updated,
+                  "updated_at": datetime.now(timezone.utc)}},
+        upsert=True,
+    )
+    print(f"  ...{moved} files moved, {updated} documents updated ({collection} checkpoint {batch[-1]['_id']})")
+    return moved, updated
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=16, help="parallel file moves")
+    parser.add_argument("--batch-size", type=int, default=500, help="comics or pages per batch / checkpoint")
+    parser.add_argument("--restart", action="store_true", help="ignore the saved checkpoint")
+    args = parser.parse_args()
+    asyncio.run(migrate(args.workers, args.batch_size, args.restart))
@@ -0,0 +1,76 @@
+"""Move comics' embedded ``files`` arrays into the ``pages`` collection.
+
+Each comic's pages are upserted by ``(comic_id, order)`` with one bulk write, then the
+array is removed from the comic, so the script can be interrupted and re-run, and the
+API can keep serving while it runs. Pages appended after the API upgrade get orders after
+the embedded ones (see pages.reserve_orders). If a comic still has a page at one of its
+embedded pages' orders with a different file, the comic is reported and left as it is,
+array included, so no page is dropped.
+
+Usage:
+    python scripts/migrate_pages.py [--batch-size 500]
+"""
+import argparse
+import asyncio
+import sys
+from datetime import datetime, timezone
+from pathlib import Path
+
+parent_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(parent_dir))
+
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import UpdateOne
+from config import MONGO_URI, DB_NAME
+import pages
+
+
+async def migrate(batch_size: int):
+    client = AsyncIOMotorClient(MONGO_URI)
+    db = client[DB_NAME]
+    await pages.ensure_indexes(db)
+    comics = moved = 0
+    collisions = []
+
+    cursor = db.comics.find({"files": {"$exists": True}}, {"files": 1, "upload_date": 1}).batch_size(batch_size)
+    async for comic in cursor:
+        files = comic["files"] or []
+        created_at = comic.get("upload_date") or datetime.now(timezone.utc)
+        # pages already at these orders are either this comic's own (an earlier, interrupted
+        # run) or other pages; upserting over the latter would silently drop an embedded page
+        existing = db.pages.find({"comic_id": comic["_id"], "order": {"$gte": 0, "$lt": len(files)}},
+                                {"order": 1, "filename": 1})
+        clashes = [page["order"] async for page in existing
+                   if page.get("filename") != files[page["order"]].get("filename")]
+        if clashes:
+            collisions.append((comic["_id"], clashes))
+            print(f" ❌ Comic {comic['_id']}: pages at orders {clashes[:10]} aren't its embedded pages, skipped")
+            continue
+        operations = [
+            UpdateOne(
+                {"comic_id": comic["_id"], "order": order},
+                {"$setOnInsert": {**page, "created_at": created_at}},
+                upsert=True,
+            )
+            for order, page in enumerate(files)
+        ]
+        if operations:
+            await db.pages.bulk_write(operations, ordered=False)
+        await db.comics.update_one({"_id": comic["_id"]}, {"$unset": {"files": ""}})
+        comics += 1
+        moved += len(files)
+        if comics % 100 == 0:
+            print(f"  ...{moved} pages of {comics} comics moved")
+
+    print(f"✅ Moved {moved} pages of {comics} comics to the pages collection")
+    if collisions:
+        print(f" ❌ {len(collisions)} comics skipped because of order collisions (their files arrays are kept): "
+              f"{', '.join(str(comic_id) for comic_id, _ in collisions[:20])}")
+    client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--batch-size", type=int, default=500, help="comics per cursor batch")
+    args = parser.parse_args()
+    asyncio.run(migrate(args.batch_size))
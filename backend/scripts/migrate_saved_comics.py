@@ -0,0 +1,51 @@
+"""Move users' embedded ``saved_comics`` arrays into the ``saved_comics`` collection.
+
+The arrays don't record when a comic was saved, so saves get a time derived from
+their position (later in the array = saved more recently), a second apart and
+ending at the time of the migration. Each user is migrated with one bulk upsert
+and then has the array removed, so the script can be interrupted and re-run.
+
+Usage:
+    python scripts/migrate_saved_comics.py
+"""
+import asyncio
+import sys
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+parent_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(parent_dir))
+
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import UpdateOne
+from config import MONGO_URI, DB_NAME
+
+
+async def migrate():
+    client = AsyncIOMotorClient(MONGO_URI)
+    db = client[DB_NAME]
+    now = datetime.now(timezone.utc)
+    users = saves = 0
+
+    cursor = db.users.find({"saved_comics.0": {"$exists": True}}, {"saved_comics": 1}).batch_size(500)
+    async for user in cursor:
+        saved = user["saved_comics"]
+        operations = [
+            UpdateOne(
+                {"user_id": user["_id"], "comic_id": comic_id},
+                {"$setOnInsert": {"saved_at": now - timedelta(seconds=len(saved) - 1 - position)}},
+                upsert=True,
+            )
+            for position, comic_id in enumerate(saved)
+        ]
+        await db.saved_comics.bulk_write(operations, ordered=False)
+        await db.users.update_one({"_id": user["_id"]}, {"$unset": {"saved_comics": ""}})
+        users += 1
+        saves += len(saved)
+
+    print(f"✅ Migrated {saves} saves of {users} users")
+    client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(migrate())
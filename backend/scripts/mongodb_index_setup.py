@@ -9,6 +9,10 @@ import sys
 sys.path.insert(0, str(parent_dir))
 
 from config import MONGO_URI, DB_NAME
+import jobs
+import pages
+import revocation
+import userids
 
 async def create_indexes():
     """Create MongoDB indexes for better search performance"""
@@ -21,11 +25,42 @@ async def create_indexes():
         ("description", "text")
     ])
 
+    # one account per email (signup relies on it)
+    await userids.ensure_indexes(db)
+
     # indexes for common queries
     await db.comics.create_index([("author_id", 1), ("upload_date", -1)])
     await db.comics.create_index([("author_id", 1), ("published", 1)])
     await db.comics.create_index("tags")
 
+    # index-backed trending sort, optionally filtered by tag
+    await db.comics.create_index([("published", 1), ("trending_score", -1)])
+    await db.comics.create_index([("tags", 1), ("published", 1), ("trending_score", -1)])
+
+    # pages by position in their comic (unique), and by file
+    await pages.ensure_indexes(db)
+
+    # resumable upload sessions are swept by expiry
+    await db.upload_sessions.create_index("expires_at")
+
+    # cascading deletes: drained oldest first, then removed from users' saves
+    await db.media_deletions.create_index("created_at")
+
+    # saved comics: one save per user and comic, listed by save time, removed by comic
+    await db.saved_comics.create_index([("user_id", 1), ("comic_id", 1)], unique=True)
+    await db.saved_comics.create_index([("user_id", 1), ("saved_at", -1), ("_id", -1)])
+    await db.saved_comics.create_index("comic_id")
+
+    # like times, so an unlike retracts the trending weight the like added
+    await db.likes.create_index([("user_id", 1), ("comic_id", 1)], unique=True)
+    await db.likes.create_index("comic_id")
+
+    # revoked access tokens expire with the tokens they cover
+    await revocation.ensure_indexes(db)
+
+    # background job queue (the worker also creates these on startup)
+    await jobs.ensure_indexes(db)
+
     print("✅ Indexes created successfully!")
     client.close()
 
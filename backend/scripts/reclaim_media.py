@@ -0,0 +1,45 @@
+"""Report or delete media files that no comic references.
+
+Usage:
+    python scripts/reclaim_media.py            # dry run: report reclaimable bytes only
+    python scripts/reclaim_media.py --delete   # delete orphaned files
+"""
+import argparse
+import asyncio
+import sys
+from pathlib import Path
+
+parent_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(parent_dir))
+
+from motor.motor_asyncio import AsyncIOMotorClient
+from config import MONGO_URI, DB_NAME, MEDIA_SWEEP_GRACE_HOURS
+import reclaim
+
+
+async def main(delete: bool, grace_hours: float):
+    client = AsyncIOMotorClient(MONGO_URI)
+    db = client[DB_NAME]
+
+    # finish any pending comic-delete cascades first
+    processed = 0
+    while batch := await reclaim.process_media_deletions(db):
+        processed += batch
+    print(f"Processed {processed} pending comic deletions")
+
+    report = await reclaim.mark_and_sweep(db, dry_run=not delete, grace_hours=grace_hours)
+    for path in report["sample"]:
+        print(f"  {path}")
+    action = "Deleted" if delete else "Would delete"
+    print(f"✅ {action} {report['orphaned_files']} orphaned files ({report['reclaimable_bytes'] / 1024 / 1024:.1f} MB)")
+
+    client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--delete", action="store_true", help="delete orphaned files (default is a dry run)")
+    parser.add_argument("--grace-hours", type=float, default=MEDIA_SWEEP_GRACE_HOURS,
+                        help="skip files modified more recently than this")
+    args = parser.parse_args()
+    asyncio.run(main(args.delete, args.grace_hours))
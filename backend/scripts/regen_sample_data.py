@@ -39,7 +39,9 @@ async def regen():
         "Dragon Rider Academy",
     ]
 
-    res = await db.comics.delete_many({"title": {"$in": titles_to_delete}})
+    comic_ids = await db.comics.distinct("_id", {"title": {"$in": titles_to_delete}})
+    res = await db.comics.delete_many({"_id": {"$in": comic_ids}})
+    await db.pages.delete_many({"comic_id": {"$in": comic_ids}})
     print(f"Deleted {res.deleted_count} sample comic documents from DB")
 
     # Re-run generators
@@ -0,0 +1,165 @@
+"""Regenerate thumbnails, renditions and page metadata for existing comics.
+
+Run it after changing THUMBNAIL_SIZE, MAX_IMAGE_DIMENSION, JPEG_QUALITY or the rendition
+formats. Pages are re-derived from their stored originals, so running it twice gives the
+same result. Pages are streamed by ``_id`` and processed in a local process pool. Each
+batch's results are written with one bulk write, and progress is checkpointed
+in the ``migrations`` collection, so an interrupted run resumes where it stopped (a finished
+run is only repeated with ``--restart``).
+``--max-mb-per-second`` caps how fast page bytes are read, to leave disk/network
+bandwidth for the live site.
+
+Renditions whose name changed (eg. a new thumbnail format) leave the old file behind;
+the media sweep (scripts/reclaim_media.py) removes those.
+
+Usage:
+    python scripts/reprocess_media.py [--workers 8] [--batch-size 1000] [--max-mb-per-second 50]
+                                      [--missing-only] [--restart]
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from pathlib import Path
+
+parent_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(parent_dir))
+
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import UpdateOne
+from config import MONGO_URI, DB_NAME
+from storage import get_storage
+from tasks import page_fields
+import media
+
+MIGRATION_ID = "reprocess_pages"  # checkpoints are page ids
+DEFAULT_PAGE_BYTES = 1024 * 1024  # throttling estimate for pages without a recorded size
+
+
+class Throttle:
+    """Paces callers so that on average no more than ``rate`` bytes per second go through."""
+
+    def __init__(self, bytes_per_second: float):
+        self.rate = bytes_per_second
+        self.start = time.monotonic()
+        self.total = 0
+
+    async def consume(self, nbytes: int):
+        if not self.rate:
+            return
+        self.total += nbytes
+        delay = self.start + self.total / self.rate - time.monotonic()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+def needs_processing(page: dict, missing_only: bool) -> bool:
+    if not page.get("filename"):
+        return False
+    return not missing_only or not (page.get("thumbnail_url") and page.get("width"))
+
+
+async def process_one(pool, throttle: Throttle, semaphore: asyncio.Semaphore, page: dict):
+    """Reprocess one page in the pool; returns its new fields, or None if it failed."""
+    filename = page["filename"]
+    await throttle.consume(page.get("original_size") or page.get("size") or DEFAULT_PAGE_BYTES)
+    async with semaphore:
+        loop = asyncio.get_running_loop()
+        try:
+            async with get_storage().workspace(filename) as (page_path, original_path):
+                meta = await loop.run_in_executor(pool, media.process_page, page_path, original_path)
+        except Exception as e:
+            print(f" ❌ Error reprocessing {filename}: {e}")
+            return None
+    return page_fields(meta)
+
+
+async def recompute_bytes_saved(db, comic_ids: list):
+    """bytes_saved is a running total kept by the upload worker; recompute it from the pages."""
+    totals = db.pages.aggregate([
+        {"$match": {"comic_id": {"$in": comic_ids}}},
+        {"$group": {"_id": "$comic_id", "bytes_saved": {"$sum": {"$ifNull": ["$bytes_saved", 0]}}}},
+    ])
+    operations = [UpdateOne({"_id": row["_id"]}, {"$set": {"bytes_saved": row["bytes_saved"]}}) async for row in totals]
+    if operations:
+        await db.comics.bulk_write(operations, ordered=False)
+
+
+async def reprocess(workers: int, batch_size: int, max_mb_per_second: float, missing_only: bool, restart: bool):
+    client = AsyncIOMotorClient(MONGO_URI)
+    db = client[DB_NAME]
+
+    if restart:
+        await db.migrations.delete_one({"_id": MIGRATION_ID})
+    checkpoint = await db.migrations.find_one({"_id": MIGRATION_ID}) or {}
+    query = {"_id": {"$gt": checkpoint["last_id"]}} if checkpoint.get("last_id") else {}
+    stats = {key: checkpoint.get(key, 0) for key in ("pages", "failed", "updated")}
+    stats["run_pages"], stats["started"] = 0, time.monotonic()
+
+    throttle = Throttle(max_mb_per_second * 1024 * 1024)
+    # keep a few pages queued per worker so the pool never waits on storage I/O
+    semaphore = asyncio.Semaphore(workers * 2)
+
+    projection = {"comic_id": 1, "filename": 1, "size": 1, "original_size": 1, "thumbnail_url": 1, "width": 1}
+    # spawn so workers don't inherit the event loop or open MongoDB sockets
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+        cursor = db.pages.find(query, projection).sort("_id", 1).batch_size(batch_size)
+        batch = []
+        async for page in cursor:
+            batch.append(page)
+            if len(batch) < batch_size:
+                continue
+            await reprocess_batch(db, pool, throttle, semaphore, batch, missing_only, stats)
+            batch = []
+        if batch:
+            await reprocess_batch(db, pool, throttle, semaphore, batch, missing_only, stats)
+
+    await db.migrations.update_one(
+        {"_id": MIGRATION_ID},
+        {"$set": {"completed_at": datetime.now(timezone.utc)}},
+        upsert=True,
+    )
+    print(f"✅ Reprocessing complete: {stats['pages']} pages processed ({stats['failed']} failed), "
+          f"{stats['updated']} pages updated")
+    client.close()
+
+
+async def reprocess_batch(db, pool, throttle, semaphore, batch, missing_only, stats):
+    """Reprocess one batch's pages in parallel, write the results in bulk, then checkpoint."""
+    todo = [page for page in batch if needs_processing(page, missing_only)]
+    fields = await asyncio.gather(*(process_one(pool, throttle, semaphore, page) for page in todo))
+    results = [(page, result) for page, result in zip(todo, fields) if result]
+    stats["pages"] += len(results)
+    stats["run_pages"] += len(results)
+    stats["failed"] += len(todo) - len(results)
+
+    operations = [UpdateOne({"_id": page["_id"]}, {"$set": result}) for page, result in results]
+    if operations:
+        result = await db.pages.bulk_write(operations, ordered=False)
+        stats["updated"] += result.modified_count
+        await recompute_bytes_saved(db, list({page["comic_id"] for page, _ in results}))
+
+    await db.migrations.update_one(
+        {"_id": MIGRATION_ID},
+        {"$set": {"last_id": batch[-1]["_id"], "pages": stats["pages"], "failed": stats["failed"],
+                  "updated": stats["updated"], "updated_at": datetime.now(timezone.utc)}},
+        upsert=True,
+    )
+    rate = stats["run_pages"] / (time.monotonic() - stats["started"])
+    print(f"  ...{stats['pages']} pages processed, {stats['failed']} failed, {stats['updated']} pages updated "
+          f"({rate:.1f} pages/s, checkpoint {batch[-1]['_id']})")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="processes in the pool")
+    parser.add_argument("--batch-size", type=int, default=1000, help="pages per batch / checkpoint")
+    parser.add_argument("--max-mb-per-second", type=float, default=0, help="page bytes read per second, 0 for no limit")
+    parser.add_argument("--missing-only", action="store_true", help="only pages without a thumbnail or dimensions")
+    parser.add_argument("--restart", action="store_true", help="ignore the saved checkpoint")
+    args = parser.parse_args()
+    asyncio.run(reprocess(args.workers, args.batch_size, args.max_mb_per_second, args.missing_only, args.restart))
@@ -0,0 +1,509 @@
+"""In-process full-text search over published comics.
+
+An inverted index with BM25 scoring over three boosted fields (title > tags > description).
+The last query word also matches as a prefix (search as you type), and words of four or more
+letters also match index terms a small edit distance away, found through a trigram index
+(typo tolerance). Results can be filtered by tags.
+
+The index is kept as two parts:
+
+- a base segment: an immutable snapshot file, memory-mapped. Only the term and document
+  tables are loaded into memory. Postings are read from the mapping when a query needs them,
+  and API workers on one machine share them through the page cache.
+- a delta: comics added or changed since the snapshot, in memory, plus the set of base
+  documents they replace or that were deleted.
+
+`maintain` builds the index at startup, or loads the last snapshot, and then follows the
+``comics`` change stream, resuming from the token saved with the snapshot. Every
+SEARCH_SNAPSHOT_SECONDS it merges the delta into a new snapshot. Change streams need a
+replica set. Against a standalone server, the index is rebuilt every SEARCH_POLL_SECONDS
+instead.
+"""
+import asyncio
+import bisect
+import math
+import mmap
+import os
+import re
+import struct
+import time
+from collections import defaultdict
+from pathlib import Path
+from bson import json_util
+from pymongo.errors import OperationFailure, PyMongoError
+from config import SEARCH_INDEX_DIR, SEARCH_SNAPSHOT_SECONDS, SEARCH_POLL_SECONDS
+
+FIELDS = ("title", "tags", "description")
+BOOSTS = (3.0, 2.0, 1.0)  # per field, in FIELDS order
+K1, B = 1.2, 0.75  # BM25 parameters
+PREFIX_WEIGHT = 0.9  # score multiplier of prefix matches
+FUZZY_WEIGHT = 0.7  # score multiplier of matches one edit away (halved again per extra edit)
+MAX_QUERY_TERMS = 8
+MAX_EXPANSIONS = 30  # index terms a query word can expand to through prefix/fuzzy matching
+MIN_FUZZY_LENGTH = 4
+MIN_PREFIX_LENGTH = 2
+MAX_MATCHES = 1000  # matches returned for sorting by something other than relevance
+
+MAGIC = b"PVSEARCH1\n"
+HEADER = struct.Struct("<Q")
+ENTRY = struct.Struct("<IHHH")  # docno, term frequency in title, tags, description
+SNAPSHOT_NAME = "comics.idx"
+# change stream events that can change what's indexed (likes, views and trending updates can't)
+WATCHED_FIELDS = "^(title|description|tags|published)(\\.|$)"
+CHANGE_PIPELINE = [
+    {"$match": {"$or": [
+        {"operationType": {"$in": ["insert", "replace", "delete"]}},
+        {"$expr": {"$gt": [{"$size": {"$filter": {
+            "input": {"$objectToArray": {"$ifNull": ["$updateDescription.updatedFields", {}]}},
+            "cond": {"$regexMatch": {"input": "$$this.k", "regex": WATCHED_FIELDS}},
+        }}}, 0]}},
+        {"updateDescription.removedFields": {"$in": ["title", "description", "tags", "published"]}},
+    ]}},
+    {"$project": {"operationType": 1, "documentKey": 1, **{f"fullDocument.{field}": 1 for field in (*FIELDS, "published")}}},
+]
+NOT_A_REPLICA_SET = 40573
+HISTORY_LOST = (280, 286)
+
+TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def tokenize(text) -> list[str]:
+    return TOKEN_RE.findall(str(text or "").lower())
+
+
+def trigrams(term: str) -> set[str]:
+    padded = f"${term}$"
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def edit_distance(a: str, b: str, limit: int) -> int:
+    """Levenshtein distance, or ``limit + 1`` as soon as it must be more than ``limit``."""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current = [i]
+        for j, char_b in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (char_a != char_b)))
+        if min(current) > limit:
+            return limit + 1
+        previous = current
+    return previous[-1]
+
+
+def max_edits(term: str) -> int:
+    if len(term) < MIN_FUZZY_LENGTH:
+        return 0
+    return 1 if len(term) < 8 else 2
+
+
+class Document:
+    """One indexed comic: its tags (for filtering), field lengths and term frequencies."""
+    __slots__ = ("comic_id", "tags", "lengths", "terms")
+
+    def __init__(self, comic_id: str, tags: list, lengths: tuple, terms: dict):
+        self.comic_id = comic_id
+        self.tags = tags
+        self.lengths = lengths
+        self.terms = terms  # term -> (tf title, tf tags, tf description)
+
+    @classmethod
+    def from_comic(cls, comic: dict):
+        tags = [tag for tag in comic.get("tags") or [] if isinstance(tag, str)]
+        field_tokens = (tokenize(comic.get("title")), tokenize(" ".join(tags)), tokenize(comic.get("description")))
+        terms = defaultdict(lambda: [0, 0, 0])
+        for field, tokens in enumerate(field_tokens):
+            for token in tokens:
+                terms[token][field] += 1
+        return cls(
+            str(comic["_id"]), tags,
+            tuple(len(tokens) for tokens in field_tokens),
+            {term: tuple(min(tf, 0xFFFF) for tf in counts) for term, counts in terms.items()},
+        )
+
+
+class Segment:
+    """An immutable, memory-mapped snapshot of the index (or an empty one)."""
+
+    def __init__(self, path: Path | None = None):
+        self.path = path
+        self.docs = []  # docno -> [comic_id, tags, lengths]
+        self.terms = {}  # term -> (offset, count)
+        self.resume_token = None
+        self.built_at = None
+        self._file = self._map = None
+        if path is not None:
+            self._open(path)
+        self.doc_index = {doc[0]: docno for docno, doc in enumerate(self.docs)}
+        self.sorted_terms = sorted(self.terms)
+        self.totals = [sum(doc[2][field] for doc in self.docs) for field in range(len(FIELDS))]
+
+    def _open(self, path: Path):
+        self._file = open(path, "rb")
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._map[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"{path} is not a search index snapshot")
+        (header_length,) = HEADER.unpack_from(self._map, len(MAGIC))
+        start = len(MAGIC) + HEADER.size
+        header = json_util.loads(self._map[start:start + header_length])
+        self.docs = header["docs"]
+        self.terms = header["terms"]
+        self.resume_token = header.get("resume_token")
+        self.built_at = header.get("built_at")
+        self._postings_start = start + header_length
+
+    def postings(self, term: str):
+        """(docno, term frequencies) of the documents containing ``term``."""
+        location = self.terms.get(term)
+        if location is None:
+            return
+        offset, count = location
+        start = self._postings_start + offset
+        for docno, *frequencies in ENTRY.iter_unpack(self._map[start:start + count * ENTRY.size]):
+            yield docno, frequencies
+
+    def close(self):
+        if self._map is not None:
+            self._map.close()
+            self._file.close()
+
+
+def write_segment(path: Path, documents: list[Document], base: Segment, live_base: list[int], resume_token) -> Segment:
+    """
+    Write a snapshot of the live base documents (``live_base``, by docno) and ``documents``
+    to ``path``, atomically, and return it opened. Runs in a thread: only reads the immutable
+    base segment and the document list handed to it.
+    """
+    docnos = {old: new for new, old in enumerate(live_base)}
+    docs = [base.docs[old] for old in live_base]
+    postings = defaultdict(list)
+    for term in base.terms:
+        for old, frequencies in base.postings(term):
+            if old in docnos:
+                postings[term].append((docnos[old], *frequencies))
+    for document in documents:
+        docno = len(docs)
+        docs.append([document.comic_id, document.tags, list(document.lengths)])
+        for term, frequencies in document.terms.items():
+            postings[term].append((docno, *frequencies))
+
+    terms, chunks, offset = {}, [], 0
+    for term in sorted(postings):
+        entries = postings[term]
+        chunks.append(b"".join(ENTRY.pack(*entry) for entry in entries))
+        terms[term] = (offset, len(entries))
+        offset += len(entries) * ENTRY.size
+    header = json_util.dumps({
+        "docs": docs, "terms": terms, "resume_token": resume_token, "built_at": time.time(),
+    }).encode()
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    temporary = path.with_suffix(f".{os.getpid()}.tmp")
+    with open(temporary, "wb") as file:
+        file.write(MAGIC)
+        file.write(HEADER.pack(len(header)))
+        file.write(header)
+        for chunk in chunks:
+            file.write(chunk)
+        file.flush()
+        os.fsync(file.fileno())
+    # opened before the rename: all workers share ``path``, and another one may replace it
+    # with its own snapshot before this one could re-open it
+    segment = Segment(temporary)
+    os.replace(temporary, path)
+    segment.path = path
+    return segment
+
+
+class SearchIndex:
+    """The base segment plus the in-memory delta, queried together."""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.base = Segment()
+        self.delta = {}  # comic_id -> Document, added or changed since the snapshot
+        self.delta_postings = defaultdict(set)  # term -> comic_ids in delta
+        self.removed = set()  # comic_ids whose base document is replaced or deleted
+        self.grams = defaultdict(set)  # trigram -> terms
+        self.totals = [0, 0, 0]
+        self.count = 0
+        self.resume_token = None
+        self.ready = False
+        self.compacting = False
+        self.changed = set()  # comic_ids changed while a snapshot is being written
+
+    # building and updating
+
+    def load_snapshot(self) -> bool:
+        if not self.path.exists():
+            return False
+        try:
+            segment = Segment(self.path)
+        except (OSError, ValueError) as e:
+            print(f" ❌ Error loading search index snapshot {self.path}: {e}")
+            return False
+        self.swap_base(segment, {}, set())
+        self.resume_token = segment.resume_token
+        return True
+
+    def swap_base(self, segment: Segment, delta: dict, removed: set):
+        old = self.base
+        self.base, self.delta, self.removed = segment, {}, set()
+        self.delta_postings = defaultdict(set)
+        self.grams = defaultdict(set)
+        for term in segment.sorted_terms:
+            for gram in trigrams(term):
+                self.grams[gram].add(term)
+        self.totals = list(segment.totals)
+        self.count = len(segment.docs)
+        for comic_id in removed | delta.keys():
+            self._remove(comic_id)
+        for document in delta.values():
+            self._add(document)
+        old.close()
+
+    def adopt(self, other: "SearchIndex"):
+        """Take over another index's contents (eg. a fresh build) and start serving from it."""
+        old = self.base
+        for name in ("base", "delta", "delta_postings", "removed", "grams", "totals", "count"):
+            setattr(self, name, getattr(other, name))
+        self.resume_token = None
+        self.ready = True
+        if old is not self.base:
+            old.close()
+
+    def _base_lengths(self, comic_id: str):
+        docno = self.base.doc_index.get(comic_id)
+        if docno is None or comic_id in self.removed:
+            return None
+        return self.base.docs[docno][2]
+
+    def _remove(self, comic_id: str):
+        document = self.delta.pop(comic_id, None)
+        if document is not None:
+            lengths = document.lengths
+            for term in document.terms:
+                self.delta_postings[term].discard(comic_id)
+        else:
+            lengths = self._base_lengths(comic_id)
+            if lengths is None:
+                return
+            self.removed.add(comic_id)
+        self.count -= 1
+        for field, length in enumerate(lengths):
+            self.totals[field] -= length
+
+    def _add(self, document: Document):
+        if document.comic_id in self.base.doc_index:
+            self.removed.add(document.comic_id)
+        self.delta[document.comic_id] = document
+        for term in document.terms:
+            if term not in self.delta_postings and term not in self.base.terms:
+                for gram in trigrams(term):
+                    self.grams[gram].add(term)
+            self.delta_postings[term].add(document.comic_id)
+        self.count += 1
+        for field, length in enumerate(document.lengths):
+            self.totals[field] += length
+
+    def upsert(self, comic: dict):
+        """Index a comic, or drop it from the index if it's not published."""
+        comic_id = str(comic["_id"])
+        self._remove(comic_id)
+        if comic.get("published"):
+            self._add(Document.from_comic(comic))
+        if self.compacting:
+            self.changed.add(comic_id)
+
+    def delete(self, comic_id):
+        self._remove(str(comic_id))
+        if self.compacting:
+            self.changed.add(str(comic_id))
+
+    def apply(self, change: dict):
+        """Apply one event from the comics change stream."""
+        comic_id = change["documentKey"]["_id"]
+        if change["operationType"] == "delete" or not change.get("fullDocument"):
+            self.delete(comic_id)
+        else:
+            self.upsert({**change["fullDocument"], "_id": comic_id})
+
+    async def snapshot(self):
+        """Merge the delta into a new base segment, written in a thread while queries go on."""
+        live_base = [docno for docno, doc in enumerate(self.base.docs) if doc[0] not in self.removed]
+        documents = list(self.delta.values())
+        frozen = dict(self.delta)
+        resume_token = self.resume_token
+        self.compacting, self.changed = True, set()
+        try:
+            segment = await asyncio.to_thread(write_segment, self.path, documents, self.base, live_base, resume_token)
+        finally:
+            self.compacting = False
+        # changes that arrived while writing are replayed over the new base
+        delta = {comic_id: document for comic_id, document in self.delta.items() if frozen.get(comic_id) is not document}
+        removed = {comic_id for comic_id in self.changed if comic_id not in delta}
+        self.swap_base(segment, delta, removed)
+        print(f"✅ Search index snapshot written: {self.count} comics, {len(segment.terms)} terms")
+
+    # querying
+
+    def document_frequency(self, term: str) -> int:
+        # base counts still include replaced or deleted documents until the next snapshot
+        base = self.base.terms.get(term)
+        return min((base[1] if base else 0) + len(self.delta_postings.get(term, ())), self.count)
+
+    def has_term(self, term: str) -> bool:
+        return term in self.base.terms or bool(self.delta_postings.get(term))
+
+    def expand(self, word: str, last: bool) -> dict:
+        """Index terms ``word`` matches, with their weights: itself, prefix and fuzzy matches."""
+        expansions = {word: 1.0} if self.has_term(word) else {}
+        if last and len(word) >= MIN_PREFIX_LENGTH:
+            terms = self.base.sorted_terms
+            position = bisect.bisect_left(terms, word)
+            candidates = []
+            while position < len(terms) and terms[position].startswith(word) and len(candidates) < MAX_EXPANSIONS:
+                candidates.append(terms[position])
+                position += 1
+            candidates += [term for term, ids in self.delta_postings.items() if ids and term.startswith(word)]
+            for term in sorted(candidates, key=len)[:MAX_EXPANSIONS]:
+                expansions.setdefault(term, PREFIX_WEIGHT)
+        edits = max_edits(word)
+        if edits:
+            grams = trigrams(word)
+            shared = defaultdict(int)
+            for gram in grams:
+                for term in self.grams.get(gram, ()):
+                    shared[term] += 1
+            # at most a few trigrams differ per edit, so skip terms that share too few
+            threshold = max(len(grams) - 3 * edits, 1)
+            fuzzy = []
+            for term, count in shared.items():
+                if count >= threshold and term not in expansions:
+                    distance = edit_distance(word, term, edits)
+                    if distance <= edits and self.has_term(term):
+                        fuzzy.append((distance, term))
+            for distance, term in sorted(fuzzy)[:MAX_EXPANSIONS]:
+                expansions[term] = FUZZY_WEIGHT / (2 ** (distance - 1))
+        return expansions
+
+    def _term_postings(self, term: str):
+        for docno, frequencies in self.base.postings(term):
+            doc = self.base.docs[docno]
+            if doc[0] not in self.removed:
+                yield doc[0], frequencies, doc[2]
+        for comic_id in self.delta_postings.get(term, ()):
+            document = self.delta[comic_id]
+            yield comic_id, document.terms[term], document.lengths
+
+    def _tags(self, comic_id: str):
+        document = self.delta.get(comic_id)
+        if document is not None:
+            return document.tags
+        return self.base.docs[self.base.doc_index[comic_id]][1]
+
+    def search(self, query: str, tags: list | None = None, skip: int = 0, limit: int = 20) -> tuple[int, list[str]]:
+        """
+        Comic ids matching ``query`` (and any of ``tags``), best first: (total matches, ids[skip:skip + limit]).
+        Every query word must match; if nothing matches all of them, comics matching any are returned.
+        """
+        words = tokenize(query)[:MAX_QUERY_TERMS]
+        if not words or not self.count:
+            return 0, []
+        averages = [total / self.count or 1 for total in self.totals]
+        per_word = []
+        for index, word in enumerate(words):
+            scores = {}
+            for term, weight in self.expand(word, last=index == len(words) - 1).items():
+                frequency = self.document_frequency(term)
+                idf = math.log(1 + (self.count - frequency + 0.5) / (frequency + 0.5))
+                for comic_id, frequencies, lengths in self._term_postings(term):
+                    score = 0.0
+                    for field, tf in enumerate(frequencies):
+                        if tf:
+                            norm = K1 * (1 - B + B * lengths[field] / averages[field])
+                            score += BOOSTS[field] * tf * (K1 + 1) / (tf + norm)
+                    score *= weight * idf
+                    # a word's best matching term counts, expansions don't add up
+                    if score > scores.get(comic_id, 0):
+                        scores[comic_id] = score
+            per_word.append(scores)
+
+        matches = set.intersection(*(set(scores) for scores in per_word))
+        if not matches:
+            matches = set.union(*(set(scores) for scores in per_word))
+        if tags:
+            wanted = set(tags)
+            matches = {comic_id for comic_id in matches if wanted.intersection(self._tags(comic_id))}
+        ranked = sorted(matches, key=lambda comic_id: (-sum(scores.get(comic_id, 0) for scores in per_word), comic_id))
+        return len(ranked), ranked[skip:skip + limit]
+
+
+async def build(db, index: SearchIndex):
+    """
+    Index every published comic from scratch, into the delta (the next snapshot writes it out).
+    The current index keeps answering queries until the new one is complete.
+    """
+    fresh = SearchIndex(index.path)
+    projection = {field: 1 for field in (*FIELDS, "published")}
+    async for comic in db.comics.find({"published": True}, projection).batch_size(1000):
+        fresh.upsert(comic)
+    index.adopt(fresh)
+    print(f"✅ Search index built: {index.count} comics")
+
+
+async def maintain(db, index: SearchIndex):
+    """Build or load the index, then keep it current (the app lifespan runs this as a task)."""
+    if index.load_snapshot():
+        index.ready = True
+        print(f"✅ Search index loaded from snapshot: {index.count} comics")
+    while True:
+        try:
+            if index.resume_token is None:
+                # changes made while building are picked up from this point
+                start = {"start_at_operation_time": (await db.command("ping")).get("operationTime")}
+                await build(db, index)
+                if start["start_at_operation_time"] is None:
+                    raise OperationFailure("not a replica set", code=NOT_A_REPLICA_SET)
+            else:
+                start = {"resume_after": index.resume_token}
+            await follow_changes(db, index, start)
+        except asyncio.CancelledError:
+            raise
+        except OperationFailure as e:
+            if e.code == NOT_A_REPLICA_SET:
+                print("Search index: MongoDB is not a replica set, rebuilding periodically instead of following changes")
+                await poll(db, index)
+            elif e.code in HISTORY_LOST:
+                print("Search index: snapshot is older than the change history, rebuilding")
+                index.resume_token = None
+            else:
+                print(f" ❌ Error following comic changes for search: {e}")
+                await asyncio.sleep(5)
+        except PyMongoError as e:
+            print(f" ❌ Error following comic changes for search: {e}")
+            await asyncio.sleep(5)
+
+
+async def follow_changes(db, index: SearchIndex, start: dict):
+    last_snapshot = time.monotonic() if index.base.path else 0
+    async with db.comics.watch(CHANGE_PIPELINE, full_document="updateLookup", max_await_time_ms=1000, **start) as stream:
+        while True:
+            change = await stream.try_next()
+            if change is not None:
+                index.apply(change)
+            index.resume_token = stream.resume_token
+            if change is None and time.monotonic() - last_snapshot >= SEARCH_SNAPSHOT_SECONDS:
+                if index.delta or index.removed or index.base.path is None:
+                    await index.snapshot()
+                last_snapshot = time.monotonic()
+
+
+async def poll(db, index: SearchIndex):
+    while True:
+        await asyncio.sleep(SEARCH_POLL_SECONDS)
+        await build(db, index)
+
+
+def create_index() -> SearchIndex:
+    return SearchIndex(Path(SEARCH_INDEX_DIR) / SNAPSHOT_NAME)
@@ -0,0 +1,184 @@
+"""Pre-aggregated platform statistics for the admin dashboard.
+
+Write endpoints call `record` with counter deltas, which are added to up to three
+documents in the ``stats`` collection in one round trip: the running totals (``_id: "totals"``),
+the UTC day (``"day:2026-10-19"``) and the ISO week (``"week:2026-W42"``). The
+dashboard reads those documents back by ``_id``, so it costs the same however many
+users and comics there are. `backfill` rebuilds them from the ``users`` and
+``comics`` collections for data written before the counters existed.
+
+Period counters count what happened in the day/week: ``signups``, ``uploads``, ``pages``
+and ``storage_bytes`` uploaded, net ``likes`` and ``saves``, ``comics_deleted``. Totals
+are the current ``users``, ``comics``, ``pages``, ``likes``, ``saves`` and
+``storage_bytes`` (page bytes as uploaded).
+"""
+from datetime import datetime, timedelta, timezone
+from pymongo import UpdateOne
+from bson import ObjectId
+
+TOTALS_ID = "totals"
+# period counters, kept per day and per week
+PERIOD_COUNTERS = ("signups", "uploads", "pages", "likes", "saves", "comics_deleted", "storage_bytes")
+# period counters that can be rebuilt from the source collections
+BACKFILLED_COUNTERS = ("signups", "uploads", "pages", "storage_bytes")
+# running totals
+TOTAL_COUNTERS = ("users", "comics", "pages", "likes", "saves", "storage_bytes")
+
+
+def day_id(moment: datetime) -> str:
+    return f"day:{moment:%Y-%m-%d}"
+
+
+def week_id(moment: datetime) -> str:
+    year, week, _ = moment.isocalendar()
+    return f"week:{year}-W{week:02d}"
+
+
+def page_bytes(files: list) -> int:
+    """Bytes of a comic's pages as uploaded (before optimization)."""
+    return sum(page.get("original_size") or page.get("size") or 0 for page in files)
+
+
+async def record(db, period: dict | None = None, totals: dict | None = None, at: datetime | None = None):
+    """
+    Add counter deltas to the current day and week (``period``) and to the running totals
+    (``totals``), eg. ``record(db, period={"uploads": 1}, totals={"comics": 1})``.
+    Never raises: losing a stat is better than failing the request that produced it.
+    """
+    period = {name: value for name, value in (period or {}).items() if value}
+    totals = {name: value for name, value in (totals or {}).items() if value}
+    at = at or datetime.now(timezone.utc)
+
+    operations = []
+    if totals:
+        operations.append(UpdateOne({"_id": TOTALS_ID}, {"$inc": totals, "$set": {"updated_at": at}}, upsert=True))
+    if period:
+        for bucket_id in (day_id(at), week_id(at)):
+            operations.append(UpdateOne({"_id": bucket_id}, {"$inc": period}, upsert=True))
+    if not operations:
+        return
+    try:
+        await db.stats.bulk_write(operations, ordered=False)
+    except Exception as e:
+        print(f" ❌ Error recording stats {period} {totals}: {e}")
+
+
+async def record_upload(db, files: list, new_comic: bool):
+    """A comic was uploaded (``new_comic``) or pages were added to one."""
+    counts = {"pages": len(files), "storage_bytes": page_bytes(files)}
+    if new_comic:
+        await record(db, period={"uploads": 1, **counts}, totals={"comics": 1, **counts})
+    else:
+        await record(db, period=counts, totals=counts)
+
+
+async def record_pages_deleted(db, files: list):
+    """Pages were deleted from a comic that's still there."""
+    await record(db, totals={"pages": -len(files), "storage_bytes": -page_bytes(files)})
+
+
+async def record_comic_deleted(db, comic: dict, storage_bytes: int = 0):
+    """A comic was deleted; ``storage_bytes`` is what its page documents add up to."""
+    files = comic.get("files", [])
+    await record(db, period={"comics_deleted": 1}, totals={
+        "comics": -1,
+        "pages": -(comic.get("file_count") or len(files)),
+        "likes": -len(comic.get("likes", [])),
+        "saves": -len(comic.get("saves", [])),
+        "storage_bytes": -(storage_bytes + page_bytes(files)),
+    })
+
+
+def series(documents: dict, ids: list[str]) -> list[dict]:
+    """One entry per bucket id (oldest first), with zeros for buckets nothing was recorded in."""
+    rows = []
+    for bucket_id in ids:
+        document = documents.get(bucket_id, {})
+        rows.append({"period": bucket_id.split(":", 1)[1], **{name: document.get(name, 0) for name in PERIOD_COUNTERS}})
+    return rows
+
+
+async def dashboard(db, days: int = 30, weeks: int = 12) -> dict:
+    """Totals plus daily and weekly series, read from the rollup documents only."""
+    now = datetime.now(timezone.utc)
+    day_ids = [day_id(now - timedelta(days=offset)) for offset in range(days - 1, -1, -1)]
+    week_ids = [week_id(now - timedelta(weeks=offset)) for offset in range(weeks - 1, -1, -1)]
+
+    documents = {}
+    async for document in db.stats.find({"_id": {"$in": [TOTALS_ID, *day_ids, *week_ids]}}):
+        documents[document["_id"]] = document
+
+    totals = documents.get(TOTALS_ID, {})
+    return {
+        "totals": {name: totals.get(name, 0) for name in TOTAL_COUNTERS},
+        "updated_at": totals.get("updated_at"),
+        "backfilled_at": totals.get("backfilled_at"),
+        "daily": series(documents, day_ids),
+        "weekly": series(documents, week_ids),
+    }
+
+
+async def backfill(db) -> dict:
+    """
+    Rebuild the rollups from the source collections. Signup and upload counters of day and
+    week buckets before the current week are overwritten with computed values; the current
+    week keeps counting live, so running this doesn't lose or double-count recent events.
+    Likes, saves and deletions leave no timestamps behind, so their history only goes into
+    the totals.
+    """
+    now = datetime.now(timezone.utc)
+    week_start = datetime(now.year, now.month, now.day, tzinfo=timezone.utc) - timedelta(days=now.weekday())
+    buckets = {}
+
+    def add(moment: datetime, **counts):
+        if moment.tzinfo is None:
+            moment = moment.replace(tzinfo=timezone.utc)
+        if moment >= week_start:
+            return
+        for bucket_id in (day_id(moment), week_id(moment)):
+            bucket = buckets.setdefault(bucket_id, dict.fromkeys(BACKFILLED_COUNTERS, 0))
+            for name, value in counts.items():
+                bucket[name] += value
+
+    totals = dict.fromkeys(TOTAL_COUNTERS, 0)
+    async for user in db.users.find({"email": {"$exists": True}}, {"_id": 1, "created_at": 1}).batch_size(1000):
+        totals["users"] += 1
+        created = user.get("created_at") or (user["_id"].generation_time if isinstance(user["_id"], ObjectId) else None)
+        if created:
+            add(created, signups=1)
+
+    # pages are counted towards their comic's upload, whether in the pages collection or
+    # (before scripts/migrate_pages.py) in the comic document
+    page_totals = {}
+    async for row in db.pages.aggregate([{"$group": {
+        "_id": "$comic_id",
+        "pages": {"$sum": 1},
+        "bytes": {"$sum": {"$ifNull": ["$original_size", {"$ifNull": ["$size", 0]}]}},
+    }}], allowDiskUse=True):
+        page_totals[row["_id"]] = (row["pages"], row["bytes"])
+
+    projection = {"upload_date": 1, "files.size": 1, "files.original_size": 1, "likes": 1, "saves": 1}
+    async for comic in db.comics.find({}, projection).batch_size(1000):
+        files = comic.get("files", [])
+        page_count, storage_bytes = page_totals.get(comic["_id"], (0, 0))
+        page_count, storage_bytes = page_count + len(files), storage_bytes + page_bytes(files)
+        totals["comics"] += 1
+        totals["pages"] += page_count
+        totals["likes"] += len(comic.get("likes", []))
+        totals["saves"] += len(comic.get("saves", []))
+        totals["storage_bytes"] += storage_bytes
+        uploaded = comic.get("upload_date") or comic["_id"].generation_time
+        add(uploaded, uploads=1, pages=page_count, storage_bytes=storage_bytes)
+
+    operations = [
+        UpdateOne({"_id": bucket_id}, {"$set": counts}, upsert=True)
+        for bucket_id, counts in buckets.items()
+    ]
+    operations.append(UpdateOne(
+        {"_id": TOTALS_ID},
+        {"$set": {**totals, "updated_at": now, "backfilled_at": now}},
+        upsert=True,
+    ))
+    await db.stats.bulk_write(operations, ordered=False)
+    print(f"✅ Stats backfilled: {len(buckets)} day/week buckets, totals {totals}")
+    return {"buckets": len(buckets), "totals": totals}
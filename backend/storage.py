@@ -0,0 +1,275 @@
+"""Where media bytes live: the local filesystem or an S3-compatible object store.
+
+Everything that reads or writes page files goes through `get_storage()`, so the
+API and the workers don't care which backend is configured (STORAGE_BACKEND).
+Files are addressed by their generated filename. Each filename lives in one of
+two areas: ``uploads`` (served to readers) and ``originals`` (artist only), laid
+out with the same hash sharding in both backends. On S3 the areas are separate
+buckets (S3_BUCKET and S3_ORIGINALS_BUCKET), so making the pages public can't
+expose the originals: only ``uploads/*`` in S3_BUCKET may be publicly readable.
+
+Both backends hand out presigned PUT URLs, so clients upload pages straight to
+storage and the API only records metadata. With S3 that's a real S3 presigned
+URL. With local storage it's an HMAC-signed URL to the API's own
+``/api/uploads/direct`` endpoint, so clients use the same flow either way.
+"""
+import asyncio
+import hashlib
+import hmac
+import mimetypes
+import os
+import shutil
+import tempfile
+import time
+from contextlib import asynccontextmanager
+from urllib.parse import urlencode
+from config import (
+    STORAGE_BACKEND, UPLOAD_DIR, ORIGINALS_DIR, SECRET_KEY, PRESIGNED_URL_EXPIRE_SECONDS,
+    S3_ENDPOINT_URL, S3_BUCKET, S3_ORIGINALS_BUCKET, S3_REGION, S3_ACCESS_KEY, S3_SECRET_KEY, S3_PUBLIC_URL,
+)
+import media
+
+try:
+    import boto3
+    from botocore.exceptions import ClientError
+except ImportError:  # only needed for STORAGE_BACKEND=s3
+    boto3 = None
+
+UPLOADS, ORIGINALS = "uploads", "originals"
+
+
+def sign_direct_upload(filename: str, max_size: int, expires: int) -> str:
+    message = f"{filename}:{max_size}:{expires}".encode()
+    return hmac.new(SECRET_KEY.encode(), message, hashlib.sha256).hexdigest()
+
+
+def verify_direct_upload(filename: str, max_size: int, expires: int, signature: str) -> bool:
+    if expires < time.time():
+        return False
+    return hmac.compare_digest(sign_direct_upload(filename, max_size, expires), signature)
+
+
+class LocalStorage:
+    """Media under UPLOAD_DIR / ORIGINALS_DIR, served by the API's /media/uploads mount."""
+
+    directories = {UPLOADS: UPLOAD_DIR, ORIGINALS: ORIGINALS_DIR}
+
+    def url(self, filename: str) -> str:
+        return media.media_url(filename)
+
+    def path(self, filename: str, area: str = UPLOADS) -> str:
+        return media.resolve_media_path(filename, self.directories[area])
+
+    def save_bytes(self, filename: str, data: bytes):
+        path = media.media_path(filename)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as f:
+            f.write(data)
+
+    def save_file(self, filename: str, source_path: str):
+        """Move a finished local file (eg. a resumable upload's staging file) into storage."""
+        path = media.media_path(filename)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        shutil.move(source_path, path)
+
+    def size(self, filename: str, area: str = UPLOADS) -> int | None:
+        try:
+            return os.path.getsize(self.path(filename, area))
+        except FileNotFoundError:
+            return None
+
+    def delete(self, filename: str) -> int:
+        """Delete a filename from every area; returns bytes freed."""
+        freed = 0
+        for area in self.directories:
+            path = self.path(filename, area)
+            try:
+                size = os.path.getsize(path)
+                os.remove(path)
+                freed += size
+            except FileNotFoundError:
+                pass
+        return freed
+
+    def presign_put(self, filename: str, content_type: str, max_size: int) -> dict:
+        expires = int(time.time()) + PRESIGNED_URL_EXPIRE_SECONDS
+        query = urlencode({
+            "max_size": max_size,
+            "expires": expires,
+            "signature": sign_direct_upload(filename, max_size, expires),
+        })
+        return {"url": f"/api/uploads/direct/{filename}?{query}", "method": "PUT", "headers": {"Content-Type": content_type}}
+
+    def original_download(self, filename: str) -> dict | None:
+        """``{"path": ...}`` of the artist's original (or the served file if it was never optimized)."""
+        for area in (ORIGINALS, UPLOADS):
+            path = self.path(filename, area)
+            if os.path.exists(path):
+                return {"path": path}
+        return None
+
+    @asynccontextmanager
+    async def workspace(self, filename: str):
+        """Local paths of a page and its original for processing; files are already in place."""
+        yield self.path(filename), media.media_path(filename, ORIGINALS_DIR)
+
+    @asynccontextmanager
+    async def source(self, filename: str):
+        """Local path of a served file to read from, or None if there's no such file."""
+        path = self.path(filename)
+        yield path if os.path.isfile(path) else None
+
+    def iter_files(self):
+        """Yield ``(filename, key, size, mtime)`` for every stored file."""
+        stack = [d for d in self.directories.values() if os.path.isdir(d)]
+        while stack:
+            with os.scandir(stack.pop()) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(entry.path)
+                    elif entry.is_file(follow_symlinks=False):
+                        stat = entry.stat()
+                        yield entry.name, entry.path, stat.st_size, stat.st_mtime
+
+    def delete_key(self, key: str):
+        os.remove(key)
+
+
+def default_public_url() -> str:
+    """Base URL of the bucket's objects: path-style on a custom endpoint (MinIO), virtual-hosted on AWS."""
+    if S3_ENDPOINT_URL:
+        return f"{S3_ENDPOINT_URL.rstrip('/')}/{S3_BUCKET}"
+    return f"https://{S3_BUCKET}.s3.{S3_REGION}.amazonaws.com"
+
+
+class S3Storage:
+    """Media in S3-compatible buckets (AWS S3, or MinIO locally): pages read directly by clients, originals private."""
+
+    def __init__(self):
+        if boto3 is None:
+            raise RuntimeError("STORAGE_BACKEND=s3 requires boto3: pip install boto3")
+        self.buckets = {UPLOADS: S3_BUCKET, ORIGINALS: S3_ORIGINALS_BUCKET}
+        self.client = boto3.client(
+            "s3",
+            endpoint_url=S3_ENDPOINT_URL,
+            region_name=S3_REGION,
+            aws_access_key_id=S3_ACCESS_KEY,
+            aws_secret_access_key=S3_SECRET_KEY,
+        )
+        self.public_url = (S3_PUBLIC_URL or default_public_url()).rstrip("/")
+
+    def key(self, filename: str, area: str = UPLOADS) -> str:
+        return f"{area}/{media.shard_dir(filename)}/{filename}"
+
+    def bucket(self, key: str) -> str:
+        """The bucket of a key, by its area prefix."""
+        return self.buckets[key.split("/", 1)[0]]
+
+    def url(self, filename: str) -> str:
+        return f"{self.public_url}/{self.key(filename)}"
+
+    def save_bytes(self, filename: str, data: bytes):
+        self.client.put_object(Bucket=self.buckets[UPLOADS], Key=self.key(filename), Body=data, ContentType=content_type(filename))
+
+    def save_file(self, filename: str, source_path: str):
+        self.upload(source_path, self.key(filename))
+        os.remove(source_path)
+
+    def upload(self, path: str, key: str):
+        self.client.upload_file(path, self.bucket(key), key, ExtraArgs={"ContentType": content_type(path)})
+
+    def size(self, filename: str, area: str = UPLOADS) -> int | None:
+        try:
+            return self.client.head_object(Bucket=self.buckets[area], Key=self.key(filename, area))["ContentLength"]
+        except ClientError:
+            return None
+
+    def delete(self, filename: str) -> int:
+        """Delete a filename from every area. Freed bytes aren't known without a HEAD per object, so returns 0."""
+        for area, bucket in self.buckets.items():
+            self.client.delete_object(Bucket=bucket, Key=self.key(filename, area))
+        return 0
+
+    def presign_put(self, filename: str, content_type: str, max_size: int) -> dict:
+        # a presigned PUT can't cap the size; finalize checks it with a HEAD instead
+        url = self.client.generate_presigned_url(
+            "put_object",
+            Params={"Bucket": self.buckets[UPLOADS], "Key": self.key(filename), "ContentType": content_type},
+            ExpiresIn=PRESIGNED_URL_EXPIRE_SECONDS,
+        )
+        return {"url": url, "method": "PUT", "headers": {"Content-Type": content_type}}
+
+    def original_download(self, filename: str) -> dict | None:
+        """``{"url": ...}``: a short-lived presigned GET for the artist's original."""
+        for area in (ORIGINALS, UPLOADS):
+            if self.size(filename, area) is not None:
+                url = self.client.generate_presigned_url(
+                    "get_object",
+                    Params={"Bucket": self.buckets[area], "Key": self.key(filename, area)},
+                    ExpiresIn=PRESIGNED_URL_EXPIRE_SECONDS,
+                )
+                return {"url": url}
+        return None
+
+    @asynccontextmanager
+    async def workspace(self, filename: str):
+        """
+        Download a page (and its original, if it has one) into a temporary directory for
+        processing, then upload whatever processing changed or created next to it
+        (optimized page, renditions, original).
+        """
+        with tempfile.TemporaryDirectory() as tmp:
+            page_path = os.path.join(tmp, filename)
+            original_path = os.path.join(tmp, ORIGINALS, filename)
+            await asyncio.to_thread(self.client.download_file, self.buckets[UPLOADS], self.key(filename), page_path)
+            if await asyncio.to_thread(self.size, filename, ORIGINALS) is not None:
+                os.makedirs(os.path.dirname(original_path))
+                await asyncio.to_thread(self.client.download_file, self.buckets[ORIGINALS], self.key(filename, ORIGINALS), original_path)
+            downloaded = {path: os.stat(path).st_mtime_ns for path in (page_path, original_path) if os.path.exists(path)}
+
+            yield page_path, original_path
+
+            def changed(path):
+                return os.path.isfile(path) and downloaded.get(path) != os.stat(path).st_mtime_ns
+
+            for entry in os.scandir(tmp):
+                if changed(entry.path):
+                    await asyncio.to_thread(self.upload, entry.path, self.key(entry.name))
+            if changed(original_path):
+                await asyncio.to_thread(self.upload, original_path, self.key(filename, ORIGINALS))
+
+    @asynccontextmanager
+    async def source(self, filename: str):
+        """Download a served file into a temporary directory to read from; None if there's no such file."""
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, filename)
+            try:
+                await asyncio.to_thread(self.client.download_file, self.buckets[UPLOADS], self.key(filename), path)
+            except ClientError:
+                path = None
+            yield path
+
+    def iter_files(self):
+        paginator = self.client.get_paginator("list_objects_v2")
+        for area, bucket in self.buckets.items():
+            for page in paginator.paginate(Bucket=bucket, Prefix=f"{area}/"):
+                for obj in page.get("Contents", []):
+                    yield os.path.basename(obj["Key"]), obj["Key"], obj["Size"], obj["LastModified"].timestamp()
+
+    def delete_key(self, key: str):
+        self.client.delete_object(Bucket=self.bucket(key), Key=key)
+
+
+def content_type(path: str) -> str:
+    return mimetypes.guess_type(path)[0] or "application/octet-stream"
+
+
+_storage = None
+
+
+def get_storage():
+    """The configured storage backend (created on first use)."""
+    global _storage
+    if _storage is None:
+        _storage = S3Storage() if STORAGE_BACKEND == "s3" else LocalStorage()
+    return _storage
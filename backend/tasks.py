@@ -0,0 +1,55 @@
+"""Job handlers, run by `worker.py` processes off the jobs queue (see jobs.py)."""
+from bson import ObjectId
+from pymongo import ReturnDocument
+import jobs
+import media
+import stats
+from storage import get_storage
+
+
+def page_fields(meta: dict) -> dict:
+    """Turn `media.process_page` output into fields of the page's document (see pages.py)."""
+    storage = get_storage()
+    fields = dict(meta)
+    # Renditions (thumbnail, animated WebP) are recorded by URL
+    for key in [key for key in fields if key.endswith("_filename")]:
+        fields[key.replace("_filename", "_url")] = storage.url(fields.pop(key))
+    return fields
+
+
+@jobs.job_handler("process_page")
+async def process_page(db, payload: dict):
+    """
+    Optimize one uploaded page and compute its metadata, thumbnail and renditions in the
+    media process pool, then record them on the page's document.
+    """
+    comic_id = ObjectId(payload["comic_id"])
+    filename = payload["filename"]
+    storage = get_storage()
+    # with object storage the page is processed in a local copy and the results uploaded back
+    async with storage.workspace(filename) as (page_path, original_path):
+        meta = await media.run_in_worker(media.process_page, page_path, original_path)
+
+    bytes_saved = meta.get("bytes_saved", 0)
+    meta = page_fields(meta)
+    if not meta:
+        return
+
+    previous = await db.pages.find_one_and_update(
+        {"comic_id": comic_id, "filename": filename},
+        {"$set": meta},
+        projection={"bytes_saved": 1},
+        return_document=ReturnDocument.BEFORE,
+    )
+    # the comic keeps a running total: add only what changed on this page, so a retried or
+    # reclaimed job (the queue delivers at least once) doesn't count the page twice.
+    # A page deleted in the meantime doesn't count.
+    delta = bytes_saved - (previous.get("bytes_saved") or 0) if previous else 0
+    if delta:
+        await db.comics.update_one({"_id": comic_id}, {"$inc": {"bytes_saved": delta}})
+
+
+@jobs.job_handler("backfill_stats")
+async def backfill_stats(db, payload: dict):
+    """Rebuild the admin stats rollups (see stats.backfill)."""
+    await stats.backfill(db)
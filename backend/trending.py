@@ -0,0 +1,101 @@
+"""Time-decayed trending score, maintained incrementally on engagement events.
+
+Each comic stores ``trending_score`` relative to ``trending_epoch``. An event of
+weight ``w`` at time ``t`` adds ``w * 2 ** ((t - epoch) / half_life)``, so older
+events lose half their weight every half-life compared to new ones without the
+document ever being rewritten. Epochs start on fixed boundaries, so every API
+worker agrees on the current one without coordination. A comic whose epoch has
+fallen behind is rescaled in the same update that records the event, and
+`renormalize_scores` sweeps the rest so stored values stay small.
+
+Retracting an event (unlike, unsave) subtracts the weight it was added with, at the time
+it happened: like times are kept in ``likes``, save times in ``saved_comics``.
+"""
+import asyncio
+from datetime import datetime, timezone
+
+from config import TRENDING_HALF_LIFE_HOURS, TRENDING_RENORMALIZE_HOURS, TRENDING_WEIGHTS
+
+HALF_LIFE_MS = TRENDING_HALF_LIFE_HOURS * 60 * 60 * 1000
+RENORMALIZE_MS = int(TRENDING_RENORMALIZE_HOURS * 60 * 60 * 1000)
+
+
+def current_epoch(now: datetime | None = None) -> datetime:
+    """Return the start of the renormalization window containing ``now``."""
+    now = now or datetime.now(timezone.utc)
+    now_ms = int(now.timestamp() * 1000)
+    return datetime.fromtimestamp((now_ms - now_ms % RENORMALIZE_MS) / 1000, tz=timezone.utc)
+
+
+def event_weight(event: str, now: datetime, epoch: datetime) -> float:
+    """Weight of one event at ``now``, expressed relative to ``epoch``."""
+    elapsed_ms = (now - epoch).total_seconds() * 1000
+    return TRENDING_WEIGHTS[event] * 2 ** (elapsed_ms / HALF_LIFE_MS)
+
+
+def _rescaled_score(epoch: datetime) -> dict:
+    """Aggregation expression for the stored score rescaled to ``epoch``."""
+    stored_epoch = {"$ifNull": ["$trending_epoch", epoch]}
+    return {"$multiply": [
+        {"$ifNull": ["$trending_score", 0]},
+        {"$pow": [2, {"$divide": [{"$subtract": [stored_epoch, epoch]}, HALF_LIFE_MS]}]},
+    ]}
+
+
+def score_update(event: str, sign: int = 1, now: datetime | None = None, occurred_at: datetime | None = None) -> list:
+    """
+    Build an update pipeline applying one engagement event to a comic.
+    A negative ``sign`` retracts the event that ``occurred_at`` (unlike/unsave), taking off
+    exactly the weight it added; the score never drops below zero.
+    """
+    now = now or datetime.now(timezone.utc)
+    epoch = current_epoch(now)
+    occurred_at = occurred_at or now
+    if occurred_at.tzinfo is None:
+        occurred_at = occurred_at.replace(tzinfo=timezone.utc)
+    delta = sign * event_weight(event, occurred_at, epoch)
+    return [{"$set": {
+        "trending_score": {"$max": [0, {"$add": [_rescaled_score(epoch), delta]}]},
+        "trending_epoch": epoch,
+    }}]
+
+
+def initial_fields() -> dict:
+    """Trending fields for a newly uploaded comic."""
+    return {"trending_score": 0.0, "trending_epoch": current_epoch(), "views": 0}
+
+
+async def record_event(db, comic_id, event: str, sign: int = 1, occurred_at: datetime | None = None):
+    """Apply an engagement event (or with ``sign=-1``, retract the one that ``occurred_at``) to a comic's trending score."""
+    try:
+        update = score_update(event, sign, occurred_at=occurred_at)
+        if event == "view":
+            update[0]["$set"]["views"] = {"$add": [{"$ifNull": ["$views", 0]}, 1]}
+        await db.comics.update_one({"_id": comic_id}, update)
+    except Exception as e:
+        print(f" ❌ Error recording {event} for comic {comic_id}: {e}")
+
+
+async def renormalize_scores(db) -> int:
+    """Rescale every comic still on an older epoch to the current one."""
+    epoch = current_epoch()
+    result = await db.comics.update_many(
+        {"$or": [
+            {"trending_epoch": {"$lt": epoch}},
+            {"trending_epoch": {"$exists": False}},
+        ]},
+        [{"$set": {"trending_score": _rescaled_score(epoch), "trending_epoch": epoch}}],
+    )
+    return result.modified_count
+
+
+async def renormalize_loop(db, interval_seconds: int = 60 * 60):
+    """Periodically renormalize trending scores (run by the lease holder, see leader.py)."""
+    while True:
+        try:
+            count = await renormalize_scores(db)
+            if count:
+                print(f"✅ Renormalized trending scores for {count} comics")
+        except Exception as e:
+            print(f" ❌ Error renormalizing trending scores: {e}")
+        await asyncio.sleep(interval_seconds)
@@ -0,0 +1,55 @@
+"""Numeric user IDs handed out from blocks, and the unique email index signup relies on.
+
+Users have a numeric ``id`` next to their ``_id``, taken from the ``user_id`` counter in
+``counters``. Bumping that one document for every signup would make it a write hotspot.
+Instead, each process reserves USER_ID_BLOCK_SIZE IDs with a single ``$inc`` (the "hi" part)
+and hands them out from memory (the "lo" part), so the counter is written once per block.
+IDs stay unique across processes and restarts. They are not dense, though: a process that
+stops leaves the rest of its block unused. Across processes they are only roughly in signup order.
+
+The counter's ``seq`` is the last ID reserved, as it was the last ID used before blocks, so
+anything that takes single IDs with ``$inc: 1`` (create_admin.py) or raises it with ``$max``
+(NDJSON imports) keeps working alongside.
+"""
+import asyncio
+from pymongo import ReturnDocument
+from config import USER_ID_BLOCK_SIZE
+
+COUNTER_ID = "user_id"
+
+
+class UserIdAllocator:
+    """Hands out IDs from a reserved block, reserving the next block when it runs out."""
+
+    def __init__(self, block_size: int = USER_ID_BLOCK_SIZE):
+        self.block_size = block_size
+        self.next = self.end = 0
+        self.lock = asyncio.Lock()
+
+    async def allocate(self, db) -> int:
+        while self.next >= self.end:
+            async with self.lock:
+                # another signup may have reserved a block while this one waited
+                if self.next >= self.end:
+                    counter = await db.counters.find_one_and_update(
+                        {"_id": COUNTER_ID},
+                        {"$inc": {"seq": self.block_size}},
+                        upsert=True,
+                        return_document=ReturnDocument.AFTER,
+                    )
+                    self.next, self.end = counter["seq"] - self.block_size + 1, counter["seq"] + 1
+        user_id = self.next
+        self.next += 1
+        return user_id
+
+
+_allocator = UserIdAllocator()
+
+
+async def next_user_id(db) -> int:
+    return await _allocator.allocate(db)
+
+
+async def ensure_indexes(db):
+    # one account per email: signup inserts and lets the index reject duplicates
+    await db.users.create_index("email", unique=True)
@@ -0,0 +1,208 @@
+"""On-the-fly resized page images, kept in a size-capped disk cache.
+
+``GET /media/transform/{filename}?w=480&format=webp&q=80`` serves a page at one of
+ALLOWED_WIDTHS, in one of ALLOWED_FORMATS, at one of ALLOWED_QUALITIES. Anything else is
+rejected, so there is a known, small number of variants per page and clients can't fill the
+cache with arbitrary sizes.
+
+A missing variant is rendered in the media worker pool (see media.py) into a temporary
+file that is renamed into place, so readers never see a partial file. Concurrent requests
+for the same variant in one process wait for a single render.
+
+The cache directory is shared by every API process on the host, so TRANSFORM_CACHE_MAX_MB
+caps the directory, not one process's share of it. Recency lives on disk: a hit bumps the
+file's mtime (at most once per TOUCH_SECONDS), and eviction deletes the oldest mtimes first.
+Each process keeps an index of the directory in memory. The index is rebuilt from a scan of
+the directory when it passes the cap, and at least every RESCAN_SECONDS while variants are
+being rendered. Variants other processes render in between are counted at the next scan, so
+the directory can briefly overshoot the cap by what they rendered in the meantime. A cache
+hit is a stat and a plain file response, with no database or storage round trip.
+"""
+import asyncio
+import os
+import shutil
+import tempfile
+import time
+from collections import OrderedDict
+from pathlib import Path
+from PIL import Image, ImageOps
+from config import TRANSFORM_CACHE_DIR, TRANSFORM_CACHE_MAX_MB
+from storage import get_storage
+import media
+
+ALLOWED_WIDTHS = (160, 320, 480, 640, 800, 1080, 1280, 1600)
+ALLOWED_FORMATS = {"webp": "image/webp", "jpeg": "image/jpeg"}
+ALLOWED_QUALITIES = (50, 65, 80, 90)
+DEFAULT_FORMAT = "webp"
+DEFAULT_QUALITY = 80
+EXTENSIONS = {"webp": ".webp", "jpeg": ".jpg"}
+STALE_TMP_SECONDS = 60 * 60  # leftovers of renders interrupted by a crash
+TOUCH_SECONDS = 60  # how stale a hit's mtime may get before it's bumped
+RESCAN_SECONDS = 60  # how long a process renders on its index before rescanning the directory
+
+_cache = None
+
+
+def render(source_path: str, dest_path: str, width: int, fmt: str, quality: int) -> int:
+    """
+    Write ``source_path`` at most ``width`` pixels wide (never upscaled) to ``dest_path``
+    in ``fmt``. Animated pages are rendered from their first frame. Returns the file size.
+    """
+    directory = os.path.dirname(dest_path)
+    os.makedirs(directory, exist_ok=True)
+    with Image.open(source_path) as source:
+        image = media.to_srgb(ImageOps.exif_transpose(source))
+        if image.width > width:
+            image = image.resize((width, max(1, round(image.height * width / image.width))), Image.LANCZOS)
+        if fmt == "jpeg":
+            image = image.convert("RGB")
+        elif image.mode not in ("RGB", "RGBA"):
+            image = image.convert("RGBA" if image.has_transparency_data else "RGB")
+
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as out:
+                if fmt == "jpeg":
+                    image.save(out, format="JPEG", quality=quality, optimize=True, progressive=True)
+                else:
+                    image.save(out, format="WEBP", quality=quality, method=4)
+            os.replace(tmp_path, dest_path)  # atomic, so readers never see a partial file
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+    return os.path.getsize(dest_path)
+
+
+class VariantCache:
+    """Rendered variants on disk, evicted least recently used first above ``max_bytes``."""
+
+    def __init__(self, directory: str = TRANSFORM_CACHE_DIR, max_bytes: int = TRANSFORM_CACHE_MAX_MB * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()  # path -> size, least recently used first
+        self.total = 0
+        self.rendering = {}  # path -> task of a render in progress
+        self.scanned_at = 0.0  # time.monotonic() of the last scan
+        self.scanning = False
+
+    def page_dir(self, filename: str) -> str:
+        return os.path.join(self.directory, media.shard_dir(filename), filename)
+
+    def variant_path(self, filename: str, width: int, fmt: str, quality: int) -> str:
+        return os.path.join(self.page_dir(filename), f"w{width}-q{quality}{EXTENSIONS[fmt]}")
+
+    def load(self):
+        """Index the variants already on disk and evict down to the cap."""
+        self.index(self.scan())
+        self.evict()
+        print(f"🖼️ Variant cache: {len(self.entries)} files, {self.total // (1024 * 1024)} MB")
+
+    def scan(self) -> list:
+        """(mtime, path, size) of every variant on disk, removing stale temporary files on the way."""
+        found = []
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                    if name.endswith(".tmp"):
+                        if stat.st_mtime < time.time() - STALE_TMP_SECONDS:
+                            os.remove(path)
+                        continue
+                except FileNotFoundError:
+                    continue
+                found.append((stat.st_mtime, path, stat.st_size))
+        return found
+
+    def index(self, found: list):
+        """Replace the in-memory index with a scan, least recently used (oldest mtime) first."""
+        self.entries = OrderedDict((path, size) for _, path, size in sorted(found))
+        self.total = sum(self.entries.values())
+        self.scanned_at = time.monotonic()
+
+    async def rescan(self):
+        """Pick up what other processes rendered and evicted, then evict down to the cap."""
+        if self.scanning:
+            return
+        self.scanning = True
+        try:
+            self.index(await asyncio.to_thread(self.scan))
+        finally:
+            self.scanning = False
+        self.evict()
+
+    def used(self, path: str, size: int):
+        """Record a variant as the most recently used."""
+        self.total += size - self.entries.pop(path, 0)
+        self.entries[path] = size
+
+    def forget(self, path: str):
+        self.total -= self.entries.pop(path, 0)
+
+    def evict(self):
+        # the most recent entry stays even if it alone is over the cap: it's about to be served
+        while self.total > self.max_bytes and len(self.entries) > 1:
+            path, size = self.entries.popitem(last=False)
+            self.total -= size
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    async def get(self, filename: str, width: int, fmt: str, quality: int) -> tuple[str, os.stat_result]:
+        """
+        Path and stat of a variant, rendering it first if it isn't cached.
+        Raises FileNotFoundError if the page doesn't exist.
+        """
+        path = self.variant_path(filename, width, fmt, quality)
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            self.forget(path)  # evicted by another process, or purged
+        else:
+            self.used(path, stat.st_size)
+            if stat.st_mtime < time.time() - TOUCH_SECONDS:
+                try:
+                    os.utime(path)  # recency other processes evict by
+                except FileNotFoundError:
+                    pass
+            return path, stat
+
+        task = self.rendering.get(path)
+        if task is None:
+            task = asyncio.create_task(self.render(filename, path, width, fmt, quality))
+            self.rendering[path] = task
+            task.add_done_callback(lambda _: self.rendering.pop(path, None))
+        # shielded: a client that disconnects doesn't cancel the render others are waiting for
+        await asyncio.shield(task)
+        return path, os.stat(path)
+
+    async def render(self, filename: str, path: str, width: int, fmt: str, quality: int):
+        async with get_storage().source(filename) as source_path:
+            if source_path is None:
+                raise FileNotFoundError(filename)
+            size = await media.run_in_worker(render, source_path, path, width, fmt, quality)
+        self.used(path, size)
+        if self.total > self.max_bytes or time.monotonic() - self.scanned_at > RESCAN_SECONDS:
+            await self.rescan()
+
+
+def get_cache() -> VariantCache:
+    """Return the process's variant cache, indexing the files on disk on first use (done at startup)."""
+    global _cache
+    if _cache is None:
+        _cache = VariantCache()
+        _cache.load()
+    return _cache
+
+
+def purge(filename: str):
+    """
+    Delete a page's cached variants from this host's disk (the page was deleted). The
+    in-memory indexes notice on the next lookup or scan.
+    """
+    shutil.rmtree(os.path.join(TRANSFORM_CACHE_DIR, media.shard_dir(filename), filename), ignore_errors=True)
+
+
+def is_transformable(filename: str) -> bool:
+    return os.path.basename(filename) == filename and Path(filename).suffix.lower() in media.IMAGE_EXTENSIONS
@@ -0,0 +1,59 @@
+"""Background job worker, run separately from the API and scaled independently.
+
+Usage:
+    python worker.py [--concurrency N]
+"""
+import argparse
+import asyncio
+import os
+import signal
+import socket
+from motor.motor_asyncio import AsyncIOMotorClient
+from config import MONGO_URI, DB_NAME, JOB_WORKER_CONCURRENCY
+import jobs
+import media
+import pages
+import tasks  # noqa: F401 - registers the job handlers
+
+POLL_INTERVAL_SECONDS = 1.0
+
+
+async def work(db, worker_id: str, stop: asyncio.Event):
+    """Claim and run jobs one at a time until asked to stop."""
+    while not stop.is_set():
+        job = await jobs.claim(db, worker_id)
+        if job is None:
+            try:
+                await asyncio.wait_for(stop.wait(), POLL_INTERVAL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+            continue
+        await jobs.run_job(db, job, worker_id)
+
+
+async def main(concurrency: int):
+    client = AsyncIOMotorClient(MONGO_URI)
+    db = client[DB_NAME]
+    await jobs.ensure_indexes(db)
+    await pages.ensure_indexes(db)
+
+    # finish in-flight jobs on SIGTERM/SIGINT, claim nothing new
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+
+    worker_id = f"{socket.gethostname()}:{os.getpid()}"
+    print(f"✅ Worker {worker_id} started with {concurrency} job slots")
+    await asyncio.gather(*(work(db, f"{worker_id}/{slot}", stop) for slot in range(concurrency)))
+
+    media.shutdown_pool()
+    client.close()
+    print(f"✅ Worker {worker_id} stopped")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, default=JOB_WORKER_CONCURRENCY, help="jobs run at once")
+    args = parser.parse_args()
+    asyncio.run(main(args.concurrency))
@@ -1,4 +1,4 @@
-import { API_BASE_URL } from "../config"
+import { mediaUrl } from "../config"
 import { useState } from "react"
 import { Link } from "react-router-dom"
 
@@ -84,7 +84,7 @@ export default function ComicCard({
       <div className="relative aspect-[3/4] w-full bg-gradient-to-br from-slate-800 to-slate-900">
         {coverUrl ? (
           <img 
-            src={`${API_BASE_URL}${coverUrl}`} 
+            src={mediaUrl(coverUrl)} 
             alt={title}
             className="w-full h-full object-cover"
           />
@@ -38,6 +38,12 @@ function Navbar() {
   }
 
   const handleLogout = () => {
+    const token = localStorage.getItem("token")
+    // revoke the token server-side too; logging out locally doesn't wait for it
+    fetch(`${API_BASE_URL}/api/logout`, {
+      method: "POST",
+      headers: { "Authorization": `Bearer ${token}` }
+    }).catch(() => {})
     localStorage.removeItem("token")
     setIsLoggedIn(false)
     setUserRole(null)
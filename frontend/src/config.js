@@ -1,3 +1,6 @@
 // API Configuration
 // When running in Docker, the browser accesses the backend via localhost
 export const API_BASE_URL = import.meta.env.VITE_API_URL || "http://localhost:8000"
+
+// Media URLs are API-relative with local storage and absolute with object storage
+export const mediaUrl = (url) => (url && !/^https?:\/\//.test(url) ? `${API_BASE_URL}${url}` : url)
@@ -43,12 +43,12 @@ export default function Browse() {
     if (!token) return
     
     try {
-      const res = await fetch(`${API_BASE_URL}/api/users/me/saved`, {
+      const res = await fetch(`${API_BASE_URL}/api/users/me/saved/ids`, {
         headers: { "Authorization": `Bearer ${token}` }
       })
       if (res.ok) {
         const data = await res.json()
-        setSavedComicIds(new Set(data.comics.map(c => c._id)))
+        setSavedComicIds(new Set(data.comic_ids))
       }
     } catch (err) {
       console.error("Failed to fetch saved comics:", err)
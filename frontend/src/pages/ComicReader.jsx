@@ -1,18 +1,57 @@
 import { useState, useEffect } from "react"
 import { useParams, useNavigate } from "react-router-dom"
-import { API_BASE_URL } from "../config"
+import { API_BASE_URL, mediaUrl } from "../config"
+
+// Reserves the page's layout box from the manifest (aspect ratio, dominant colour,
+// blurred placeholder) so the reader renders before the full image arrives.
+// Animated GIF pages also carry an animated WebP rendition; browsers without
+// WebP support fall back to the GIF.
+function PageImage({ src, webpSrc, layout, alt, className = "", lazy = true }) {
+  const [loaded, setLoaded] = useState(false)
+  const style = {}
+  if (layout?.width && layout?.height) style.aspectRatio = `${layout.width} / ${layout.height}`
+  if (layout?.color) style.backgroundColor = layout.color
+  if (layout?.placeholder) {
+    style.backgroundImage = `url(${layout.placeholder})`
+    style.backgroundSize = "cover"
+  }
+
+  useEffect(() => {
+    setLoaded(false)
+  }, [src])
+
+  return (
+    <div className={`relative overflow-hidden ${className}`} style={style}>
+      <picture>
+        {webpSrc && <source srcSet={webpSrc} type="image/webp" />}
+        <img
+          src={src}
+          alt={alt}
+          loading={lazy ? "lazy" : "eager"}
+          decoding="async"
+          width={layout?.width}
+          height={layout?.height}
+          onLoad={() => setLoaded(true)}
+          className={`w-full h-full object-cover transition-opacity duration-300 ${loaded ? "opacity-100" : "opacity-0"}`}
+        />
+      </picture>
+    </div>
+  )
+}
 
 export default function ComicReader() {
   const { id } = useParams()
   const navigate = useNavigate()
   const [comic, setComic] = useState(null)
+  const [manifest, setManifest] = useState(null)
   const [loading, setLoading] = useState(true)
   const [error, setError] = useState("")
   const [currentPage, setCurrentPage] = useState(0)
   const [currentUserId, setCurrentUserId] = useState(null)
 
   useEffect(() => {
-    fetchComic()
+    // the manifest lists the pages, so wait for both
+    Promise.all([fetchComic(), fetchManifest()]).finally(() => setLoading(false))
   }, [id])
 
   useEffect(() => {
@@ -49,11 +88,27 @@ export default function ComicReader() {
       setComic(data)
     } catch (err) {
       setError(err.message)
-    } finally {
-      setLoading(false)
     }
   }
 
+  const fetchManifest = async () => {
+    try {
+      const res = await fetch(`${API_BASE_URL}/api/comics/${id}/manifest`)
+      if (res.ok) setManifest(await res.json())
+    } catch {
+      // shown as a comic with no pages
+    }
+  }
+
+  // Warm the browser cache with the next page so "Next" is instant
+  useEffect(() => {
+    const next = (manifest?.pages || [])[currentPage + 1]
+    if (next?.url) {
+      const img = new Image()
+      img.src = mediaUrl(next.url)
+    }
+  }, [currentPage, manifest])
+
   if (loading) {
     return (
       <div className="min-h-screen bg-slate-950 flex items-center justify-center">
@@ -76,8 +131,10 @@ export default function ComicReader() {
     )
   }
 
-  const pages = comic.files || []
+  // the manifest has each page's URLs along with its layout
+  const pages = manifest?.pages || []
   const currentPageData = pages[currentPage]
+  const layouts = pages
 
   return (
     <div className="min-h-screen bg-slate-950 text-slate-100">
@@ -132,10 +189,13 @@ export default function ComicReader() {
           <div className="space-y-4">
             {/* Current Page */}
             <div className="bg-slate-900 rounded-lg overflow-hidden">
-              <img
-                src={`${API_BASE_URL}${currentPageData.url}`}
+              <PageImage
+                src={mediaUrl(currentPageData.url)}
+                webpSrc={mediaUrl(currentPageData.webp_url)}
+                layout={layouts[currentPage]}
                 alt={`Page ${currentPage + 1}`}
-                className="w-full h-auto"
+                lazy={false}
+                className="w-full"
               />
             </div>
 
@@ -174,10 +234,11 @@ export default function ComicReader() {
                       : "border-slate-700 hover:border-slate-600"
                   }`}
                 >
-                  <img
-                    src={`${API_BASE_URL}${page.thumbnail_url || page.url}`}
+                  <PageImage
+                    src={mediaUrl(page.thumbnail_url || page.url)}
+                    layout={{ color: layouts[index]?.color, placeholder: layouts[index]?.placeholder }}
                     alt={`Page ${index + 1}`}
-                    className="w-full h-full object-cover"
+                    className="w-full h-full"
                   />
                 </button>
               ))}
@@ -1,15 +1,17 @@
 import { useState, useEffect } from "react"
 import { useParams, useNavigate } from "react-router-dom"
-import { API_BASE_URL } from "../config"
+import { API_BASE_URL, mediaUrl } from "../config"
 
 export default function EditComic() {
   const { id } = useParams()
   const navigate = useNavigate()
   const [comic, setComic] = useState(null)
+  const [currentPages, setCurrentPages] = useState([])
   const [title, setTitle] = useState("")
   const [description, setDescription] = useState("")
   const [tags, setTags] = useState("")
   const [files, setFiles] = useState([])
+  const [chapterTitle, setChapterTitle] = useState("")
   const [previews, setPreviews] = useState([])
   const [loading, setLoading] = useState(true)
   const [updating, setUpdating] = useState(false)
@@ -17,8 +19,19 @@ export default function EditComic() {
 
   useEffect(() => {
     fetchComic()
+    fetchCurrentPages()
   }, [id])
 
+  // the first few pages, for the preview
+  const fetchCurrentPages = async () => {
+    try {
+      const res = await fetch(`${API_BASE_URL}/api/comics/${id}/pages?limit=8`)
+      if (res.ok) setCurrentPages((await res.json()).pages)
+    } catch {
+      // the preview is optional
+    }
+  }
+
   const fetchComic = async () => {
     const token = localStorage.getItem("token")
     if (!token) {
@@ -83,6 +96,7 @@ export default function EditComic() {
       formData.append("description", description)
       formData.append("tags", tags)
       files.forEach((file) => formData.append("files", file))
+      if (files.length > 0 && chapterTitle.trim()) formData.append("chapter_title", chapterTitle.trim())
 
       const res = await fetch(`${API_BASE_URL}/api/comics/${id}`, {
         method: "PATCH",
@@ -194,10 +208,10 @@ export default function EditComic() {
               Current Pages ({comic?.file_count || 0})
             </label>
             <div className="grid grid-cols-4 gap-2 mb-4">
-              {comic?.files?.slice(0, 8).map((file, i) => (
+              {currentPages.map((page, i) => (
                 <div key={i} className="aspect-[3/4] rounded-lg overflow-hidden border border-slate-700">
                   <img
-                    src={`${API_BASE_URL}${file.url}`}
+                    src={mediaUrl(page.thumbnail_url || page.url)}
                     alt={`Page ${i + 1}`}
                     className="w-full h-full object-cover"
                   />
@@ -243,6 +257,23 @@ export default function EditComic() {
             />
           </div>
 
+          {/* New pages can start a chapter */}
+          {files.length > 0 && (
+            <div>
+              <label htmlFor="chapterTitle" className="block text-sm font-medium mb-1 text-left">
+                New Chapter Title (Optional)
+              </label>
+              <input
+                id="chapterTitle"
+                type="text"
+                value={chapterTitle}
+                onChange={(e) => setChapterTitle(e.target.value)}
+                placeholder="Leave empty to add the pages to the last chapter"
+                className="w-full rounded-lg bg-slate-900 border border-slate-700 px-3 py-2 text-sm focus:outline-none focus:ring-2 focus:ring-indigo-500"
+              />
+            </div>
+          )}
+
           {/* New Pages Preview */}
           {previews.length > 0 && (
             <div className="grid grid-cols-3 gap-3 mt-3">
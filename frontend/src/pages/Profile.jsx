@@ -7,6 +7,8 @@ export default function Profile() {
   const [activeTab, setActiveTab] = useState("uploads")
   const [myComics, setMyComics] = useState([])
   const [savedComics, setSavedComics] = useState([])
+  const [savedTotal, setSavedTotal] = useState(0)
+  const [savedCursor, setSavedCursor] = useState(null)
   const [loading, setLoading] = useState(true)
   const [user, setUser] = useState(null)
   const navigate = useNavigate()
@@ -74,18 +76,22 @@ export default function Profile() {
     }
   }
 
-  const fetchSavedComics = async () => {
+  // Saved comics come a page at a time, most recently saved first
+  const fetchSavedComics = async (cursor = null) => {
     const token = localStorage.getItem("token")
+    const query = cursor ? `?cursor=${encodeURIComponent(cursor)}` : ""
 
     try {
-      const res = await fetch(`${API_BASE_URL}/api/users/me/saved`, {
+      const res = await fetch(`${API_BASE_URL}/api/users/me/saved${query}`, {
         headers: { "Authorization": `Bearer ${token}` }
       })
 
       if (res.ok) {
         const data = await res.json()
         console.log("Saved comics data:", data)
-        setSavedComics(data.comics || [])
+        setSavedComics(prev => cursor ? [...prev, ...(data.comics || [])] : (data.comics || []))
+        setSavedCursor(data.next_cursor)
+        if (!cursor) setSavedTotal(data.total_count || 0)
       } else {
         console.error("Failed to fetch saved comics, status:", res.status)
         const errorText = await res.text()
@@ -107,6 +113,7 @@ export default function Profile() {
 
       if (res.ok) {
         setSavedComics(prev => prev.filter(c => c._id !== comicId))
+        setSavedTotal(prev => Math.max(prev - 1, 0))
       }
     } catch (err) {
       console.error("Failed to unsave comic:", err)
@@ -175,6 +182,10 @@ export default function Profile() {
               <button
                 type="button"
                 onClick={() => {
+                  fetch(`${API_BASE_URL}/api/logout`, {
+                    method: "POST",
+                    headers: { "Authorization": `Bearer ${localStorage.getItem("token")}` }
+                  }).catch(() => {})
                   localStorage.removeItem("token")
                   navigate("/login")
                 }}
@@ -198,7 +209,7 @@ export default function Profile() {
               </div>
               <div className="rounded-2xl border border-amber-800/50 bg-gradient-to-br from-amber-900/30 to-slate-900/70 p-4">
                 <p className="text-xs uppercase tracking-wide text-amber-400">Saved Comics</p>
-                <p className="mt-2 text-2xl font-semibold">{savedComics.length}</p>
+                <p className="mt-2 text-2xl font-semibold">{savedTotal}</p>
                 <p className="mt-1 text-xs text-slate-500">Bookmarked</p>
               </div>
               <div className="rounded-2xl border border-amber-800/50 bg-gradient-to-br from-amber-900/30 to-slate-900/70 p-4">
@@ -226,7 +237,7 @@ export default function Profile() {
               </div>
               <div className="rounded-2xl border border-slate-800 bg-slate-900/70 p-4">
                 <p className="text-xs uppercase tracking-wide text-slate-400">Saved Comics</p>
-                <p className="mt-2 text-2xl font-semibold">{savedComics.length}</p>
+                <p className="mt-2 text-2xl font-semibold">{savedTotal}</p>
                 <p className="mt-1 text-xs text-slate-500">Your favorites</p>
               </div>
               <div className="rounded-2xl border border-slate-800 bg-slate-900/70 p-4">
@@ -242,7 +253,7 @@ export default function Profile() {
             <div className="grid gap-4 md:grid-cols-2 mb-6 max-w-2xl mx-auto">
               <div className="rounded-2xl border border-slate-800 bg-gradient-to-br from-indigo-900/30 to-slate-900/70 p-6">
                 <p className="text-xs uppercase tracking-wide text-slate-400">Saved Comics</p>
-                <p className="mt-2 text-3xl font-semibold">{savedComics.length}</p>
+                <p className="mt-2 text-3xl font-semibold">{savedTotal}</p>
                 <p className="mt-1 text-xs text-slate-500">Your reading list</p>
               </div>
               <div className="rounded-2xl border border-slate-800 bg-gradient-to-br from-fuchsia-900/30 to-slate-900/70 p-6">
@@ -277,7 +288,7 @@ export default function Profile() {
                   : "bg-slate-800 text-slate-300 hover:bg-slate-700"
               }`}
             >
-              Saved Comics ({savedComics.length})
+              Saved Comics ({savedTotal})
             </button>
           </div>
         )}
@@ -330,6 +341,17 @@ export default function Profile() {
             ))}
           </div>
         )}
+
+        {!loading && comics === savedComics && savedCursor && (
+          <div className="text-center mt-8">
+            <button
+              onClick={() => fetchSavedComics(savedCursor)}
+              className="px-6 py-2 bg-slate-800 text-slate-300 rounded-lg hover:bg-slate-700"
+            >
+              Load more
+            </button>
+          </div>
+        )}
       </div>
     </div>
   )
@@ -0,0 +1,32 @@
+import sys
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent / "backend"))
+
+import trending
+
+mongomock = pytest.importorskip("mongomock")
+
+
+def test_unlike_takes_off_only_the_weight_the_like_added():
+    comics = mongomock.MongoClient().db.comics
+    t0 = datetime(2026, 1, 1, 1, tzinfo=timezone.utc)
+    later = t0 + timedelta(hours=trending.TRENDING_HALF_LIFE_HOURS * 3)
+    comics.insert_many([{"_id": "liked"}, {"_id": "viewed"}])
+
+    # both comics get the same view; one is also liked at t0 and unliked later
+    for comic_id in ("liked", "viewed"):
+        comics.update_one({"_id": comic_id}, trending.score_update("view", now=t0))
+    comics.update_one({"_id": "liked"}, trending.score_update("like", now=t0))
+    comics.update_one({"_id": "liked"}, trending.score_update("like", sign=-1, now=later, occurred_at=t0))
+
+    comics.update_one({"_id": "viewed"}, [{"$set": {
+        "trending_score": trending._rescaled_score(trending.current_epoch(later)),
+        "trending_epoch": trending.current_epoch(later),
+    }}])
+    liked, viewed = comics.find_one({"_id": "liked"}), comics.find_one({"_id": "viewed"})
+    assert viewed["trending_score"] > 0
+    assert liked["trending_score"] == pytest.approx(viewed["trending_score"])